@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_asgi_application()
+
+from core.bloom import usernames  # noqa
+
+# Fill the mention filter while the first requests are served.
+usernames.start()
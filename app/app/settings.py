@@ -14,6 +14,9 @@ from pathlib import Path
 import random
 import string
 import os
+import sys
+
+import dj_database_url
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -50,6 +53,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.InstrumentationMiddleware',
+    'core.middleware.SlowQueryMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,6 +64,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -94,6 +102,40 @@ DATABASES = {
     }
 }
 
+# Read replicas, as a comma separated list of database URLs. Safe reads of
+# opted-in views go to a replica unless the client wrote in the last
+# PIN_SECONDS or the replica lags more than MAX_LAG_SECONDS behind.
+READ_REPLICAS = {
+    'ALIASES': [],
+    'PIN_SECONDS': int(os.environ.get('DB_REPLICA_PIN_SECONDS', 5)),
+    'MAX_LAG_SECONDS': float(os.environ.get('DB_REPLICA_MAX_LAG_SECONDS', 10)),
+    'LAG_CHECK_INTERVAL': float(os.environ.get('DB_REPLICA_LAG_CHECK_INTERVAL', 5)),
+}
+
+for n, url in enumerate(filter(None, os.environ.get('DB_REPLICA_URLS', '').split(',')), start=1):
+    alias = f'replica_{n}'
+    DATABASES[alias] = dj_database_url.parse(url)
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    READ_REPLICAS['ALIASES'].append(alias)
+
+SHARDING = {
+    'ALIASES': ['default'],
+    'BLOCK_SIZE': int(os.environ.get('DB_SHARD_ID_BLOCK_SIZE', 1000)),
+    'DIRECTORY_CACHE_SECONDS': int(os.environ.get('DB_SHARD_DIRECTORY_CACHE_SECONDS', 5)),
+}
+
+for n, url in enumerate(filter(None, os.environ.get('DB_SHARD_URLS', '').split(',')), start=1):
+    alias = f'shard_{n}'
+    DATABASES[alias] = dj_database_url.parse(url)
+    SHARDING['ALIASES'].append(alias)
+
+# Shard move tests need a second database; without configured shards the
+# test runner creates one next to the default test database.
+if sys.argv[1:2] == ['test'] and 'shard_1' not in DATABASES:
+    DATABASES['shard_1'] = {**DATABASES['default'], 'TEST': {'NAME': 'test_shard_1'}}
+
+DATABASE_ROUTERS = ['core.routers.ShardRouter', 'core.routers.ReplicaRouter']
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -149,8 +191,169 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_THROTTLE_CLASSES': [
+        'core.throttling.IPTokenBucketThrottle',
+        'core.throttling.UserTokenBucketThrottle',
+    ],
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    },
+}
+
+# Logins hash passwords on a pool of WORKERS threads; past MAX_PENDING
+# running or queued hashes new logins get 503 with Retry-After.
+PASSWORD_HASHING = {
+    'WORKERS': int(os.environ.get('PASSWORD_HASHING_WORKERS', 4)),
+    'MAX_PENDING': int(os.environ.get('PASSWORD_HASHING_MAX_PENDING', 64)),
+}
+
+# Token bucket throttles, see core.throttling. Buckets hold BURST tokens and
+# refill at RATES; requests listed in COSTS ("METHOD namespace:name") take
+# more than one token. STORE core.throttling.LocalStore keeps buckets per
+# process instead of in the shared CACHE.
+THROTTLING = {
+    'ENABLED': bool(int(os.environ.get('THROTTLING_ENABLED', 0))),
+    'STORE': os.environ.get('THROTTLING_STORE', 'core.throttling.CacheStore'),
+    'CACHE': 'default',
+    'RATES': {
+        'user': os.environ.get('THROTTLING_USER_RATE', '300/min'),
+        'ip': os.environ.get('THROTTLING_IP_RATE', '600/min'),
+    },
+    'BURST': {
+        'user': int(os.environ.get('THROTTLING_USER_BURST', 60)),
+        'ip': int(os.environ.get('THROTTLING_IP_BURST', 120)),
+    },
+    'COSTS': {
+        'POST user:token': 10,
+        'POST user:token-async': 10,
+        'POST user:create': 10,
+        'POST post:post-list': 5,
+        'PUT post:post-detail': 3,
+        'PATCH post:post-detail': 3,
+    },
 }
 
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
+
+# build_schema writes the schema here when the image is built.
+OPENAPI_SCHEMA = {
+    'DIR': os.environ.get('OPENAPI_SCHEMA_DIR', os.path.join(BASE_DIR, 'openapi')),
+}
+
+# Per-request SQL and timing instrumentation (Server-Timing header and log line).
+INSTRUMENTATION = {
+    'ENABLED': bool(int(os.environ.get('INSTRUMENTATION_ENABLED', 0))),
+    'SAMPLE_RATE': float(os.environ.get('INSTRUMENTATION_SAMPLE_RATE', 1.0)),
+    'SLOW_REQUEST_MS': float(os.environ.get('INSTRUMENTATION_SLOW_REQUEST_MS', 500)),
+}
+
+# Prometheus metrics, exposed at /api/metrics/ to clients sending METRICS_TOKEN
+# as a bearer token, and not at all without one. Set PROMETHEUS_MULTIPROC_DIR
+# to an empty directory to aggregate metrics across gunicorn workers.
+METRICS = {
+    'ENABLED': bool(int(os.environ.get('METRICS_ENABLED', 1))),
+    'TOKEN': os.environ.get('METRICS_TOKEN'),
+}
+
+# Opt-in cProfile/tracemalloc profiling of single requests, see core.profiling.
+PROFILING = {
+    'ENABLED': bool(int(os.environ.get('PROFILING_ENABLED', 0))),
+    'DIR': os.environ.get('PROFILING_DIR', '/vol/web/profiles'),
+    'SAMPLE_EVERY': int(os.environ.get('PROFILING_SAMPLE_EVERY', 0)),
+    'TRACEMALLOC': bool(int(os.environ.get('PROFILING_TRACEMALLOC', 0))),
+    'MAX_FILES': int(os.environ.get('PROFILING_MAX_FILES', 200)),
+}
+
+# Readiness probe results are reused for READY_CACHE_SECONDS.
+HEALTH = {
+    'READY_CACHE_SECONDS': float(os.environ.get('HEALTH_READY_CACHE_SECONDS', 2)),
+}
+
+# Monthly partitions of core_post on PostgreSQL, created MONTHS_AHEAD in advance.
+POST_PARTITIONS = {
+    'MONTHS_AHEAD': int(os.environ.get('POST_PARTITIONS_MONTHS_AHEAD', 3)),
+    'ARCHIVE_DIR': os.environ.get('POST_PARTITIONS_ARCHIVE_DIR', '/vol/web/archive'),
+}
+
+# Posts older than OLDER_THAN_DAYS are moved to compressed segments in DIR by archive_posts.
+POST_ARCHIVE = {
+    'DIR': os.environ.get('POST_ARCHIVE_DIR', '/vol/web/archive/posts'),
+    'OLDER_THAN_DAYS': int(os.environ.get('POST_ARCHIVE_OLDER_THAN_DAYS', 730)),
+}
+
+# Hashtag suggestions: new hashtags are merged into each process's index
+# every REFRESH_SECONDS and usage counts recomputed every REBUILD_SECONDS.
+HASHTAG_AUTOCOMPLETE = {
+    'LIMIT': int(os.environ.get('HASHTAG_AUTOCOMPLETE_LIMIT', 10)),
+    'MAX_LIMIT': int(os.environ.get('HASHTAG_AUTOCOMPLETE_MAX_LIMIT', 50)),
+    'REFRESH_SECONDS': float(os.environ.get('HASHTAG_AUTOCOMPLETE_REFRESH_SECONDS', 5)),
+    'REBUILD_SECONDS': float(os.environ.get('HASHTAG_AUTOCOMPLETE_REBUILD_SECONDS', 600)),
+}
+
+# User search: matches per prefix are cached for CACHE_SECONDS, at most
+# MAX_CANDIDATES of them; queries of MIN_INFIX characters also match inside names.
+USER_SEARCH = {
+    'CACHE_SECONDS': int(os.environ.get('USER_SEARCH_CACHE_SECONDS', 60)),
+    'MAX_CANDIDATES': int(os.environ.get('USER_SEARCH_MAX_CANDIDATES', 200)),
+    'MIN_INFIX': int(os.environ.get('USER_SEARCH_MIN_INFIX', 3)),
+}
+
+# Per-process Bloom filter of usernames checked before looking up mentions.
+USERNAME_FILTER = {
+    'ERROR_RATE': float(os.environ.get('USERNAME_FILTER_ERROR_RATE', 0.01)),
+    'MIN_CAPACITY': int(os.environ.get('USERNAME_FILTER_MIN_CAPACITY', 100000)),
+    'REFRESH_SECONDS': float(os.environ.get('USERNAME_FILTER_REFRESH_SECONDS', 5)),
+    'REBUILD_SECONDS': float(os.environ.get('USERNAME_FILTER_REBUILD_SECONDS', 3600)),
+}
+
+# Database task queue run by run_workers. Failed tasks are retried after
+# RETRY_DELAY_SECONDS, doubling up to MAX_RETRY_DELAY_SECONDS; running tasks
+# not finished after STALE_SECONDS are assumed lost and run again.
+TASKS = {
+    'BATCH_SIZE': int(os.environ.get('TASKS_BATCH_SIZE', 20)),
+    'POLL_SECONDS': float(os.environ.get('TASKS_POLL_SECONDS', 1)),
+    'STALE_SECONDS': int(os.environ.get('TASKS_STALE_SECONDS', 600)),
+    'MAX_ATTEMPTS': int(os.environ.get('TASKS_MAX_ATTEMPTS', 5)),
+    'RETRY_DELAY_SECONDS': float(os.environ.get('TASKS_RETRY_DELAY_SECONDS', 10)),
+    'MAX_RETRY_DELAY_SECONDS': float(os.environ.get('TASKS_MAX_RETRY_DELAY_SECONDS', 3600)),
+}
+
+# Soft-deleted users are purged by purge_deleted_users after GRACE_HOURS,
+# CHUNK_SIZE rows per transaction with PAUSE_SECONDS between chunks.
+USER_PURGE = {
+    'GRACE_HOURS': float(os.environ.get('USER_PURGE_GRACE_HOURS', 24)),
+    'CHUNK_SIZE': int(os.environ.get('USER_PURGE_CHUNK_SIZE', 500)),
+    'PAUSE_SECONDS': float(os.environ.get('USER_PURGE_PAUSE_SECONDS', 0.05)),
+}
+
+# Statements slower than THRESHOLD_MS are stored with their EXPLAIN output
+# and listed in the admin under "Slow queries".
+SLOW_QUERIES = {
+    'ENABLED': bool(int(os.environ.get('SLOW_QUERIES_ENABLED', 0))),
+    'THRESHOLD_MS': float(os.environ.get('SLOW_QUERIES_THRESHOLD_MS', 200)),
+    'MAX_PER_MINUTE': int(os.environ.get('SLOW_QUERIES_MAX_PER_MINUTE', 10)),
+    'FINGERPRINT_INTERVAL': int(os.environ.get('SLOW_QUERIES_FINGERPRINT_INTERVAL', 300)),
+    'ANALYZE': bool(int(os.environ.get('SLOW_QUERIES_ANALYZE', 1))),
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core': {
+            'handlers': ['console'],
+            'level': os.environ.get('CORE_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
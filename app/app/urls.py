@@ -13,22 +13,20 @@ Including another URLconf
     1. Import to include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularSwaggerView,
-)
-
 from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
 
+from core import views as core_views  # noqa
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/schema/', SpectacularAPIView.as_view(), name='api-schema'),
-    path('api/docs/', SpectacularSwaggerView.as_view(url_name='api-schema'), name='api-docs'),
+    path('api/schema/', core_views.schema_view, name='api-schema'),
+    path('api/docs/', core_views.docs_view, name='api-docs'),
     path('api/user/', include('user.urls')),
     path('api/post/', include('post.urls')),
+    path('api/', include('core.urls')),
 ]
 
 if settings.DEBUG:
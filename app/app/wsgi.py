@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+from core.bloom import usernames  # noqa
+
+# Fill the mention filter while the first requests are served.
+usernames.start()
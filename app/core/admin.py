@@ -4,6 +4,7 @@ Django admin ui customization.
 
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from core import models  # noqa
@@ -16,9 +17,9 @@ class UserAdmin(BaseUserAdmin):
     fieldsets = (
         (None, {"fields": ("email", "first_name", "last_name",  "username", "password")}),
         (_("Permissions"), {"fields": ("is_active", "is_staff", "is_superuser")}),
-        (_("Important dates"), {"fields": ("last_login", "date_joined",)}),
+        (_("Important dates"), {"fields": ("last_login", "date_joined", "deleted_at")}),
     )
-    readonly_fields = ["email", "last_login", "date_joined"]
+    readonly_fields = ["email", "last_login", "date_joined", "deleted_at"]
 
     add_fieldsets = (
         (None, {
@@ -38,7 +39,43 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+class SlowQueryAdmin(admin.ModelAdmin):
+    """Browse captured slow queries and their plans."""
+    list_display = ["created_at", "duration_ms", "view", "database", "short_sql"]
+    list_filter = ["view", "database"]
+    search_fields = ["sql", "view", "location"]
+    date_hierarchy = "created_at"
+    readonly_fields = ["fingerprint", "sql", "params", "duration_ms", "view",
+                       "location", "database", "plan", "created_at"]
+
+    @admin.display(description=_("SQL"))
+    def short_sql(self, obj):
+        return obj.sql[:120]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class TaskAdmin(admin.ModelAdmin):
+    """Inspect queued and failed tasks and send failed ones back to the queue."""
+    list_display = ["name", "status", "priority", "attempts", "run_at", "created_at"]
+    list_filter = ["status", "name"]
+    readonly_fields = ["name", "args", "kwargs", "attempts", "started_at", "created_at", "last_error"]
+    actions = ["requeue"]
+
+    @admin.action(description=_("Run selected tasks again"))
+    def requeue(self, request, queryset):
+        queryset.update(status=models.Task.QUEUED, attempts=0, run_at=timezone.now())
+
+
 admin.site.register(models.User, UserAdmin)
 admin.site.register(models.Post)
+admin.site.register(models.CanonicalHashTag)
 admin.site.register(models.HashTag)
 admin.site.register(models.Tag)
+admin.site.register(models.Mention)
+admin.site.register(models.SlowQuery, SlowQueryAdmin)
+admin.site.register(models.Task, TaskAdmin)
@@ -1,6 +1,39 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_migrate, post_save, pre_delete, pre_save
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from core import partitioning
+        post_migrate.connect(partitioning.post_migrate_partitions, sender=self, dispatch_uid='core.partitioning')
+
+        if settings.SLOW_QUERIES.get('ENABLED'):
+            from core import slow_queries
+            connection_created.connect(slow_queries.install, dispatch_uid='core.slow_queries')
+
+        from core import bloom
+        User = get_user_model()
+        post_init.connect(bloom.user_loaded, sender=User, dispatch_uid='core.bloom.user_loaded')
+        post_save.connect(bloom.user_saved, sender=User, dispatch_uid='core.bloom.user_saved')
+        post_delete.connect(bloom.user_deleted, sender=User, dispatch_uid='core.bloom.user_deleted')
+
+        from core import counters
+        from core.models import Post
+        m2m_changed.connect(counters.links_changed, sender=Post.hashtags.through,
+                            dispatch_uid='core.counters.hashtag_links_changed')
+        m2m_changed.connect(counters.links_changed, sender=Post.tags.through,
+                            dispatch_uid='core.counters.tag_links_changed')
+        pre_delete.connect(counters.post_deleted, sender=Post, dispatch_uid='core.counters.post_deleted')
+
+        from core import sharding
+        if sharding.sharding_enabled():
+            pre_save.connect(sharding.assign_id, dispatch_uid='core.sharding.assign_id')
+            post_save.connect(sharding.assign_shard, sender=User, dispatch_uid='core.sharding.assign_shard')
+            post_save.connect(sharding.replicate_user, sender=User, dispatch_uid='core.sharding.replicate_user')
+            post_delete.connect(sharding.delete_replicas, sender=User, dispatch_uid='core.sharding.delete_replicas')
@@ -0,0 +1,145 @@
+"""
+Cold storage of old posts in compressed segment files.
+
+Each archive run writes one append-only segment: a sequence of
+zlib-compressed JSON records, one per post, with its hashtags and tags.
+Next to it a sidecar index holds (post id, offset, length) entries sorted
+by id, so one post is found with a binary search and a single read.
+Segments are never modified; a segment is complete once its index exists.
+"""
+import bisect
+import json
+import os
+import struct
+import threading
+import zlib
+from array import array
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+
+SEGMENT_MAGIC = b'PSEG1\n'
+INDEX_MAGIC = b'PIDX1\n'
+ENTRY = struct.Struct('<qQI')
+COUNT = struct.Struct('<I')
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def archive_dir():
+    return settings.POST_ARCHIVE['DIR']
+
+
+def post_record(post):
+    """Return the archived form of a post with prefetched hashtags and tags."""
+    return {
+        'id': post.id,
+        'user_id': post.user_id,
+        'title': post.title,
+        'body': post.body,
+        'img': post.img.name or None,
+        'created_at': post.created_at.isoformat(),
+        'updated_at': post.updated_at.isoformat(),
+        'hashtags': [{'id': h.id, 'name': h.name} for h in post.hashtags.all()],
+        'tags': [{'id': t.id, 'somebody': t.somebody} for t in post.tags.all()],
+    }
+
+
+def record_to_post(record):
+    """Rebuild an unsaved Post from a record, for serializing it as usual."""
+    from core.models import HashTag, Post, Tag
+
+    post = Post(
+        id=record['id'],
+        user_id=record['user_id'],
+        title=record['title'],
+        body=record['body'],
+        img=record['img'],
+        created_at=parse_datetime(record['created_at']),
+        updated_at=parse_datetime(record['updated_at']),
+    )
+    post._prefetched_objects_cache = {
+        'hashtags': [HashTag(user_id=record['user_id'], **h) for h in record['hashtags']],
+        'tags': [Tag(user_id=record['user_id'], **t) for t in record['tags']],
+    }
+    return post
+
+
+def segment_names():
+    """Return the names of complete segments, newest first."""
+    try:
+        names = os.listdir(archive_dir())
+    except FileNotFoundError:
+        return []
+    return sorted((name[:-4] for name in names if name.endswith('.idx')), reverse=True)
+
+
+def write_segment(records):
+    """Write records to a new segment and return its name."""
+    directory = archive_dir()
+    os.makedirs(directory, exist_ok=True)
+    latest = segment_names()
+    name = f'segment-{int(latest[0].split("-")[1]) + 1 if latest else 1:06d}'
+    segment_path = os.path.join(directory, f'{name}.seg')
+    index_path = os.path.join(directory, f'{name}.idx')
+
+    entries = []
+    with open(f'{segment_path}.tmp', 'wb') as f:
+        f.write(SEGMENT_MAGIC)
+        for record in records:
+            data = zlib.compress(json.dumps(record, separators=(',', ':')).encode(), 9)
+            entries.append((record['id'], f.tell(), len(data)))
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+    entries.sort()
+    with open(f'{index_path}.tmp', 'wb') as f:
+        f.write(INDEX_MAGIC)
+        f.write(COUNT.pack(len(entries)))
+        for entry in entries:
+            f.write(ENTRY.pack(*entry))
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(f'{segment_path}.tmp', segment_path)
+    os.replace(f'{index_path}.tmp', index_path)
+    return name
+
+
+def load_index(name):
+    """Return the (ids, offsets, lengths) arrays of a segment, cached."""
+    path = os.path.join(archive_dir(), f'{name}.idx')
+    with _lock:
+        index = _indexes.get(path)
+    if index is not None:
+        return index
+
+    with open(path, 'rb') as f:
+        if f.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+            raise ValueError(f'{name}.idx is not a segment index')
+        count, = COUNT.unpack(f.read(COUNT.size))
+        data = f.read(count * ENTRY.size)
+    ids, offsets, lengths = array('q'), array('Q'), array('I')
+    for post_id, offset, length in ENTRY.iter_unpack(data):
+        ids.append(post_id)
+        offsets.append(offset)
+        lengths.append(length)
+    index = (ids, offsets, lengths)
+    with _lock:
+        _indexes[path] = index
+    return index
+
+
+def lookup(post_id):
+    """Return the archived record of post_id, or None."""
+    for name in segment_names():
+        ids, offsets, lengths = load_index(name)
+        i = bisect.bisect_left(ids, post_id)
+        if i < len(ids) and ids[i] == post_id:
+            with open(os.path.join(archive_dir(), f'{name}.seg'), 'rb') as f:
+                f.seek(offsets[i])
+                data = f.read(lengths[i])
+            return json.loads(zlib.decompress(data))
+    return None
@@ -0,0 +1,216 @@
+"""
+Hashtag autocomplete.
+
+Every process keeps the distinct hashtag names in a sorted array with
+their usage counts, the number of posts using them across every user and
+shard. A prefix maps to a contiguous slice found with two binary searches;
+slices too large to rank on each keystroke have their top suggestions
+memoized, and updated in place as names under that prefix are added.
+
+Requests never wait for the database: the index is built on a background
+thread, and requests get no suggestions until the first build is ready.
+Hashtags created since the last refresh are merged in every
+REFRESH_SECONDS, and a full rebuild, which also picks up changed usage
+counts, runs every REBUILD_SECONDS; both run on the same thread while the
+current index keeps serving.
+
+A hashtag can commit after rows stamped later than it were read, so each
+refresh reads back OVERLAP_SECONDS before the previous one started and
+skips the hashtags it already merged.
+"""
+import bisect
+import heapq
+import threading
+import time
+from array import array
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Sum
+from django.utils import timezone
+
+from core import sharding  # noqa
+
+# Largest slice ranked on every request; bigger ones are memoized.
+SCAN_LIMIT = 2000
+# Longest expected delay between stamping a hashtag's created_at and committing it.
+OVERLAP_SECONDS = 60
+
+
+def normalize(name):
+    """Return the index key of a hashtag name or prefix, as for canonical hashtags."""
+    from core.models import CanonicalHashTag
+
+    return CanonicalHashTag.key(name)
+
+
+class PrefixIndex:
+    """Sorted hashtag keys with their usage counts."""
+
+    def __init__(self, counts=None):
+        counts = counts or {}
+        self.keys = sorted(counts)
+        self.uses = array('q', (counts[key] for key in self.keys))
+        self._top = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, counts):
+        """Add non-negative usage counts for keys, inserting the new ones."""
+        with self._lock:
+            for key, uses in counts.items():
+                i = bisect.bisect_left(self.keys, key)
+                if i < len(self.keys) and self.keys[i] == key:
+                    self.uses[i] += uses
+                else:
+                    self.keys.insert(i, key)
+                    self.uses.insert(i, uses)
+                self._update_top(key, self.uses[i])
+
+    def _update_top(self, key, uses):
+        # Counts only grow, so a memoized top list stays right once the
+        # updated key is placed in it; no need to rank the slice again.
+        for end in range(len(key) + 1):
+            cached = self._top.get(key[:end])
+            if cached is not None:
+                entries = [entry for entry in cached if entry[0] != key] + [(key, uses)]
+                self._top[key[:end]] = heapq.nlargest(len(cached), entries, key=lambda entry: entry[1])
+
+    def warm(self):
+        """Memoize the top suggestions of the one character prefixes."""
+        for first in {key[:1] for key in self.keys}:
+            self.top(first, 1)
+
+    def top(self, prefix, limit):
+        """Return up to limit (key, uses) starting with prefix, most used first."""
+        with self._lock:
+            lo = bisect.bisect_left(self.keys, prefix)
+            hi = bisect.bisect_left(self.keys, prefix + '\uffff', lo)
+            if hi - lo <= SCAN_LIMIT:
+                best = heapq.nlargest(limit, range(lo, hi), key=self.uses.__getitem__)
+                return [(self.keys[i], self.uses[i]) for i in best]
+            cached = self._top.get(prefix)
+            if cached is None or len(cached) < limit:
+                best = heapq.nlargest(max(limit, settings.HASHTAG_AUTOCOMPLETE['MAX_LIMIT']), range(lo, hi),
+                                      key=self.uses.__getitem__)
+                cached = self._top[prefix] = [(self.keys[i], self.uses[i]) for i in best]
+            return cached[:limit]
+
+
+def load_counts(until):
+    """Return {key: uses} over every shard, of the hashtags created up to until."""
+    from core.models import HashTag
+
+    counts = {}
+    for alias in sharding.shard_aliases():
+        rows = (
+            HashTag.objects.using(alias).filter(created_at__lte=until)
+            .values_list('canonical_id').annotate(uses=Sum('post_count')).order_by()
+        )
+        for key, uses in rows:
+            counts[key] = counts.get(key, 0) + uses
+    return counts
+
+
+def load_recent(since):
+    """Return [(shard, id, key, uses, created_at)] of the hashtags created after since on every shard."""
+    from core.models import HashTag
+
+    return [
+        (alias, *row)
+        for alias in sharding.shard_aliases()
+        for row in HashTag.objects.using(alias).filter(created_at__gt=since)
+        .values_list('pk', 'canonical_id', 'post_count', 'created_at')
+    ]
+
+
+class Autocomplete:
+    """Process wide prefix index with incremental refreshes and periodic rebuilds."""
+
+    def __init__(self):
+        self.index = None
+        self.watermark = None
+        # {(shard, id): created_at} of the hashtags merged after the watermark.
+        self.merged = {}
+        self.refreshed_at = 0.0
+        self.built_at = 0.0
+        self._lock = threading.Lock()
+        self._updating = False
+
+    def reset(self):
+        """Drop the index so that the next request builds it again."""
+        with self._lock:
+            self.index = None
+
+    def _merge_recent(self, counts, merged, since):
+        """Add to counts the hashtags created after since that are not in merged yet."""
+        for alias, pk, key, uses, created_at in load_recent(since):
+            if (alias, pk) not in merged:
+                merged[alias, pk] = created_at
+                counts[key] = counts.get(key, 0) + uses
+
+    def build(self):
+        watermark = timezone.now() - timedelta(seconds=OVERLAP_SECONDS)
+        counts = load_counts(watermark)
+        merged = {}
+        self._merge_recent(counts, merged, watermark)
+        index = PrefixIndex(counts)
+        index.warm()
+        with self._lock:
+            self.index, self.watermark, self.merged = index, watermark, merged
+            self.refreshed_at = self.built_at = time.monotonic()
+
+    def refresh(self):
+        """Merge the hashtags created since the last build or refresh."""
+        watermark = timezone.now() - timedelta(seconds=OVERLAP_SECONDS)
+        counts = {}
+        self._merge_recent(counts, self.merged, self.watermark)
+        if counts:
+            self.index.add(counts)
+        # Hashtags older than the new watermark are not read again.
+        self.merged = {pk: created_at for pk, created_at in self.merged.items() if created_at > watermark}
+        self.watermark = watermark
+        self.refreshed_at = time.monotonic()
+
+    def update(self):
+        """Build the index when missing or due for a rebuild, refresh it otherwise."""
+        if self.index is None or time.monotonic() - self.built_at >= settings.HASHTAG_AUTOCOMPLETE['REBUILD_SECONDS']:
+            self.build()
+        else:
+            self.refresh()
+
+    def _update_in_background(self):
+        try:
+            self.update()
+        finally:
+            self._updating = False
+            connections.close_all()
+
+    def start(self):
+        """Update the index on a background thread unless an update is running."""
+        with self._lock:
+            if self._updating:
+                return
+            self._updating = True
+        threading.Thread(target=self._update_in_background, name='hashtag-index', daemon=True).start()
+
+    def get_index(self):
+        """Return the current index, or an empty one before the first build, starting an update when due."""
+        config = settings.HASHTAG_AUTOCOMPLETE
+        now = time.monotonic()
+        if (self.index is None or now - self.built_at >= config['REBUILD_SECONDS']
+                or now - self.refreshed_at >= config['REFRESH_SECONDS']):
+            self.start()
+        index = self.index
+        return EMPTY_INDEX if index is None else index
+
+    def suggest(self, prefix, limit):
+        """Return up to limit {'name', 'uses'} suggestions for prefix."""
+        return [{'name': f'#{key}', 'uses': uses} for key, uses in self.get_index().top(normalize(prefix), limit)]
+
+
+EMPTY_INDEX = PrefixIndex()
+hashtags = Autocomplete()
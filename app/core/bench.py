@@ -0,0 +1,315 @@
+"""
+Benchmark helpers: deterministic datasets, endpoint timing and query budgets.
+"""
+import io
+import math
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from PIL import Image
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import seeding  # noqa
+from core.models import User, Post, HashTag, Tag  # noqa
+from core.seeding import SeedConfig  # noqa
+
+BENCH_PASSWORD = 'benchpass123'
+
+# Maximum number of SQL queries per endpoint; a p95 latency budget in
+# milliseconds can be added per endpoint through settings.BENCHMARK_BUDGETS.
+DEFAULT_BUDGETS = {
+    'GET post:api-root': {'queries': 0},
+    'GET post:post-list': {'queries': 4},
+    'POST post:post-list': {'queries': 25},
+    'GET post:post-detail': {'queries': 4},
+    'PATCH post:post-detail': {'queries': 5},
+    'DELETE post:post-detail': {'queries': 9},
+    'POST post:post-upload-image': {'queries': 3},
+    'GET post:tag-list': {'queries': 2},
+    'PATCH post:tag-detail': {'queries': 3},
+    'DELETE post:tag-detail': {'queries': 5},
+    'GET post:hashtag-list': {'queries': 2},
+    'PATCH post:hashtag-detail': {'queries': 3},
+    'GET post:hashtag-autocomplete': {'queries': 2},
+    'DELETE post:hashtag-detail': {'queries': 5},
+    'POST user:create': {'queries': 3},
+    'POST user:token': {'queries': 3},
+    'POST user:token-async': {'queries': 3},
+    'GET user:me': {'queries': 1},
+    'PATCH user:me': {'queries': 2},
+    'GET user:search': {'queries': 3},
+    'GET user:mentions': {'queries': 2},
+}
+
+
+@dataclass
+class Dataset:
+    """Objects seeded for a benchmark run."""
+    users: list
+    user: User
+    token: str
+    password: str = BENCH_PASSWORD
+
+
+@dataclass
+class Endpoint:
+    """A single route and method to benchmark.
+
+    ``prepare`` is called before every request, outside of the measurement,
+    and returns the reverse() args and the request data for that iteration.
+    """
+    method: str
+    url_name: str
+    prepare: Callable = lambda dataset, i: ([], None)
+    format: Optional[str] = 'json'
+    authenticated: bool = True
+
+    @property
+    def name(self):
+        return f'{self.method} {self.url_name}'
+
+
+@dataclass
+class Result:
+    """Latency and query statistics for one endpoint."""
+    endpoint: Endpoint
+    timings: list = field(default_factory=list)
+    queries: list = field(default_factory=list)
+
+    @property
+    def p50(self):
+        return percentile(self.timings, 50)
+
+    @property
+    def p95(self):
+        return percentile(self.timings, 95)
+
+    @property
+    def p99(self):
+        return percentile(self.timings, 99)
+
+    @property
+    def max_queries(self):
+        return max(self.queries, default=0)
+
+
+def percentile(values, pct):
+    """Return the nearest-rank percentile of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def seed_dataset(users=10, posts_per_user=20, hashtags_per_post=3,
+                 tags_per_post=2, seed=0, skew=0):
+    """Create a deterministic dataset with bulk inserts and return it."""
+    config = SeedConfig(
+        users=users,
+        posts_per_user=posts_per_user,
+        hashtags_per_post=hashtags_per_post,
+        mention_density=tags_per_post,
+        hashtag_vocabulary=hashtags_per_post * 2,
+        skew=skew,
+        seed=seed,
+        prefix='bench',
+        password=BENCH_PASSWORD,
+    )
+    seeding.seed(config)
+
+    all_users = list(User.objects.filter(username__startswith=config.prefix).order_by('id'))
+    user = all_users[0]
+    token, _ = Token.objects.get_or_create(user=user)
+    return Dataset(users=all_users, user=user, token=token.key)
+
+
+def _first_post(dataset, i):
+    post = Post.objects.filter(user=dataset.user).order_by('id').first()
+    return [post.id], None
+
+
+def _new_post(dataset, i):
+    post = Post.objects.create(user=dataset.user, title=f'Disposable {i}', body='Disposable')
+    return [post.id], None
+
+
+def _new_post_with_image(dataset, i):
+    post = Post.objects.create(user=dataset.user, title=f'Image {i}', body='Image')
+    image_file = io.BytesIO()
+    Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+    image_file.name = f'bench{i}.jpg'
+    image_file.seek(0)
+    return [post.id], {'img': image_file}
+
+
+def _first_tag(dataset, i):
+    tag = Tag.objects.filter(user=dataset.user).order_by('id').first()
+    return [tag.id], {'somebody': f'@{tag.somebody.lstrip("@")}'}
+
+
+def _new_tag(dataset, i):
+    tag = Tag.objects.create(user=dataset.user, somebody=f'disposable{i}')
+    return [tag.id], None
+
+
+def _first_hashtag(dataset, i):
+    hashtag = HashTag.objects.filter(user=dataset.user).order_by('id').first()
+    return [hashtag.id], {'name': hashtag.name}
+
+
+def _new_hashtag(dataset, i):
+    hashtag = HashTag.objects.create(user=dataset.user, name=f'#disposable{i}')
+    return [hashtag.id], None
+
+
+def _post_body(dataset, i, length=2000):
+    """Return a body of length characters with mentions and hashtags spread through it."""
+    tokens = [f'@{user.username}' for user in dataset.users[:3]] + ['#tag0', f'#body{i}', 'me@example.com']
+    words = []
+    size = 0
+    while size < length:
+        word = tokens[len(words) // 20 % len(tokens)] if len(words) % 20 == 19 else f'word{len(words)}'
+        words.append(word)
+        size += len(word) + 1
+    return ' '.join(words)[:length]
+
+
+def _new_post_payload(dataset, i):
+    return [], {
+        'title': f'New post {i}',
+        'body': _post_body(dataset, i),
+        'hashtags': [{'name': '#tag0'}, {'name': f'#new{i}'}],
+        'tags': [{'somebody': f'@{dataset.users[-1].username}'}],
+    }
+
+
+def _new_user_payload(dataset, i):
+    return [], {'email': f'signup{i}@example.com', 'first_name': 'Sign', 'last_name': 'Up',
+                'username': f'signup{i}', 'password': BENCH_PASSWORD}
+
+
+def _token_payload(dataset, i):
+    user = dataset.user
+    return [], {'email': user.email, 'first_name': user.first_name, 'last_name': user.last_name,
+                'username': user.username, 'password': dataset.password}
+
+
+ENDPOINTS = [
+    Endpoint('GET', 'post:api-root'),
+    Endpoint('GET', 'post:post-list'),
+    Endpoint('POST', 'post:post-list', _new_post_payload),
+    Endpoint('GET', 'post:post-detail', _first_post),
+    Endpoint('PATCH', 'post:post-detail', lambda dataset, i: (_first_post(dataset, i)[0], {'title': f'Edit {i}'})),
+    Endpoint('DELETE', 'post:post-detail', _new_post),
+    Endpoint('POST', 'post:post-upload-image', _new_post_with_image, format='multipart'),
+    Endpoint('GET', 'post:tag-list'),
+    Endpoint('PATCH', 'post:tag-detail', _first_tag),
+    Endpoint('DELETE', 'post:tag-detail', _new_tag),
+    Endpoint('GET', 'post:hashtag-list'),
+    Endpoint('PATCH', 'post:hashtag-detail', _first_hashtag),
+    Endpoint('GET', 'post:hashtag-autocomplete', lambda dataset, i: ([], {'q': f'#tag{i % 10}'})),
+    Endpoint('DELETE', 'post:hashtag-detail', _new_hashtag),
+    Endpoint('POST', 'user:create', _new_user_payload, authenticated=False),
+    Endpoint('POST', 'user:token', _token_payload, authenticated=False),
+    Endpoint('POST', 'user:token-async', _token_payload, authenticated=False),
+    Endpoint('GET', 'user:me'),
+    Endpoint('PATCH', 'user:me', lambda dataset, i: ([], {'first_name': f'Bench{i}'})),
+    Endpoint('GET', 'user:search', lambda dataset, i: ([], {'q': dataset.users[i % len(dataset.users)].username[:3]})),
+    Endpoint('GET', 'user:mentions'),
+]
+
+
+def route_names():
+    """Return the namespaced names of every route in post.urls and user.urls."""
+    from post import urls as post_urls
+    from user import urls as user_urls
+
+    names = set()
+    for module in (post_urls, user_urls):
+        patterns = list(module.urlpatterns)
+        while patterns:
+            pattern = patterns.pop()
+            if hasattr(pattern, 'url_patterns'):
+                patterns.extend(pattern.url_patterns)
+            elif pattern.name:
+                names.add(f'{module.app_name}:{pattern.name}')
+    return names
+
+
+def uncovered_routes(endpoints=ENDPOINTS):
+    """Return route names that no benchmark endpoint exercises."""
+    return route_names() - {endpoint.url_name for endpoint in endpoints}
+
+
+def get_budgets():
+    """Return the default budgets merged with settings.BENCHMARK_BUDGETS."""
+    budgets = {name: dict(budget) for name, budget in DEFAULT_BUDGETS.items()}
+    for name, budget in getattr(settings, 'BENCHMARK_BUDGETS', {}).items():
+        budgets.setdefault(name, {}).update(budget)
+    return budgets
+
+
+def check_budgets(results, budgets=None):
+    """Return a list of human readable budget violations."""
+    budgets = get_budgets() if budgets is None else budgets
+    violations = []
+    for result in results:
+        budget = budgets.get(result.endpoint.name, {})
+        if 'queries' in budget and result.max_queries > budget['queries']:
+            violations.append(f'{result.endpoint.name}: {result.max_queries} queries '
+                              f'(budget {budget["queries"]})')
+        if 'p95_ms' in budget and result.p95 > budget['p95_ms']:
+            violations.append(f'{result.endpoint.name}: p95 {result.p95:.1f}ms '
+                              f'(budget {budget["p95_ms"]}ms)')
+    return violations
+
+
+def run_endpoint(endpoint, dataset, iterations=20, warmup=2, client=None):
+    """Call an endpoint repeatedly and return its Result."""
+    client = client or APIClient()
+    if endpoint.authenticated:
+        client.credentials(HTTP_AUTHORIZATION=f'Token {dataset.token}')
+    else:
+        client.credentials()
+
+    result = Result(endpoint)
+    for i in range(warmup + iterations):
+        args, data = endpoint.prepare(dataset, i)
+        url = reverse(endpoint.url_name, args=args)
+        request = getattr(client, endpoint.method.lower())
+
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            res = request(url, data, format=endpoint.format)
+            elapsed = (time.perf_counter() - start) * 1000
+
+        if res.status_code >= 400:
+            raise AssertionError(f'{endpoint.name} returned {res.status_code}: {getattr(res, "data", "")}')
+        if i >= warmup:
+            result.timings.append(elapsed)
+            result.queries.append(len(ctx.captured_queries))
+    return result
+
+
+class QueryBudgetMixin:
+    """TestCase mixin asserting that a block stays within an endpoint budget."""
+
+    @contextmanager
+    def assertQueryBudget(self, endpoint_name):
+        budget = get_budgets()[endpoint_name]['queries']
+        with CaptureQueriesContext(connection) as ctx:
+            yield ctx
+        self.assertLessEqual(
+            len(ctx.captured_queries), budget,
+            f'{endpoint_name} ran {len(ctx.captured_queries)} queries (budget {budget}):\n' +
+            '\n'.join(query['sql'] for query in ctx.captured_queries),
+        )
@@ -0,0 +1,241 @@
+"""
+Probabilistic username membership.
+
+Mentions in post bodies are mostly not usernames (emails, typos,
+@everyone), and each one used to cost a query. Every process keeps a
+counting Bloom filter of all usernames, so that words that are certainly
+not usernames are rejected without touching the database; only the ones
+the filter may contain are looked up.
+
+The filter is filled by a streaming scan of the users table, in the
+background when the web server starts (app/wsgi.py, app/asgi.py) and
+lazily elsewhere. Until it is ready every name is looked up. Users
+created or deleted in this process update it at once. Users created
+elsewhere are merged every REFRESH_SECONDS, and renames are published
+through the cache for the other processes. The filter is rebuilt every
+REBUILD_SECONDS, which drops users deleted by other processes and
+counters saturated by repeated adds.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.metrics import USERNAME_FILTER_BYTES, USERNAME_FILTER_ITEMS, USERNAME_FILTER_FPP  # noqa
+
+RENAMES_KEY = 'username-filter:renames'
+MAX_COUNT = 255
+
+
+class CountingBloomFilter:
+    """Bloom filter with 8-bit counters, so that items can also be removed."""
+
+    def __init__(self, capacity, error_rate):
+        capacity = max(capacity, 1)
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.counters = bytearray(self.size)
+        self.items = 0
+        self._lock = threading.Lock()
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        with self._lock:
+            for position in self._positions(item):
+                # A saturated counter stays put; removals can then no longer
+                # clear it, which only costs false positives until a rebuild.
+                if self.counters[position] < MAX_COUNT:
+                    self.counters[position] += 1
+            self.items += 1
+
+    def remove(self, item):
+        """Remove an item that was added; removing anything else breaks the filter."""
+        with self._lock:
+            positions = self._positions(item)
+            if not all(self.counters[position] for position in positions):
+                return
+            for position in positions:
+                if self.counters[position] < MAX_COUNT:
+                    self.counters[position] -= 1
+            self.items -= 1
+
+    def __contains__(self, item):
+        counters = self.counters
+        return all(counters[position] for position in self._positions(item))
+
+    def false_positive_rate(self):
+        """Return the expected false positive rate at the current fill."""
+        return (1 - math.exp(-self.hashes * self.items / self.size)) ** self.hashes
+
+
+class UsernameFilter:
+    """Process wide filter of every username, refreshed in the background."""
+
+    def __init__(self):
+        self.filter = None
+        self.joined_since = None
+        self.renames_seen = 0
+        self.refreshed_at = 0.0
+        self.built_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._building = False
+
+    def build(self):
+        """Fill a new filter from a streaming scan of the users table."""
+        from core.models import User
+
+        config = settings.USERNAME_FILTER
+        users = User.objects.using('default')
+        count = users.count()
+        renames_seen = cache.get(RENAMES_KEY, 0)
+        newest = None
+        bloom = CountingBloomFilter(max(count * 2, config['MIN_CAPACITY']), config['ERROR_RATE'])
+        for username, date_joined in users.values_list('username', 'date_joined').iterator(chunk_size=5000):
+            bloom.add(username)
+            newest = date_joined if newest is None else max(newest, date_joined)
+        with self._lock:
+            self.filter, self.joined_since, self.renames_seen = bloom, newest, renames_seen
+            self.refreshed_at = self.built_at = time.monotonic()
+        self._report()
+
+    def _build_in_background(self):
+        try:
+            self.build()
+        finally:
+            self._building = False
+            connections.close_all()
+
+    def start(self):
+        """Build the filter on a background thread, looking names up meanwhile."""
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+        threading.Thread(target=self._build_in_background, name='username-filter', daemon=True).start()
+
+    def reset(self):
+        with self._lock:
+            self.filter = None
+
+    def _refresh(self):
+        """Merge users created and renamed in other processes since the last refresh."""
+        from core.models import User
+
+        renames = cache.get(RENAMES_KEY, 0)
+        if renames != self.renames_seen:
+            keys = [f'{RENAMES_KEY}:{n}' for n in range(self.renames_seen + 1, renames + 1)]
+            names = cache.get_many(keys)
+            if len(names) < len(keys):
+                # Some renames expired from the cache before we saw them.
+                self.start()
+                return
+            for name in names.values():
+                self.add_missing(name)
+            self.renames_seen = renames
+
+        users = User.objects.using('default')
+        if self.joined_since is not None:
+            users = users.filter(date_joined__gte=self.joined_since)
+        for username, date_joined in users.values_list('username', 'date_joined').iterator():
+            # >= also rereads the newest users already merged, hence add_missing.
+            self.add_missing(username)
+            self.joined_since = date_joined if self.joined_since is None else max(self.joined_since, date_joined)
+        self.refreshed_at = time.monotonic()
+        self._report()
+
+    def get_filter(self):
+        """Return the filter, or None while it is built in the background."""
+        config = settings.USERNAME_FILTER
+        if self.filter is None:
+            if self._building:
+                return None
+            self.build()
+        now = time.monotonic()
+        if now - self.built_at >= config['REBUILD_SECONDS']:
+            self.start()
+        elif now - self.refreshed_at >= config['REFRESH_SECONDS'] and self._refresh_lock.acquire(blocking=False):
+            try:
+                self._refresh()
+            finally:
+                self._refresh_lock.release()
+        return self.filter
+
+    def might_exist(self, username):
+        """Return False when no user has this username, True when one may have it."""
+        bloom = self.get_filter()
+        return bloom is None or username in bloom
+
+    def add(self, username):
+        if self.filter is not None:
+            self.filter.add(username)
+            self._report()
+
+    def add_missing(self, username):
+        """Add username unless the filter already reports it, to keep counters low."""
+        if self.filter is not None and username not in self.filter:
+            self.add(username)
+
+    def remove(self, username):
+        if self.filter is not None:
+            self.filter.remove(username)
+            self._report()
+
+    def _report(self):
+        bloom = self.filter
+        if bloom is not None:
+            USERNAME_FILTER_ITEMS.set(bloom.items)
+            USERNAME_FILTER_BYTES.set(bloom.size)
+            USERNAME_FILTER_FPP.set(bloom.false_positive_rate())
+
+
+usernames = UsernameFilter()
+
+
+def publish_rename(username):
+    """Tell other processes to add username to their filter."""
+    timeout = settings.USERNAME_FILTER['REBUILD_SECONDS'] * 2
+    cache.add(RENAMES_KEY, 0, None)
+    try:
+        n = cache.incr(RENAMES_KEY)
+    except ValueError:
+        return
+    cache.set(f'{RENAMES_KEY}:{n}', username, timeout)
+
+
+def user_loaded(sender, instance, **kwargs):
+    """post_init receiver remembering the username read from the database."""
+    # Deferred usernames are not loaded here; saves then count as renames.
+    instance.__dict__['_loaded_username'] = instance.__dict__.get('username')
+
+
+def user_saved(sender, instance, created, raw=False, using=None, update_fields=None, **kwargs):
+    """post_save receiver adding new and renamed users to the filter."""
+    # Copies of users saved to the other shards are not new users.
+    if raw or using != DEFAULT_DB_ALIAS:
+        return
+    loaded = instance.__dict__.get('_loaded_username')
+    instance.__dict__['_loaded_username'] = instance.username
+    if created:
+        usernames.add(instance.username)
+    elif (update_fields is None or 'username' in update_fields) and loaded != instance.username:
+        # The old username stays in the filters as a false positive until
+        # the next rebuild.
+        usernames.add_missing(instance.username)
+        publish_rename(instance.username)
+
+
+def user_deleted(sender, instance, using=None, **kwargs):
+    """post_delete receiver removing users from the filter."""
+    if using != DEFAULT_DB_ALIAS:
+        return
+    usernames.remove(instance.username)
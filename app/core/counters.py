@@ -0,0 +1,69 @@
+"""
+Post counts of hashtags and tags.
+
+HashTag.post_count and Tag.post_count hold the number of posts linked to
+each row, so that listing used or popular hashtags and tags reads one
+indexed column instead of joining the whole m2m table. They are kept
+current with F() increments from m2m_changed, from either side of the
+relation, and decremented when posts are deleted.
+
+Paths that write the m2m tables directly send no signals and keep the
+counts themselves: seeding sets them, shard moves copy them with the rows
+and core.partitioning.archive_partition recounts what it unlinks.
+"""
+from django.db.models import F
+
+
+def _counted(sender):
+    """Return (model holding the count, its column on the m2m table) for a Post m2m table."""
+    from core.models import HashTag, Post, Tag
+
+    if sender is Post.hashtags.through:
+        return HashTag, 'hashtag_id'
+    if sender is Post.tags.through:
+        return Tag, 'tag_id'
+    return None, None
+
+
+def _add(model, using, pks, delta):
+    if pks and delta:
+        model.objects.using(using).filter(pk__in=pks).update(post_count=F('post_count') + delta)
+
+
+def links_changed(sender, instance, action, reverse, pk_set, using, **kwargs):
+    """m2m_changed receiver moving the post counts of linked hashtags and tags."""
+    model, column = _counted(sender)
+    if model is None:
+        return
+    links = sender.objects.using(using)
+
+    if action == 'post_add':
+        # Django leaves out of pk_set the rows that were already linked.
+        if reverse:
+            _add(model, using, [instance.pk], len(pk_set))
+        else:
+            _add(model, using, pk_set, 1)
+    elif action in ('pre_remove', 'pre_clear'):
+        # Count the links about to go now; pk_set may name unlinked rows.
+        if reverse:
+            links = links.filter(**{column: instance.pk})
+            if action == 'pre_remove':
+                links = links.filter(post_id__in=pk_set)
+            removed = ([instance.pk], links.count())
+        else:
+            links = links.filter(post_id=instance.pk)
+            if action == 'pre_remove':
+                links = links.filter(**{f'{column}__in': pk_set})
+            removed = (list(links.values_list(column, flat=True)), 1)
+        instance.__dict__.setdefault('_removed_links', {})[sender] = removed
+    elif action in ('post_remove', 'post_clear'):
+        pks, count = instance.__dict__.get('_removed_links', {}).pop(sender, ([], 0))
+        _add(model, using, pks, -count)
+
+
+def post_deleted(sender, instance, using, **kwargs):
+    """pre_delete receiver releasing the hashtags and tags of a deleted post."""
+    from core.models import HashTag, Tag
+
+    for model in (HashTag, Tag):
+        model.objects.using(using).filter(post=instance).update(post_count=F('post_count') - 1)
@@ -0,0 +1,55 @@
+"""
+Bounded pool for password hashing.
+
+PBKDF2 releases the GIL while it runs, so hashing on a small thread pool
+takes it off the request thread without a process pool. At most
+MAX_PENDING hashes may be running or queued; past that new logins are
+refused at once with 503 rather than piling up behind a spike.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from rest_framework import exceptions, status
+
+
+class HashingBusy(exceptions.APIException):
+    """Too many logins are waiting for a hash."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many login attempts in progress, please retry shortly.'
+    default_code = 'hashing_busy'
+    wait = 1
+
+
+class HashingPool:
+    """Thread pool that refuses work once max_pending tasks are in flight."""
+
+    def __init__(self, workers, max_pending):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hashing')
+        self.slots = threading.BoundedSemaphore(max_pending)
+
+    def submit(self, fn, *args):
+        """Schedule fn(*args) and return its future, or raise HashingBusy."""
+        if not self.slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            future = self.executor.submit(fn, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda f: self.slots.release())
+        return future
+
+
+_pool = None
+_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process wide pool configured by settings.PASSWORD_HASHING."""
+    global _pool
+    with _lock:
+        if _pool is None:
+            config = settings.PASSWORD_HASHING
+            _pool = HashingPool(config.get('WORKERS', 4), config.get('MAX_PENDING', 64))
+        return _pool
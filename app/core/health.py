@@ -0,0 +1,72 @@
+"""
+Liveness and readiness probes.
+
+Liveness only shows the process can serve requests. Readiness also checks
+every shard, every read replica and the cache. Its result is kept for
+READY_CACHE_SECONDS and computed by one thread at a time, so load balancers
+polling many workers add at most one probe per worker per interval.
+Replicas are reported but do not fail readiness, since reads fall back to
+the primary without them.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from core import routers, sharding  # noqa
+
+_lock = threading.Lock()
+_result = None
+_checked_at = 0.0
+
+
+def check_database(alias):
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    except Exception as e:
+        connection.close()
+        return f'{type(e).__name__}: {e}'
+    return 'ok'
+
+
+def check_cache():
+    try:
+        cache.set('health:probe', 1, 10)
+        if cache.get('health:probe') != 1:
+            return 'cache did not return the probe value'
+    except Exception as e:
+        return f'{type(e).__name__}: {e}'
+    return 'ok'
+
+
+def probe():
+    """Run every check and return (ready, checks)."""
+    checks = {f'database:{alias}': check_database(alias) for alias in sharding.shard_aliases()}
+    checks['cache'] = check_cache()
+    ready = all(result == 'ok' for result in checks.values())
+    for alias in routers.replica_aliases():
+        checks[f'replica:{alias}'] = check_database(alias)
+    return ready, checks
+
+
+def readiness():
+    """Return the cached (ready, checks), probing again once it is stale."""
+    global _result, _checked_at
+    ttl = settings.HEALTH.get('READY_CACHE_SECONDS', 2)
+    with _lock:
+        if _result is None or time.monotonic() - _checked_at >= ttl:
+            _result = probe()
+            _checked_at = time.monotonic()
+        return _result
+
+
+def reset():
+    """Forget the cached result."""
+    global _result
+    with _lock:
+        _result = None
@@ -0,0 +1,121 @@
+"""
+Per-request timing of SQL, authentication, serialization and rendering.
+
+The middleware puts a RequestMetrics object in a context variable for the
+duration of a sampled request; code that wants to report a phase wraps it in
+span(). Outside of a sampled request span() is a single context variable
+lookup, so instrumented code costs nothing when the middleware is off.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current = ContextVar('request_metrics', default=None)
+
+# Server-Timing metric names for each span.
+SERVER_TIMING_NAMES = {
+    'auth': 'auth',
+    'serializer': 'ser',
+    'render': 'render',
+}
+
+
+class RequestMetrics:
+    """Timings collected for a single request, in seconds."""
+    __slots__ = ('start', 'queries', 'sql_time', 'spans', '_open')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.spans = {}
+        self._open = set()
+
+    def add(self, name, seconds):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def record_query(self, execute, sql, params, many, context):
+        """Database execute wrapper counting queries and their time."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.queries += 1
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def as_dict(self, total=None):
+        """Return the metrics in milliseconds."""
+        total = self.elapsed() if total is None else total
+        data = {
+            'total_ms': round(total * 1000, 2),
+            'db_queries': self.queries,
+            'db_ms': round(self.sql_time * 1000, 2),
+        }
+        for name, seconds in self.spans.items():
+            data[f'{name}_ms'] = round(seconds * 1000, 2)
+        return data
+
+    def server_timing(self, total=None):
+        """Return the value of a Server-Timing header for these metrics."""
+        total = self.elapsed() if total is None else total
+        entries = [f'db;dur={self.sql_time * 1000:.2f};desc="{self.queries} queries"']
+        for name, seconds in self.spans.items():
+            entries.append(f'{SERVER_TIMING_NAMES.get(name, name)};dur={seconds * 1000:.2f}')
+        entries.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(entries)
+
+
+def current_metrics():
+    """Return the metrics of the request being instrumented, if any."""
+    return _current.get()
+
+
+@contextmanager
+def collect():
+    """Collect metrics for the enclosed block and yield them."""
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name):
+    """Add the time spent in the block to the named phase.
+
+    Nested spans with the same name count once, so a serializer nested in
+    another serializer is not added twice.
+    """
+    metrics = _current.get()
+    if metrics is None or name in metrics._open:
+        yield
+        return
+
+    metrics._open.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(name, time.perf_counter() - start)
+        metrics._open.discard(name)
+
+
+class InstrumentedSerializerMixin:
+    """Report validation, saving and representation time as serializer time."""
+
+    def run_validation(self, *args, **kwargs):
+        with span('serializer'):
+            return super().run_validation(*args, **kwargs)
+
+    def save(self, **kwargs):
+        with span('serializer'):
+            return super().save(**kwargs)
+
+    def to_representation(self, instance):
+        with span('serializer'):
+            return super().to_representation(instance)
@@ -0,0 +1,41 @@
+"""
+Django command to move old posts to archive segments.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core import archive, sharding  # noqa
+from core.models import Post  # noqa
+
+
+class Command(BaseCommand):
+    """Write posts older than a cutoff to segment files and delete them."""
+    help = 'Move posts older than a cutoff from the database to compressed archive segments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=settings.POST_ARCHIVE['OLDER_THAN_DAYS'])
+        parser.add_argument('--segment-size', type=int, default=10000, help='Posts per segment file.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        total = 0
+        for alias in sharding.shard_aliases():
+            queryset = Post.objects.using(alias).created_between(end=cutoff).order_by('id')
+            while True:
+                posts = list(queryset.prefetch_related('hashtags', 'tags')[:options['segment_size']])
+                if not posts:
+                    break
+                # The segment is on disk before the rows go away; a crash in
+                # between leaves the posts in both places, never in neither.
+                name = archive.write_segment(archive.post_record(post) for post in posts)
+                with transaction.atomic(using=alias):
+                    Post.objects.using(alias).filter(pk__in=[post.pk for post in posts]).delete()
+                total += len(posts)
+                self.stdout.write(f'{alias}: archived {len(posts)} posts to {name}')
+
+        self.stdout.write(self.style.SUCCESS(f'Archived {total} posts created before {cutoff:%Y-%m-%d}'))
@@ -0,0 +1,20 @@
+"""
+Django command to create mentions from existing tags.
+"""
+from django.core.management.base import BaseCommand
+
+from core import mentions  # noqa
+
+
+class Command(BaseCommand):
+    """Stream the tag links of every shard into mentions."""
+    help = 'Create the mention of every tagged user, for the mentions inbox.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=mentions.CHUNK_SIZE,
+                            help='Tag links read and mentions inserted per statement.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        total = mentions.backfill(options['chunk_size'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f'Found {total} mentions'))
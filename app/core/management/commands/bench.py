@@ -0,0 +1,76 @@
+"""
+Django command to benchmark the API endpoints against a seeded test database.
+"""
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    override_settings,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+from core import bench  # noqa
+
+
+class Command(BaseCommand):
+    """Seed a throwaway database and measure latency and queries per endpoint."""
+    help = 'Benchmark every route in post.urls and user.urls and enforce budgets.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--posts-per-user', type=int, default=20)
+        parser.add_argument('--hashtags-per-post', type=int, default=3)
+        parser.add_argument('--tags-per-post', type=int, default=2)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            help='Only run the named endpoint, e.g. "GET post:post-list".')
+        parser.add_argument('--keepdb', action='store_true', help='Preserve the test database between runs.')
+        parser.add_argument('--no-budgets', action='store_true', help='Report only, never fail.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        endpoints = bench.ENDPOINTS
+        if options['endpoints']:
+            endpoints = [endpoint for endpoint in endpoints if endpoint.name in options['endpoints']]
+            if not endpoints:
+                raise CommandError('No endpoint matches the given names.')
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'],
+                                     aliases={'default'})
+        try:
+            with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+                results = self._run(endpoints, options)
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        self._report(results)
+        violations = [] if options['no_budgets'] else bench.check_budgets(results)
+        if violations:
+            raise CommandError('Budgets exceeded:\n  ' + '\n  '.join(violations))
+        self.stdout.write(self.style.SUCCESS('All endpoints within budget'))
+
+    def _run(self, endpoints, options):
+        dataset = bench.seed_dataset(
+            users=options['users'],
+            posts_per_user=options['posts_per_user'],
+            hashtags_per_post=options['hashtags_per_post'],
+            tags_per_post=options['tags_per_post'],
+            seed=options['seed'],
+        )
+        return [
+            bench.run_endpoint(endpoint, dataset, iterations=options['iterations'], warmup=options['warmup'])
+            for endpoint in endpoints
+        ]
+
+    def _report(self, results):
+        self.stdout.write(f'{"endpoint":<32} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"queries":>8}')
+        for result in results:
+            self.stdout.write(f'{result.endpoint.name:<32} {result.p50:>8.2f} {result.p95:>8.2f} '
+                              f'{result.p99:>8.2f} {result.max_queries:>8}')
@@ -0,0 +1,19 @@
+"""
+Django command to write the OpenAPI schema to files.
+"""
+from django.core.management.base import BaseCommand
+
+from core import schema  # noqa
+
+
+class Command(BaseCommand):
+    """Generate the OpenAPI schema served by /api/schema/."""
+    help = 'Write the OpenAPI schema as YAML and JSON, run when building the image.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=None, help='Output directory, OPENAPI_SCHEMA_DIR by default.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        for path in schema.write(options['dir']):
+            self.stdout.write(self.style.SUCCESS(f'Wrote {path}'))
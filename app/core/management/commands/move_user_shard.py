@@ -0,0 +1,36 @@
+"""
+Django command to move a user's rows to another shard.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import sharding  # noqa
+from core.models import User  # noqa
+
+
+class Command(BaseCommand):
+    """Copy, reconcile and switch a user's posts, hashtags and tags to a shard."""
+    help = 'Move the posts, hashtags and tags of a user to another shard.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_id', type=int)
+        parser.add_argument('target', help='Database alias of the target shard.')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows copied per query.')
+        parser.add_argument('--pause', type=float, default=None,
+                            help='Seconds to wait for the write freeze to reach every process.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        target = options['target']
+        if target not in settings.SHARDING['ALIASES']:
+            raise CommandError(f'"{target}" is not a shard, pick one of {", ".join(settings.SHARDING["ALIASES"])}.')
+        if not User.objects.filter(pk=options['user_id']).exists():
+            raise CommandError(f'User {options["user_id"]} does not exist.')
+
+        total = sharding.move_user(
+            options['user_id'], target,
+            chunk_size=options['chunk_size'],
+            pause=options['pause'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(f'Moved user {options["user_id"]} to {target} ({total} rows synced)'))
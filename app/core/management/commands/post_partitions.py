@@ -0,0 +1,42 @@
+"""
+Django command to maintain the monthly partitions of core_post.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from core import partitioning  # noqa
+
+
+class Command(BaseCommand):
+    """Create upcoming partitions and archive old ones."""
+    help = 'Create future monthly post partitions and detach and archive old ones.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--months-ahead', type=int, default=None,
+                            help='Months of partitions to create past the current one.')
+        parser.add_argument('--archive-older-than', type=int, default=None, metavar='MONTHS',
+                            help='Detach and archive partitions older than this many months.')
+        parser.add_argument('--archive-dir', default=None)
+        parser.add_argument('--drop', action='store_true', help='Drop archived partitions instead of keeping them.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        connection = connections[options['database']]
+        if not partitioning.is_partitioned(connection):
+            raise CommandError('core_post is not partitioned on this database, nothing to do.')
+
+        created = partitioning.ensure_future_partitions(options['months_ahead'], connection=connection)
+        self.stdout.write(f'partitions up to {created[-1]} are in place')
+
+        if options['archive_older_than'] is None:
+            return
+        cutoff = partitioning.add_months(partitioning.month_start(timezone.now()), -options['archive_older_than'])
+        for name, month in partitioning.list_partitions(connection):
+            if month >= cutoff:
+                break
+            paths = partitioning.archive_partition(
+                name, archive_dir=options['archive_dir'], drop=options['drop'], connection=connection
+            )
+            self.stdout.write(self.style.SUCCESS(f'Archived {name} to {", ".join(paths)}'))
@@ -0,0 +1,29 @@
+"""
+Django command to purge soft-deleted users.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import purge  # noqa
+
+
+class Command(BaseCommand):
+    """Delete soft-deleted users and their rows in short chunks."""
+    help = 'Delete users soft-deleted more than a grace period ago, with their posts, hashtags and tags.'
+
+    def add_arguments(self, parser):
+        config = settings.USER_PURGE
+        parser.add_argument('--grace-hours', type=float, default=config['GRACE_HOURS'])
+        parser.add_argument('--chunk-size', type=int, default=config['CHUNK_SIZE'],
+                            help='Rows deleted per transaction.')
+        parser.add_argument('--pause', type=float, default=config['PAUSE_SECONDS'],
+                            help='Seconds to sleep between chunks.')
+        parser.add_argument('--limit', type=int, default=None, help='Purge at most this many users.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        user_ids = purge.purgeable_users(options['grace_hours'])[:options['limit']]
+        for user_id in user_ids:
+            count = purge.purge_user(user_id, options['chunk_size'], options['pause'], log=self.stdout.write)
+            self.stdout.write(f'Purged user {user_id} ({count} rows)')
+        self.stdout.write(self.style.SUCCESS(f'Purged {len(user_ids)} users'))
@@ -0,0 +1,55 @@
+"""
+Django command to run task queue workers.
+"""
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.tasks import Worker  # noqa
+
+
+class Command(BaseCommand):
+    """Run queued tasks on a pool of worker threads until stopped."""
+    help = 'Run tasks from the database queue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help='Worker threads.')
+        parser.add_argument('--batch-size', type=int, default=settings.TASKS['BATCH_SIZE'],
+                            help='Tasks claimed per query.')
+        parser.add_argument('--once', action='store_true', help='Exit once no task is due.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        stop = threading.Event()
+        handlers = {}
+        if threading.current_thread() is threading.main_thread():
+            # Let running tasks finish on SIGTERM and Ctrl-C.
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                handlers[signum] = signal.signal(signum, lambda *_: stop.set())
+
+        self.stdout.write(f'Running {options["concurrency"]} workers...')
+        try:
+            if options['concurrency'] == 1:
+                Worker(batch_size=options['batch_size']).run(stop, once=options['once'])
+            else:
+                threads = [
+                    threading.Thread(target=self._work, args=(stop, options), name=f'worker-{i}')
+                    for i in range(options['concurrency'])
+                ]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+        self.stdout.write(self.style.SUCCESS('Workers stopped'))
+
+    def _work(self, stop, options):
+        try:
+            Worker(batch_size=options['batch_size']).run(stop, once=options['once'])
+        finally:
+            connections.close_all()
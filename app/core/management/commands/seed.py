@@ -0,0 +1,63 @@
+"""
+Django command to generate a large synthetic social graph.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import User  # noqa
+from core.seeding import SeedConfig, seed  # noqa
+
+
+class Command(BaseCommand):
+    """Bulk insert a deterministic, power-law distributed dataset."""
+    help = 'Generate users, posts, hashtags and mention tags at scale.'
+
+    def add_arguments(self, parser):
+        defaults = SeedConfig()
+        parser.add_argument('--users', type=int, default=defaults.users)
+        parser.add_argument('--posts-per-user', type=float, default=defaults.posts_per_user,
+                            help='Mean number of posts per user.')
+        parser.add_argument('--hashtags-per-post', type=int, default=defaults.hashtags_per_post)
+        parser.add_argument('--mention-density', type=float, default=defaults.mention_density,
+                            help='Mean number of @mentions per post.')
+        parser.add_argument('--hashtag-vocabulary', type=int, default=defaults.hashtag_vocabulary,
+                            help='Number of distinct hashtag names.')
+        parser.add_argument('--skew', type=float, default=defaults.skew,
+                            help='0 for a uniform dataset, higher for a heavier power-law tail.')
+        parser.add_argument('--seed', type=int, default=defaults.seed)
+        parser.add_argument('--prefix', default=defaults.prefix, help='Username prefix of generated users.')
+        parser.add_argument('--chunk-size', type=int, default=defaults.chunk_size,
+                            help='Users generated per unit of work.')
+        parser.add_argument('--batch-size', type=int, default=defaults.batch_size,
+                            help='Rows per INSERT statement.')
+        parser.add_argument('--workers', type=int, default=1, help='Parallel worker processes.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        config = SeedConfig(
+            users=options['users'],
+            posts_per_user=options['posts_per_user'],
+            hashtags_per_post=options['hashtags_per_post'],
+            mention_density=options['mention_density'],
+            hashtag_vocabulary=options['hashtag_vocabulary'],
+            skew=options['skew'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+            chunk_size=options['chunk_size'],
+            batch_size=options['batch_size'],
+        )
+        if User.objects.filter(username=f'{config.prefix}0').exists():
+            raise CommandError(f'Users with prefix "{config.prefix}" already exist, pick another --prefix.')
+
+        start = time.perf_counter()
+        self.stdout.write(f'seeding {config.users} users with {options["workers"]} worker(s)...')
+        totals = seed(config, workers=options['workers'], progress=self._progress)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {totals["users"]} users, {totals["posts"]} posts, {totals["hashtags"]} post hashtags, '
+            f'{totals["tags"]} post tags and {totals["mentions"]} mentions in {elapsed:.1f}s'
+        ))
+
+    def _progress(self, totals):
+        self.stdout.write(f'  {totals["users"]} users, {totals["posts"]} posts')
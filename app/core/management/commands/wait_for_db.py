@@ -2,25 +2,57 @@
 Django command to wait for the database to be available
 """
 
+import random
 import time
+from concurrent.futures import ThreadPoolExecutor
+
 from psycopg2 import OperationalError as Psycopg2Error
+from django.conf import settings
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 
 class Command(BaseCommand):
     """Django command to wait for database."""
 
+    def add_arguments(self, parser):
+        parser.add_argument('--database', action='append', dest='databases',
+                            help='Alias to wait for, repeatable. Defaults to every configured database.')
+        parser.add_argument('--timeout', type=float, default=0,
+                            help='Give up after this many seconds, 0 to wait forever.')
+        parser.add_argument('--initial-delay', type=float, default=1)
+        parser.add_argument('--max-delay', type=float, default=30)
+
     def handle(self, *args, **options):
         """Entrypoint for command"""
         self.stdout.write('waiting for database...')
-        db_up = False
-
-        while db_up is False:
-            try:
-                self.check(databases=['default'])
-                db_up = True
-            except (Psycopg2Error, OperationalError):
-                self.stdout.write("Databases unavailable, waiting 1 second...")
-                time.sleep(1)
+        pending = options['databases'] or list(settings.DATABASES)
+        deadline = time.monotonic() + options['timeout'] if options['timeout'] else None
+        attempt = 0
+
+        with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+            while pending:
+                up = list(executor.map(self._is_up, pending))
+                pending = [alias for alias, ok in zip(pending, up) if not ok]
+                if not pending:
+                    break
+
+                # Exponential backoff with full jitter keeps replicas of this
+                # command from retrying in lockstep.
+                delay = random.uniform(0, min(options['max_delay'], options['initial_delay'] * 2 ** attempt))
+                attempt += 1
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise CommandError(f'Databases unavailable after {options["timeout"]:g}s: {", ".join(pending)}')
+                    delay = min(delay, remaining)
+                self.stdout.write(f'Databases unavailable ({", ".join(pending)}), waiting {delay:.1f} seconds...')
+                time.sleep(delay)
         self.stdout.write(self.style.SUCCESS("Database available"))
+
+    def _is_up(self, alias):
+        try:
+            self.check(databases=[alias])
+        except (Psycopg2Error, OperationalError):
+            return False
+        return True
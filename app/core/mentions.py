@@ -0,0 +1,80 @@
+"""
+Posts mentioning a user.
+
+Tags keep the mentioned username as text on the author's side, so finding
+the posts that mention someone meant scanning every tag. Mention rows link
+each post to the users it mentions, other than its author, and are read
+newest first from the (mentioned, created_at, post) index.
+
+Mentions live next to their post, on the author's shard, and move with it;
+users are on every shard. The inbox reads a page from every shard and
+merges them.
+"""
+from core import sharding  # noqa
+
+CHUNK_SIZE = 2000
+
+
+def add_mentions(post, user_ids):
+    """Record that post mentions the users of user_ids."""
+    from core.models import Mention
+
+    Mention.objects.bulk_create([
+        Mention(post=post, mentioned_id=user_id, created_at=post.created_at)
+        for user_id in set(user_ids) if user_id != post.user_id
+    ], ignore_conflicts=True)
+
+
+def set_mentions(post, user_ids):
+    """Make the mentions of post match user_ids, keeping those already recorded."""
+    wanted = set(user_ids) - {post.user_id}
+    post.mentions.exclude(mentioned_id__in=wanted).delete()
+    add_mentions(post, wanted)
+
+
+def inbox(user):
+    """Return one queryset per shard of the mentions of user, with their posts and authors."""
+    from core.models import Mention
+
+    return [
+        Mention.objects.using(alias).filter(mentioned=user).select_related('post__user')
+        for alias in sharding.shard_aliases()
+    ]
+
+
+def backfill(chunk_size=None, log=None):
+    """Create the mentions of existing tags, streaming the tag links of every shard.
+
+    Links are read chunk_size at a time in id order and their mentions
+    inserted with one statement per chunk; existing mentions are skipped,
+    so it can be run again. Returns the number of mentions found.
+    """
+    from core.models import Mention, Post, User
+
+    chunk_size = chunk_size or CHUNK_SIZE
+    log = log or (lambda message: None)
+    total = 0
+    for alias in sharding.shard_aliases():
+        links = Post.tags.through.objects.using(alias).order_by('pk')
+        found = 0
+        last = 0
+        while True:
+            rows = list(
+                links.filter(pk__gt=last)
+                .values_list('pk', 'post_id', 'post__user_id', 'post__created_at', 'tag__somebody')[:chunk_size]
+            )
+            if not rows:
+                break
+            last = rows[-1][0]
+            names = {row[4].lstrip('@') for row in rows}
+            user_ids = dict(User.objects.using(alias).filter(username__in=names).values_list('username', 'id'))
+            mentions = []
+            for _, post_id, author_id, created_at, somebody in rows:
+                user_id = user_ids.get(somebody.lstrip('@'))
+                if user_id is not None and user_id != author_id:
+                    mentions.append(Mention(post_id=post_id, mentioned_id=user_id, created_at=created_at))
+            Mention.objects.using(alias).bulk_create(mentions, ignore_conflicts=True)
+            found += len(mentions)
+        log(f'{alias}: {found} mentions')
+        total += found
+    return total
@@ -0,0 +1,127 @@
+"""
+Prometheus metrics for the app.
+
+When PROMETHEUS_MULTIPROC_DIR is set (e.g. under gunicorn) every worker
+process writes its samples to its own mmap'd file in that directory and the
+metrics view merges them, so updating a metric never takes a lock shared
+between processes.
+"""
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Request latency by view.',
+    ['method', 'view', 'status'],
+)
+REQUEST_SIZE = Histogram(
+    'http_request_size_bytes',
+    'Request body size by view.',
+    ['method', 'view'],
+    buckets=SIZE_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes',
+    'Response body size by view.',
+    ['method', 'view'],
+    buckets=SIZE_BUCKETS,
+)
+DB_QUERIES = Counter(
+    'db_queries_total',
+    'SQL statements executed by view and database alias.',
+    ['view', 'alias'],
+)
+AUTH_ATTEMPTS = Counter(
+    'auth_attempts_total',
+    'Authentication attempts by method and result.',
+    ['method', 'result'],
+)
+CACHE_REQUESTS = Counter(
+    'cache_requests_total',
+    'Cache lookups by cache and result.',
+    ['cache', 'result'],
+)
+TASKS_PROCESSED = Counter(
+    'tasks_processed_total',
+    'Queued tasks run by task and result (success, retry, failure).',
+    ['task', 'result'],
+)
+TASK_DURATION = Histogram(
+    'task_duration_seconds',
+    'Time spent running a task, or a batch of a batched task.',
+    ['task'],
+)
+TASK_WAIT = Histogram(
+    'task_wait_seconds',
+    'Time from when a task was due until a worker claimed it.',
+    ['task'],
+)
+USERNAME_FILTER_ITEMS = Gauge(
+    'username_filter_items',
+    'Usernames in the mention filter of a process.',
+    multiprocess_mode='max',
+)
+USERNAME_FILTER_BYTES = Gauge(
+    'username_filter_bytes',
+    'Memory used by the counters of the mention filter.',
+    multiprocess_mode='max',
+)
+USERNAME_FILTER_FPP = Gauge(
+    'username_filter_false_positive_rate',
+    'Expected false positive rate of the mention filter at its current fill.',
+    multiprocess_mode='max',
+)
+USERNAME_CHECKS = Counter(
+    'username_filter_checks_total',
+    'Mention lookups by outcome: rejected by the filter, found, or a false positive.',
+    ['result'],
+)
+
+
+def record_auth(method, result):
+    """Count an authentication attempt (result: success, failure, anonymous)."""
+    AUTH_ATTEMPTS.labels(method, result).inc()
+
+
+def record_cache(cache, hit):
+    """Count a cache lookup."""
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def record_task(task, result, duration, wait):
+    """Count a finished task with its run time (None if it never ran) and wait."""
+    TASKS_PROCESSED.labels(task, result).inc()
+    if duration is not None:
+        TASK_DURATION.labels(task).observe(duration)
+    TASK_WAIT.labels(task).observe(max(wait, 0))
+
+
+def record_username_check(result):
+    """Count a mention lookup (result: rejected, found, false_positive)."""
+    USERNAME_CHECKS.labels(result).inc()
+
+
+def get_registry():
+    """Return the registry to expose, merging worker files in multiprocess mode."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def exposition():
+    """Return the metrics in the Prometheus text format and its content type."""
+    return generate_latest(get_registry()), CONTENT_TYPE_LATEST
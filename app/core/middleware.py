@@ -0,0 +1,229 @@
+"""
+Middleware for the app.
+"""
+import hashlib
+import itertools
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import exceptions
+from rest_framework.authentication import get_authorization_header
+
+from core import instrumentation, metrics, profiling, routers, slow_queries  # noqa
+from core.authentication import TokenAuthentication  # noqa
+
+logger = logging.getLogger('core.instrumentation')
+
+
+class InstrumentationMiddleware:
+    """Report SQL, auth, serializer and render time for sampled requests.
+
+    Sampled requests get a Server-Timing header and a JSON log line. Every
+    request is timed as a whole, so requests slower than SLOW_REQUEST_MS
+    are logged as warnings even when they were not sampled.
+    """
+
+    def __init__(self, get_response):
+        config = settings.INSTRUMENTATION
+        if not config.get('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = config.get('SAMPLE_RATE', 1.0)
+        self.slow_request = config.get('SLOW_REQUEST_MS', 500) / 1000
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            start = time.perf_counter()
+            response = self.get_response(request)
+            total = time.perf_counter() - start
+            if total >= self.slow_request:
+                self._log(request, response, {'total_ms': round(total * 1000, 2), 'sampled': False}, slow=True)
+            return response
+
+        with instrumentation.collect() as metrics, ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(metrics.record_query))
+            response = self.get_response(request)
+
+        total = metrics.elapsed()
+        response['Server-Timing'] = metrics.server_timing(total)
+        self._log(request, response, metrics.as_dict(total), slow=total >= self.slow_request)
+        return response
+
+    def process_template_response(self, request, response):
+        """Time rendering, which happens right after this hook returns."""
+        metrics = instrumentation.current_metrics()
+        if metrics is not None:
+            start = time.perf_counter()
+            response.add_post_render_callback(lambda r: metrics.add('render', time.perf_counter() - start))
+        return response
+
+    def _log(self, request, response, data, slow):
+        level = logging.WARNING if slow else logging.INFO
+        if not logger.isEnabledFor(level):
+            return
+        match = request.resolver_match
+        data = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'slow': slow,
+            **data,
+        }
+        logger.log(level, json.dumps(data), extra={'request_metrics': data})
+
+
+class MetricsMiddleware:
+    """Record latency, sizes and query counts per view as Prometheus metrics."""
+
+    def __init__(self, get_response):
+        if not settings.METRICS.get('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = {}
+
+        def count_query(execute, sql, params, many, context):
+            alias = context['connection'].alias
+            queries[alias] = queries.get(alias, 0) + 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(count_query))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+        metrics.REQUEST_LATENCY.labels(request.method, view, response.status_code).observe(elapsed)
+        metrics.REQUEST_SIZE.labels(request.method, view).observe(int(request.META.get('CONTENT_LENGTH') or 0))
+        if not response.streaming:
+            metrics.RESPONSE_SIZE.labels(request.method, view).observe(len(response.content))
+        for alias, count in queries.items():
+            metrics.DB_QUERIES.labels(view, alias).inc(count)
+        return response
+
+
+class ProfilingMiddleware:
+    """Run cProfile around the view for staff requests that ask for it.
+
+    Staff users opt in with the X-Profile header or the ``profile`` query
+    parameter; ``memory`` as the value also records tracemalloc statistics.
+    With SAMPLE_EVERY set to N, one in N requests is profiled regardless of
+    the user. The profile id is returned in the X-Profile-Id header.
+    """
+
+    def __init__(self, get_response):
+        config = settings.PROFILING
+        if not config.get('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_every = config.get('SAMPLE_EVERY', 0)
+        self.counter = itertools.count(1)
+
+    def __call__(self, request):
+        flag = request.headers.get('X-Profile') or request.GET.get('profile')
+        if flag and self._is_staff(request):
+            memory = flag == 'memory' or settings.PROFILING.get('TRACEMALLOC', False)
+        elif self.sample_every and next(self.counter) % self.sample_every == 0:
+            memory = settings.PROFILING.get('TRACEMALLOC', False)
+        else:
+            return self.get_response(request)
+
+        response, name = profiling.run_profiled(request, self.get_response, memory=memory)
+        response['X-Profile-Id'] = name
+        return response
+
+    def _is_staff(self, request):
+        """Check the session user, or the API token when there is one."""
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user.is_staff
+
+        auth = get_authorization_header(request).split()
+        if len(auth) != 2 or auth[0].lower() != b'token':
+            return False
+        try:
+            user, _ = TokenAuthentication().authenticate_credentials(auth[1].decode())
+        except (exceptions.AuthenticationFailed, UnicodeError):
+            return False
+        return user.is_staff
+
+
+class SlowQueryMiddleware:
+    """Tell the slow query observer which view is running."""
+
+    def __init__(self, get_response):
+        if not settings.SLOW_QUERIES.get('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = slow_queries.current_view.set('')
+        try:
+            return self.get_response(request)
+        finally:
+            slow_queries.current_view.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        slow_queries.current_view.set(request.resolver_match.view_name)
+
+
+class ReplicaRoutingMiddleware:
+    """Send safe reads to replicas, keeping recent writers on the primary.
+
+    A view opts in by listing the actions that may read from a replica in
+    ``replica_actions``. After a successful write the client, identified by
+    its Authorization header or else its session cookie, stays pinned to
+    the primary for PIN_SECONDS so it reads its own writes.
+    """
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        if not routers.replica_aliases():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.pin_seconds = settings.READ_REPLICAS.get('PIN_SECONDS', 5)
+
+    def __call__(self, request):
+        keys = self._pin_keys(request)
+        if request.method in self.SAFE_METHODS:
+            pinned = cache.get_many(keys)
+            metrics.record_cache('replica-pin', hit=bool(pinned))
+            request.replica_pinned = bool(pinned)
+            with routers.use_replica(None):
+                return self.get_response(request)
+
+        response = self.get_response(request)
+        if response.status_code < 400:
+            cache.set_many({key: True for key in keys}, self.pin_seconds)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in self.SAFE_METHODS or request.replica_pinned:
+            return None
+        cls = getattr(view_func, 'cls', None)
+        actions = getattr(view_func, 'actions', None)
+        action = actions.get(request.method.lower()) if actions else 'retrieve'
+        if action in getattr(cls, 'replica_actions', ()):
+            routers.set_read_alias(routers.choose_replica())
+        return None
+
+    @staticmethod
+    def _pin_keys(request):
+        # Not the address: behind a proxy every client shares one.
+        client = request.META.get('HTTP_AUTHORIZATION') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        if not client:
+            return []
+        return [f'replica-pin:{hashlib.sha256(client.encode()).hexdigest()}']
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-19 05:12
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_auto_20231210_1626'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(db_index=True, max_length=32)),
+                ('sql', models.TextField()),
+                ('params', models.TextField(blank=True)),
+                ('duration_ms', models.FloatField()),
+                ('view', models.CharField(blank=True, max_length=255)),
+                ('location', models.CharField(blank=True, max_length=255)),
+                ('database', models.CharField(max_length=50)),
+                ('plan', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name_plural': 'slow queries',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
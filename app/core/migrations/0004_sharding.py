@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-19 05:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_slowquery'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdBlock',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('next_hi', models.BigIntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ShardAssignment',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='core.user')),
+                ('alias', models.CharField(max_length=50)),
+                ('moving', models.BooleanField(default=False)),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+from core import partitioning
+
+
+def forwards(apps, schema_editor):
+    if partitioning.is_postgres(schema_editor.connection):
+        partitioning.partition(schema_editor.connection)
+
+
+def backwards(apps, schema_editor):
+    if partitioning.is_partitioned(schema_editor.connection):
+        partitioning.unpartition(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    """Partition core_post by created_at month on PostgreSQL."""
+
+    dependencies = [
+        ('core', '0004_sharding'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.2.25 on 2026-10-19 05:22
+
+from django.db import migrations, models
+
+from core import partitioning
+
+
+def create_brin_index(apps, schema_editor):
+    # created_at follows insertion order, so a BRIN index of a few pages
+    # narrows time range scans as well as a btree at a fraction of the size.
+    if partitioning.is_postgres(schema_editor.connection):
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS core_post_created_brin ON core_post '
+            'USING brin (created_at) WITH (pages_per_range = 32)'
+        )
+
+
+def drop_brin_index(apps, schema_editor):
+    if partitioning.is_postgres(schema_editor.connection):
+        schema_editor.execute('DROP INDEX IF EXISTS core_post_created_brin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_partition_post'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['user', 'created_at'], name='core_post_user_created_idx'),
+        ),
+        migrations.RunPython(create_brin_index, drop_brin_index),
+    ]
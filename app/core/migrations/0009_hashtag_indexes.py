@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-19 05:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_task'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='hashtag',
+            index=models.Index(fields=['name'], name='core_hashtag_name_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='hashtag',
+            index=models.Index(fields=['created_at'], name='core_hashtag_created_idx'),
+        ),
+    ]
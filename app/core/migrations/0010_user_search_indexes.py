@@ -0,0 +1,42 @@
+from django.db import migrations
+
+from core import partitioning
+
+SEARCH_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def create_search_indexes(apps, schema_editor):
+    # Django compiles istartswith and icontains to UPPER("column"::text) LIKE
+    # UPPER(...), so the indexes are on that expression: btree with the
+    # pattern opclass for prefixes, pg_trgm GIN for matches inside names.
+    if not partitioning.is_postgres(schema_editor.connection):
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for field in SEARCH_FIELDS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS core_user_{field}_prefix_idx '
+            f'ON core_user (UPPER({field}::text) text_pattern_ops)'
+        )
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS core_user_{field}_trgm_idx '
+            f'ON core_user USING gin (UPPER({field}::text) gin_trgm_ops)'
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if not partitioning.is_postgres(schema_editor.connection):
+        return
+    for field in SEARCH_FIELDS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS core_user_{field}_prefix_idx')
+        schema_editor.execute(f'DROP INDEX IF EXISTS core_user_{field}_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_hashtag_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
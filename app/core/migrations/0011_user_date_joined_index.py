@@ -0,0 +1,19 @@
+# Generated by Django 3.2.25 on 2026-10-19 05:46
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_user_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='date_joined',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='date joined'),
+        ),
+    ]
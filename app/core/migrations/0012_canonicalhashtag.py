@@ -0,0 +1,26 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_user_date_joined_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CanonicalHashTag',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='hashtag',
+            name='canonical',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT,
+                                    related_name='hashtags', to='core.canonicalhashtag'),
+        ),
+    ]
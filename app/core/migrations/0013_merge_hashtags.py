@@ -0,0 +1,83 @@
+"""
+Link every hashtag to its canonical hashtag and merge each user's duplicates.
+
+Runs outside of a single transaction: rows are read in id order CHUNK_SIZE
+at a time and every chunk commits on its own, so the migration holds short
+locks only and can be run again after an interruption.
+"""
+from django.db import migrations, transaction
+from django.db.models import Count, Min
+
+CHUNK_SIZE = 2000
+
+
+def key(name):
+    return name.strip().lstrip('#').casefold()
+
+
+def link_canonical(apps, alias):
+    CanonicalHashTag = apps.get_model('core', 'CanonicalHashTag')
+    HashTag = apps.get_model('core', 'HashTag')
+
+    last = 0
+    while True:
+        rows = list(
+            HashTag.objects.using(alias).filter(pk__gt=last, canonical__isnull=True)
+            .order_by('pk').values_list('pk', 'name')[:CHUNK_SIZE]
+        )
+        if not rows:
+            break
+        last = rows[-1][0]
+        keys = {pk: key(name) for pk, name in rows}
+        with transaction.atomic(using=alias):
+            CanonicalHashTag.objects.using(alias).bulk_create(
+                [CanonicalHashTag(name=name) for name in set(keys.values())], ignore_conflicts=True,
+            )
+            HashTag.objects.using(alias).bulk_update(
+                [HashTag(pk=pk, canonical_id=name) for pk, name in keys.items()], ['canonical'],
+            )
+
+
+def merge_duplicates(apps, alias):
+    """Keep the oldest hashtag of a user per canonical name, moving post links to it."""
+    HashTag = apps.get_model('core', 'HashTag')
+    Post = apps.get_model('core', 'Post')
+    Link = Post.hashtags.through
+
+    duplicates = (
+        HashTag.objects.using(alias).values('user_id', 'canonical_id')
+        .annotate(rows=Count('pk'), keep=Min('pk')).filter(rows__gt=1).order_by()
+    )
+    for group in duplicates.iterator():
+        with transaction.atomic(using=alias):
+            extra = list(
+                HashTag.objects.using(alias)
+                .filter(user_id=group['user_id'], canonical_id=group['canonical_id'])
+                .exclude(pk=group['keep']).values_list('pk', flat=True)
+            )
+            linked = set(Link.objects.using(alias).filter(hashtag_id=group['keep']).values_list('post_id', flat=True))
+            for link_id, post_id in Link.objects.using(alias).filter(hashtag_id__in=extra).values_list('pk', 'post_id'):
+                if post_id in linked:
+                    Link.objects.using(alias).filter(pk=link_id).delete()
+                else:
+                    Link.objects.using(alias).filter(pk=link_id).update(hashtag_id=group['keep'])
+                    linked.add(post_id)
+            HashTag.objects.using(alias).filter(pk__in=extra).delete()
+
+
+def forwards(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    link_canonical(apps, alias)
+    merge_duplicates(apps, alias)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('core', '0012_canonicalhashtag'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_merge_hashtags'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='hashtag',
+            name='canonical',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT,
+                                    related_name='hashtags', to='core.canonicalhashtag'),
+        ),
+        migrations.AddConstraint(
+            model_name='hashtag',
+            constraint=models.UniqueConstraint(fields=('user', 'canonical'), name='core_hashtag_user_canonical_uniq'),
+        ),
+    ]
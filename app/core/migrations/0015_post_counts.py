@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-19 05:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_hashtag_canonical_required'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hashtag',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='hashtag',
+            index=models.Index(fields=['user', '-post_count'], name='core_hashtag_user_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', '-post_count'], name='core_tag_user_popular_idx'),
+        ),
+    ]
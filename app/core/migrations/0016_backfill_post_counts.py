@@ -0,0 +1,49 @@
+"""
+Count the posts of every existing hashtag and tag.
+
+Runs outside of a single transaction, CHUNK_SIZE rows at a time in id
+order with one transaction per chunk, like 0013_merge_hashtags. Counts are
+recomputed from the m2m tables, so running it again is harmless.
+"""
+from django.db import migrations, transaction
+from django.db.models import Count
+
+CHUNK_SIZE = 2000
+
+
+def backfill(model, link, column, alias):
+    last = 0
+    while True:
+        pks = list(
+            model.objects.using(alias).filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:CHUNK_SIZE]
+        )
+        if not pks:
+            break
+        last = pks[-1]
+        counts = dict(
+            link.objects.using(alias).filter(**{f'{column}__in': pks})
+            .values_list(column).annotate(posts=Count('pk')).order_by()
+        )
+        with transaction.atomic(using=alias):
+            model.objects.using(alias).bulk_update(
+                [model(pk=pk, post_count=counts.get(pk, 0)) for pk in pks], ['post_count'],
+            )
+
+
+def forwards(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    Post = apps.get_model('core', 'Post')
+    backfill(apps.get_model('core', 'HashTag'), Post.hashtags.through, 'hashtag_id', alias)
+    backfill(apps.get_model('core', 'Tag'), Post.tags.through, 'tag_id', alias)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('core', '0015_post_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+    ]
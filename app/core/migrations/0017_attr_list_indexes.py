@@ -0,0 +1,37 @@
+# Generated by Django 3.2.25 on 2026-10-19 05:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_backfill_post_counts'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='hashtag',
+            name='core_hashtag_user_popular_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='tag',
+            name='core_tag_user_popular_idx',
+        ),
+        migrations.AddIndex(
+            model_name='hashtag',
+            index=models.Index(fields=['user', '-name', '-id'], name='core_hashtag_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hashtag',
+            index=models.Index(fields=['user', '-post_count', '-name', '-id'], name='core_hashtag_user_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', '-somebody', '-id'], name='core_tag_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', '-post_count', '-somebody', '-id'], name='core_tag_user_popular_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.25 on 2026-10-19 06:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_attr_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Mention',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('mentioned', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='mentions', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='mentions', to='core.post')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='mention',
+            index=models.Index(fields=['mentioned', '-created_at', '-post'], name='core_mention_inbox_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='mention',
+            constraint=models.UniqueConstraint(fields=('post', 'mentioned'), name='core_mention_post_mentioned_uniq'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-19 06:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_mention'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tag',
+            name='somebody',
+            field=models.CharField(max_length=51),
+        ),
+    ]
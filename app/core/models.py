@@ -6,7 +6,7 @@ import uuid
 import os
 
 from django.conf import settings
-from django.db import models
+from django.db import models, router
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -61,10 +61,12 @@ class User(AbstractBaseUser, PermissionsMixin):
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
 
-    date_joined = models.DateTimeField(default=timezone.now, verbose_name='date joined')
+    date_joined = models.DateTimeField(default=timezone.now, verbose_name='date joined', db_index=True)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     is_superuser = models.BooleanField(default=False)
+    # Set when the account is soft-deleted; purge_deleted_users removes it later.
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
 
     REQUIRED_FIELDS = ['email', "first_name", "last_name"]
     USERNAME_FIELD = "username"
@@ -79,6 +81,19 @@ class User(AbstractBaseUser, PermissionsMixin):
         return f"{self.first_name} {self.last_name}"
 
 
+class PostQuerySet(models.QuerySet):
+    """Queries for posts."""
+
+    def created_between(self, start=None, end=None):
+        """Filter to posts created in [start, end), pruning partitions on PostgreSQL."""
+        queryset = self
+        if start is not None:
+            queryset = queryset.filter(created_at__gte=start)
+        if end is not None:
+            queryset = queryset.filter(created_at__lt=end)
+        return queryset
+
+
 class Post(models.Model):
     """Post object."""
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -92,15 +107,62 @@ class Post(models.Model):
     hashtags = models.ManyToManyField('HashTag')
     tags = models.ManyToManyField('Tag')
 
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='core_post_user_created_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
 
+class CanonicalHashTag(models.Model):
+    """Hashtag shared by every user, keyed by its case-folded name without '#'."""
+    name = models.CharField(max_length=100, primary_key=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    @staticmethod
+    def key(name):
+        """Return the canonical name of a hashtag as typed."""
+        return name.strip().lstrip('#').casefold()
+
+    def __str__(self):
+        return f'#{self.name}'
+
+
 class HashTag(models.Model):
     """Hashtag model."""
     name = models.CharField(max_length=50)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    canonical = models.ForeignKey(CanonicalHashTag, on_delete=models.PROTECT, related_name='hashtags')
     created_at = models.DateTimeField(default=timezone.now)
+    # Number of posts using the hashtag, kept by core.counters.
+    post_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'canonical'], name='core_hashtag_user_canonical_uniq'),
+        ]
+        indexes = [
+            # Prefix searches (LIKE 'abc%') on PostgreSQL need the pattern opclass.
+            models.Index(fields=['name'], opclasses=['varchar_pattern_ops'], name='core_hashtag_name_prefix_idx'),
+            # Incremental refreshes of the autocomplete index.
+            models.Index(fields=['created_at'], name='core_hashtag_created_idx'),
+            # Keyset ordered lists of a user's hashtags, by name or most used first.
+            models.Index(fields=['user', '-name', '-id'], name='core_hashtag_user_name_idx'),
+            models.Index(fields=['user', '-post_count', '-name', '-id'], name='core_hashtag_user_popular_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        """Link the hashtag to its canonical hashtag, creating it on this database if needed."""
+        key = CanonicalHashTag.key(self.name)
+        if self._state.adding or self.canonical_id != key:
+            using = kwargs.get('using') or router.db_for_write(HashTag, instance=self)
+            CanonicalHashTag.objects.using(using).bulk_create([CanonicalHashTag(name=key)], ignore_conflicts=True)
+            self.canonical_id = key
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
@@ -108,9 +170,113 @@ class HashTag(models.Model):
 
 class Tag(models.Model):
     """@Tags for Post."""
-    somebody = models.CharField(max_length=30)
+    # A username, with the '@' the tags API keeps in front of it.
+    somebody = models.CharField(max_length=51)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     created_at = models.DateTimeField(default=timezone.now)
+    # Number of posts mentioning the user, kept by core.counters.
+    post_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Keyset ordered lists of a user's tags, by name or most used first.
+            models.Index(fields=['user', '-somebody', '-id'], name='core_tag_user_name_idx'),
+            models.Index(fields=['user', '-post_count', '-somebody', '-id'], name='core_tag_user_popular_idx'),
+        ]
 
     def __str__(self):
         return self.somebody
+
+
+class Mention(models.Model):
+    """User mentioned in a post, for the inbox of that user."""
+    # core_post is partitioned on PostgreSQL and has no unique id column to
+    # reference (see core.partitioning); the ORM still cascades deletes.
+    # Both columns lead an index of Meta already.
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, db_constraint=False, db_index=False,
+                             related_name='mentions')
+    mentioned = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False,
+                                  related_name='mentions')
+    # Copied from the post, so that the inbox is read from one index.
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'mentioned'], name='core_mention_post_mentioned_uniq'),
+        ]
+        indexes = [
+            # Keyset ordered inbox of a user, newest first.
+            models.Index(fields=['mentioned', '-created_at', '-post'], name='core_mention_inbox_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id} -> {self.mentioned_id}'
+
+
+class ShardAssignment(models.Model):
+    """Database alias holding a user's posts, hashtags and tags."""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True)
+    alias = models.CharField(max_length=50)
+    moving = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f'{self.user_id} -> {self.alias}'
+
+
+class IdBlock(models.Model):
+    """High value counter for hi/lo id allocation on a shard."""
+    name = models.CharField(max_length=50, primary_key=True)
+    next_hi = models.BigIntegerField()
+
+    def __str__(self):
+        return self.name
+
+
+class SlowQuery(models.Model):
+    """SQL statement that exceeded the slow query threshold, with its plan."""
+    fingerprint = models.CharField(max_length=32, db_index=True)
+    sql = models.TextField()
+    params = models.TextField(blank=True)
+    duration_ms = models.FloatField()
+    view = models.CharField(max_length=255, blank=True)
+    location = models.CharField(max_length=255, blank=True)
+    database = models.CharField(max_length=50)
+    plan = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name_plural = 'slow queries'
+
+    def __str__(self):
+        return f'{self.duration_ms:.0f}ms {self.view}'
+
+
+class Task(models.Model):
+    """Deferred call of a task function, run by run_workers."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=255)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-priority', 'run_at', 'id'], condition=models.Q(status='queued'),
+                         name='core_task_due_idx'),
+            models.Index(fields=['started_at'], condition=models.Q(status='running'), name='core_task_running_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
@@ -0,0 +1,193 @@
+"""
+Pagination classes.
+
+KeysetPagination finds pages with a WHERE clause on the sort key of the
+last row returned instead of an OFFSET, so every page costs the same
+however deep the client goes and rows inserted meanwhile do not shift
+pages. OffsetPagination is for short ranked lists without such a key.
+"""
+import base64
+import json
+from urllib import parse
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(BasePagination):
+    """Paginate on a composite key ending with a unique field, largest first.
+
+    The key is ``ordering``, (timestamp, id) by default, or the
+    ``keyset_ordering`` of the view when it has one. A list of querysets,
+    such as one per shard, is paginated as their union. Pagination is
+    opt-in unless ``optional`` is False: lists are returned whole unless
+    the request passes ``page_size`` or ``cursor``, so existing clients
+    keep working.
+    """
+    ordering = ('created_at', 'id')
+    page_size = 50
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+    optional = True
+
+    def get_ordering(self, view):
+        return getattr(view, 'keyset_ordering', None) or self.ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.optional and self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        querysets = queryset if isinstance(queryset, (list, tuple)) else [queryset]
+        self.fields = [querysets[0].model._meta.get_field(name) for name in self.get_ordering(view)]
+        encoded = params.get(self.cursor_query_param)
+        condition = self.after(self.decode_cursor(encoded)) if encoded else Q()
+
+        rows = []
+        for queryset in querysets:
+            queryset = queryset.order_by(*[f'-{field.attname}' for field in self.fields]).filter(condition)
+            rows.extend(queryset[:self.page_size + 1])
+        if len(querysets) > 1:
+            rows.sort(key=lambda row: [getattr(row, field.attname) for field in self.fields], reverse=True)
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def after(self, values):
+        """Return the condition selecting rows listed after the key values, i.e. with a smaller key."""
+        condition = Q()
+        for i, field in enumerate(self.fields):
+            equal = {f.attname: value for f, value in zip(self.fields[:i], values)}
+            condition |= Q(**equal, **{f'{field.attname}__lt': values[i]})
+        return condition
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def encode_cursor(self, row):
+        key = [field.value_to_string(row) for field in self.fields]
+        return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+    def decode_cursor(self, encoded):
+        try:
+            key = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if not isinstance(key, list) or len(key) != len(self.fields):
+                raise ValueError(key)
+            values = [field.to_python(value) for field, value in zip(self.fields, key)]
+        except (TypeError, ValueError, UnicodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if any(value is None for value in values):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        scheme, netloc, path, query, fragment = parse.urlsplit(url)
+        query_params = parse.parse_qs(query, keep_blank_values=True)
+        query_params[self.cursor_query_param] = [self.encode_cursor(self.page[-1])]
+        query_params[self.page_size_query_param] = [str(self.page_size)]
+        return parse.urlunsplit((scheme, netloc, path, parse.urlencode(query_params, doseq=True), fragment))
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param, 'required': False, 'in': 'query',
+                'description': 'Cursor from the next link of the previous page.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param, 'required': False, 'in': 'query',
+                'description': f'Page size, at most {self.max_page_size}.'
+                               + (' Paginates the list when given.' if self.optional else ''),
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+class OffsetPagination(BasePagination):
+    """Paginate ranked results with offset and limit, without counting them.
+
+    For short ranked lists such as search results, which have no stable
+    key to page on and where a COUNT would cost more than the page.
+    """
+    default_limit = 20
+    max_limit = 50
+    max_offset = 1000
+    limit_query_param = 'limit'
+    offset_query_param = 'offset'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self._param(self.limit_query_param, self.default_limit, 1, self.max_limit)
+        self.offset = self._param(self.offset_query_param, 0, 0, self.max_offset)
+        rows = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        return rows[:self.limit]
+
+    def _param(self, name, default, low, high):
+        try:
+            value = int(self.request.query_params.get(name, default))
+        except ValueError:
+            return default
+        return min(max(value, low), high)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        scheme, netloc, path, query, fragment = parse.urlsplit(url)
+        query_params = parse.parse_qs(query, keep_blank_values=True)
+        query_params[self.offset_query_param] = [str(self.offset + self.limit)]
+        query_params[self.limit_query_param] = [str(self.limit)]
+        return parse.urlunsplit((scheme, netloc, path, parse.urlencode(query_params, doseq=True), fragment))
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.limit_query_param, 'required': False, 'in': 'query',
+                'description': f'Results per page, at most {self.max_limit}.',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.offset_query_param, 'required': False, 'in': 'query',
+                'description': 'Number of results to skip.',
+                'schema': {'type': 'integer'},
+            },
+        ]
@@ -0,0 +1,232 @@
+"""
+Monthly range partitioning of core_post on PostgreSQL.
+
+core_post is partitioned by created_at into one partition per month, named
+core_post_pYYYY_MM, plus core_post_default for rows outside every range.
+The primary key becomes (id, created_at) as PostgreSQL requires, so the
+m2m tables no longer have a foreign key to core_post; the ORM still
+cascades deletes to them.
+
+Queries filtering created_at with constant bounds, as
+Post.objects.created_between does, only scan the partitions in range.
+Other databases keep a plain table and every function here is a no-op.
+"""
+import gzip
+import os
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection as default_connection, transaction
+from django.utils import timezone
+
+TABLE = 'core_post'
+DEFAULT_PARTITION = f'{TABLE}_default'
+LINK_TABLES = ('core_post_hashtags', 'core_post_tags')
+# Tables with rows per post, archived and deleted with their partition.
+POST_ROW_TABLES = LINK_TABLES + ('core_mention',)
+# Link table -> (table with a post_count, its column in the link table).
+COUNTED_LINKS = {'core_post_hashtags': ('core_hashtag', 'hashtag_id'), 'core_post_tags': ('core_tag', 'tag_id')}
+
+
+def month_start(value):
+    """Return midnight UTC of the first day of value's month."""
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month.year:04d}_{month.month:02d}'
+
+
+def is_postgres(connection=None):
+    return (connection or default_connection).vendor == 'postgresql'
+
+
+def is_partitioned(connection=None):
+    """Return whether core_post is a partitioned table on connection."""
+    connection = connection or default_connection
+    if not is_postgres(connection):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(connection=None):
+    """Return (name, month) of the monthly partitions, oldest first."""
+    connection = connection or default_connection
+    if not is_partitioned(connection):
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = to_regclass(%s)', [TABLE]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = []
+    for name in names:
+        if name == DEFAULT_PARTITION:
+            continue
+        year, month = name[len(TABLE) + 2:].split('_')
+        partitions.append((name, datetime(int(year), int(month), 1, tzinfo=dt_timezone.utc)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def create_partition(cursor, month):
+    """Create the partition for month if it does not exist yet.
+
+    Rows of that month already in the default partition are moved into
+    the new partition before it is attached.
+    """
+    name = partition_name(month)
+    bounds = [month, add_months(month, 1)]
+    cursor.execute('SELECT to_regclass(%s)', [name])
+    if cursor.fetchone()[0] is not None:
+        return name
+
+    cursor.execute(
+        f'SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s)', bounds
+    )
+    if not cursor.fetchone()[0]:
+        cursor.execute(f'CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)', bounds)
+        return name
+
+    cursor.execute(f'CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS)')
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s RETURNING *) '
+        f'INSERT INTO {name} SELECT * FROM moved', bounds
+    )
+    cursor.execute(f'ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)', bounds)
+    return name
+
+
+def ensure_future_partitions(months_ahead=None, connection=None):
+    """Create partitions from the current month to months_ahead months ahead."""
+    connection = connection or default_connection
+    if not is_partitioned(connection):
+        return []
+    if months_ahead is None:
+        months_ahead = settings.POST_PARTITIONS.get('MONTHS_AHEAD', 3)
+    current = month_start(timezone.now())
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        return [create_partition(cursor, add_months(current, n)) for n in range(months_ahead + 1)]
+
+
+def partition(connection, months_ahead=3):
+    """Turn core_post into a table partitioned by month, keeping its rows."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {TABLE}_unpartitioned')
+        cursor.execute(
+            f'ALTER TABLE {TABLE}_unpartitioned RENAME CONSTRAINT {TABLE}_pkey TO {TABLE}_unpartitioned_pkey'
+        )
+        cursor.execute(
+            f'CREATE TABLE {TABLE} (LIKE {TABLE}_unpartitioned INCLUDING DEFAULTS) '
+            f'PARTITION BY RANGE (created_at)'
+        )
+        cursor.execute(f'ALTER TABLE {TABLE} ADD PRIMARY KEY (id, created_at)')
+        cursor.execute(f'ALTER SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id')
+        cursor.execute(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT')
+
+        cursor.execute(f'SELECT min(created_at) FROM {TABLE}_unpartitioned')
+        oldest = cursor.fetchone()[0] or timezone.now()
+        month, last = month_start(oldest), add_months(month_start(timezone.now()), months_ahead)
+        while month <= last:
+            create_partition(cursor, month)
+            month = add_months(month, 1)
+
+        cursor.execute(f'INSERT INTO {TABLE} SELECT * FROM {TABLE}_unpartitioned')
+        _drop_foreign_keys_to(cursor, f'{TABLE}_unpartitioned')
+        cursor.execute(f'DROP TABLE {TABLE}_unpartitioned')
+        _add_user_key(cursor)
+
+
+def unpartition(connection):
+    """Turn the partitioned core_post back into a plain table."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE TABLE {TABLE}_plain (LIKE {TABLE} INCLUDING DEFAULTS)')
+        cursor.execute(f'INSERT INTO {TABLE}_plain SELECT * FROM {TABLE}')
+        cursor.execute(f'ALTER SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}_plain.id')
+        cursor.execute(f'DROP TABLE {TABLE} CASCADE')
+        cursor.execute(f'ALTER TABLE {TABLE}_plain RENAME TO {TABLE}')
+        cursor.execute(f'ALTER TABLE {TABLE} ADD PRIMARY KEY (id)')
+        _add_user_key(cursor)
+        for link in LINK_TABLES:
+            cursor.execute(
+                f'ALTER TABLE {link} ADD CONSTRAINT {link}_post_id_fk_{TABLE}_id '
+                f'FOREIGN KEY (post_id) REFERENCES {TABLE} (id) DEFERRABLE INITIALLY DEFERRED'
+            )
+
+
+def _drop_foreign_keys_to(cursor, table):
+    cursor.execute(
+        'SELECT conrelid::regclass::text, conname FROM pg_constraint '
+        "WHERE contype = 'f' AND confrelid = to_regclass(%s)", [table]
+    )
+    for owner, name in cursor.fetchall():
+        cursor.execute(f'ALTER TABLE {owner} DROP CONSTRAINT {name}')
+
+
+def _add_user_key(cursor):
+    cursor.execute(
+        f'ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_user_id_fk_core_user_id '
+        f'FOREIGN KEY (user_id) REFERENCES core_user (id) DEFERRABLE INITIALLY DEFERRED'
+    )
+    cursor.execute(f'CREATE INDEX {TABLE}_user_id_idx ON {TABLE} (user_id)')
+
+
+def archive_partition(name, archive_dir=None, drop=False, connection=None):
+    """Detach a monthly partition and save its rows to archive_dir.
+
+    Posts and their m2m and mention rows are written as gzipped CSV. The
+    m2m and mention rows are deleted and the post counts of the hashtags
+    and tags they linked recomputed; the detached table is dropped when
+    drop is set and kept otherwise. Returns the paths written.
+    """
+    connection = connection or default_connection
+    archive_dir = archive_dir or settings.POST_PARTITIONS['ARCHIVE_DIR']
+    os.makedirs(archive_dir, exist_ok=True)
+    paths = []
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {TABLE} DETACH PARTITION {name}')
+        queries = [(name, f'SELECT * FROM {name}')] + [
+            (link, f'SELECT * FROM {link} WHERE post_id IN (SELECT id FROM {name})') for link in POST_ROW_TABLES
+        ]
+        for table, query in queries:
+            path = os.path.join(archive_dir, f'{name}.{table}.csv.gz')
+            with gzip.open(path, 'wb') as f:
+                cursor.copy_expert(f'COPY ({query}) TO STDOUT WITH CSV HEADER', f)
+            paths.append(path)
+        deleted_ids = {}
+        for link in POST_ROW_TABLES:
+            returning = f' RETURNING {COUNTED_LINKS[link][1]}' if link in COUNTED_LINKS else ''
+            cursor.execute(f'DELETE FROM {link} WHERE post_id IN (SELECT id FROM {name}){returning}')
+            if returning:
+                deleted_ids[link] = sorted({row[0] for row in cursor.fetchall()})
+        # The deletes bypass core.counters, so recount what they unlinked.
+        for link, (counted, column) in COUNTED_LINKS.items():
+            _recount(cursor, counted, link, column, deleted_ids[link])
+        if drop:
+            cursor.execute(f'DROP TABLE {name}')
+    return paths
+
+
+def _recount(cursor, counted, link, column, ids):
+    """Set the post_count of the ids of table counted from the rows left in link."""
+    if ids:
+        cursor.execute(
+            f'UPDATE {counted} SET post_count = '
+            f'(SELECT count(*) FROM {link} WHERE {link}.{column} = {counted}.id) WHERE id = ANY(%s)', [ids]
+        )
+
+
+def post_migrate_partitions(sender, using='default', **kwargs):
+    """post_migrate receiver keeping future partitions in place."""
+    from django.db import connections
+
+    ensure_future_partitions(connection=connections[using])
@@ -0,0 +1,85 @@
+"""
+On-demand request profiling.
+
+Profiles are written as .pstats files, which snakeviz, gprof2dot or
+flameprof turn into call graphs and flame graphs. When memory profiling is
+requested a .txt file with the top tracemalloc allocation sites is written
+next to it.
+"""
+import cProfile
+import os
+import re
+import tracemalloc
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+from django.utils.text import slugify
+
+PROFILE_NAME = re.compile(r'^[\w-]+\.(pstats|txt)$')
+
+
+def profile_dir():
+    return settings.PROFILING['DIR']
+
+
+def _profile_name(request):
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+    path = slugify(request.path.replace('/', '-'))[:60] or 'root'
+    return f'{stamp}-{request.method.lower()}-{path}-{uuid.uuid4().hex[:8]}'
+
+
+def run_profiled(request, get_response, memory=False):
+    """Call get_response under cProfile, save the result and return both."""
+    started_tracing = memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(settings.PROFILING.get('TRACEMALLOC_FRAMES', 10))
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        response = get_response(request)
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot() if memory else None
+        if started_tracing:
+            tracemalloc.stop()
+
+    name = _profile_name(request)
+    os.makedirs(profile_dir(), exist_ok=True)
+    profiler.dump_stats(os.path.join(profile_dir(), f'{name}.pstats'))
+    if snapshot is not None:
+        _dump_snapshot(snapshot, os.path.join(profile_dir(), f'{name}.txt'))
+    prune()
+
+    return response, name
+
+
+def _dump_snapshot(snapshot, path, limit=50):
+    with open(path, 'w') as f:
+        for stat in snapshot.statistics('lineno')[:limit]:
+            f.write(f'{stat}\n')
+
+
+def list_profiles():
+    """Return saved profile file names, newest first."""
+    try:
+        names = [name for name in os.listdir(profile_dir()) if PROFILE_NAME.match(name)]
+    except FileNotFoundError:
+        return []
+    return sorted(names, reverse=True)
+
+
+def profile_path(name):
+    """Return the path of a saved profile, or None if the name is invalid."""
+    if not PROFILE_NAME.match(name):
+        return None
+    path = os.path.join(profile_dir(), name)
+    return path if os.path.exists(path) else None
+
+
+def prune():
+    """Delete the oldest profiles beyond the configured maximum."""
+    keep = settings.PROFILING.get('MAX_FILES', 200)
+    for name in list_profiles()[keep:]:
+        os.remove(os.path.join(profile_dir(), name))
@@ -0,0 +1,105 @@
+"""
+Deferred deletion of users.
+
+Deleting a user outright makes Django collect every post, hashtag, tag and
+m2m row of the account in memory and delete them in one transaction.
+Instead accounts are soft-deleted: deactivated and stamped with
+deleted_at, which hides them at once since logins and tokens only work for
+active users. purge_user later deletes their rows a chunk at a time, one
+short transaction per chunk with a pause in between, and the user row
+last. No progress is kept between chunks, so an interrupted purge simply
+resumes with whatever rows remain. Soft deletion queues the purge to run
+after the grace period; purge_deleted_users sweeps up any it missed.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from core import sharding, tasks  # noqa
+
+
+def soft_delete_user(user):
+    """Hide the account of user until it is purged."""
+    user.is_active = False
+    user.deleted_at = timezone.now()
+    user.save(update_fields=['is_active', 'deleted_at'])
+    Token.objects.filter(user=user).delete()
+    tasks.enqueue(purge_deleted_user, [user.pk], countdown=settings.USER_PURGE['GRACE_HOURS'] * 3600)
+
+
+def _delete_files(names):
+    for name in names:
+        default_storage.delete(name)
+
+
+def _delete_chunk(model, alias, user_id, chunk_size, column='user_id'):
+    """Delete up to chunk_size rows of user_id from alias, then their files."""
+    file_fields = [f.attname for f in model._meta.concrete_fields if isinstance(f, models.FileField)]
+    with transaction.atomic(using=alias):
+        queryset = model.objects.using(alias).filter(**{column: user_id}).order_by('pk')
+        rows = list(queryset.values_list('pk', *file_fields)[:chunk_size])
+        if not rows:
+            return 0
+        # m2m rows of the chunk go with it and are bounded by it too.
+        model.objects.using(alias).filter(pk__in=[row[0] for row in rows]).delete()
+        names = [name for row in rows for name in row[1:] if name]
+        if names:
+            transaction.on_commit(lambda: _delete_files(names), using=alias)
+    return len(rows)
+
+
+def purge_user(user_id, chunk_size=None, pause=None, log=None):
+    """Delete a soft-deleted user and everything they own, chunk by chunk.
+
+    Returns the number of posts, hashtags, tags and mentions of the user
+    deleted.
+    """
+    from core.models import HashTag, Mention, Post, Tag, User
+
+    config = settings.USER_PURGE
+    chunk_size = chunk_size or config['CHUNK_SIZE']
+    pause = config['PAUSE_SECONDS'] if pause is None else pause
+    log = log or (lambda message: None)
+    if not User.objects.filter(pk=user_id, deleted_at__isnull=False).exists():
+        raise ValueError(f'User {user_id} is not soft-deleted.')
+
+    total = 0
+    for alias in sharding.shard_aliases():
+        for model, column in ((Post, 'user_id'), (HashTag, 'user_id'), (Tag, 'user_id'), (Mention, 'mentioned_id')):
+            count = 0
+            while True:
+                deleted = _delete_chunk(model, alias, user_id, chunk_size, column)
+                if not deleted:
+                    break
+                count += deleted
+                time.sleep(pause)
+            if count:
+                log(f'{alias}: deleted {count} {model._meta.verbose_name_plural}')
+            total += count
+
+    User.objects.filter(pk=user_id, deleted_at__isnull=False).delete()
+    return total
+
+
+@tasks.task(priority=-10)
+def purge_deleted_user(user_id):
+    """Task purging user_id unless the account was restored meanwhile."""
+    from core.models import User
+
+    if User.objects.filter(pk=user_id, deleted_at__isnull=False).exists():
+        purge_user(user_id)
+
+
+def purgeable_users(grace_hours=None):
+    """Return ids of users soft-deleted more than grace_hours ago, oldest first."""
+    from core.models import User
+
+    if grace_hours is None:
+        grace_hours = settings.USER_PURGE['GRACE_HOURS']
+    cutoff = timezone.now() - timedelta(hours=grace_hours)
+    return list(User.objects.filter(deleted_at__lte=cutoff).order_by('deleted_at').values_list('pk', flat=True))
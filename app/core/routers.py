@@ -0,0 +1,132 @@
+"""
+Database routers.
+
+ShardRouter sends user-owned models to the shard of their owner.
+ReplicaRouter sends reads to a replica only while a request marked safe by
+ReplicaRoutingMiddleware is running; everything else, and every write, goes
+to the primary.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from core import sharding
+
+_read_alias = ContextVar('read_alias', default=None)
+_lag_cache = {}
+
+LAG_SQL = {
+    'postgresql': (
+        'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+        'ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END'
+    ),
+}
+
+
+def replica_aliases():
+    return settings.READ_REPLICAS.get('ALIASES', [])
+
+
+def read_alias():
+    """Return the replica chosen for the running request, or None."""
+    return _read_alias.get()
+
+
+def set_read_alias(alias):
+    """Route the remaining reads of the current context to alias."""
+    _read_alias.set(alias)
+
+
+@contextmanager
+def use_replica(alias):
+    """Route reads in the block to the given alias."""
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def replica_lag(alias):
+    """Return replication lag of alias in seconds, cached per process.
+
+    Returns None when the replica cannot be reached. Databases without a
+    lag query report no lag.
+    """
+    now = time.monotonic()
+    cached = _lag_cache.get(alias)
+    if cached and now - cached[0] < settings.READ_REPLICAS.get('LAG_CHECK_INTERVAL', 5):
+        return cached[1]
+
+    connection = connections[alias]
+    sql = LAG_SQL.get(connection.vendor)
+    lag = 0.0
+    if sql:
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(sql)
+                lag = float(cursor.fetchone()[0])
+        except DatabaseError:
+            lag = None
+    _lag_cache[alias] = (now, lag)
+    return lag
+
+
+def choose_replica():
+    """Return a replica within the allowed lag, or None to use the primary."""
+    max_lag = settings.READ_REPLICAS.get('MAX_LAG_SECONDS')
+    candidates = list(replica_aliases())
+    random.shuffle(candidates)
+    for alias in candidates:
+        if max_lag is None:
+            return alias
+        lag = replica_lag(alias)
+        if lag is not None and lag <= max_lag:
+            return alias
+    return None
+
+
+class ShardRouter:
+    """Route user-owned models to the shard of their owner.
+
+    The shard comes from the instance hint when there is one, and otherwise
+    from the shard set for the running request by ShardedViewMixin. Other
+    models fall through to the next router.
+    """
+
+    def _shard(self, model, hints):
+        if not sharding.sharding_enabled() or not sharding.is_sharded(model):
+            return None
+        return sharding.shard_from_hints(hints) or sharding.current_shard()
+
+    def db_for_read(self, model, **hints):
+        return self._shard(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+class ReplicaRouter:
+    """Route reads of safe requests to replicas and everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replica_aliases()
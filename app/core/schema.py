@@ -0,0 +1,69 @@
+"""
+Precomputed OpenAPI schema.
+
+build_schema writes the schema to OPENAPI_SCHEMA['DIR'] when the image is
+built, and the schema view serves those files with an ETag. Without them,
+as in development, the schema is generated on the first request and kept
+for the life of the process. drf_spectacular is only imported then, so
+workers do not load it at boot.
+"""
+import hashlib
+import os
+import threading
+
+from django.conf import settings
+
+FORMATS = {
+    'yaml': ('openapi.yaml', 'application/vnd.oai.openapi'),
+    'json': ('openapi.json', 'application/vnd.oai.openapi+json'),
+}
+
+_loaded = {}
+_lock = threading.Lock()
+
+
+def schema_path(fmt):
+    return os.path.join(settings.OPENAPI_SCHEMA['DIR'], FORMATS[fmt][0])
+
+
+def generate(fmt):
+    """Introspect the API and return the rendered schema as bytes."""
+    from drf_spectacular.generators import SchemaGenerator
+    from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+
+    schema = SchemaGenerator().get_schema(request=None, public=True)
+    renderer = OpenApiJsonRenderer() if fmt == 'json' else OpenApiYamlRenderer()
+    return renderer.render(schema, renderer_context={})
+
+
+def write(directory=None):
+    """Write every format to directory and return the paths."""
+    directory = directory or settings.OPENAPI_SCHEMA['DIR']
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for fmt, (name, _) in FORMATS.items():
+        path = os.path.join(directory, name)
+        with open(f'{path}.tmp', 'wb') as f:
+            f.write(generate(fmt))
+        os.replace(f'{path}.tmp', path)
+        paths.append(path)
+    return paths
+
+
+def load(fmt):
+    """Return (content, etag) of the schema, read or generated once."""
+    with _lock:
+        if fmt not in _loaded:
+            try:
+                with open(schema_path(fmt), 'rb') as f:
+                    content = f.read()
+            except FileNotFoundError:
+                content = generate(fmt)
+            _loaded[fmt] = (content, f'"{hashlib.sha256(content).hexdigest()[:32]}"')
+        return _loaded[fmt]
+
+
+def reset():
+    """Forget loaded schemas."""
+    with _lock:
+        _loaded.clear()
@@ -0,0 +1,211 @@
+"""
+Deterministic synthetic social graph generator.
+
+Users are split into fixed size chunks and every chunk is generated from its
+own seeded random generator, so the dataset is identical no matter how many
+worker processes insert it.
+"""
+import multiprocessing
+import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+
+from core import mentions  # noqa
+from core.models import User, Post, CanonicalHashTag, HashTag, Tag  # noqa
+
+SEED_PASSWORD = 'seedpass123'
+WORDS = ['lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'adipiscing',
+         'elit', 'sed', 'do', 'eiusmod', 'tempor', 'incididunt', 'labore']
+
+
+@dataclass
+class SeedConfig:
+    """Scale knobs for a generated dataset.
+
+    ``skew`` controls how unequal the data is: 0 gives every user exactly
+    ``posts_per_user`` posts and picks hashtags and mentions uniformly, larger
+    values give a power-law where a few users write most posts and a few
+    hashtags and accounts get most of the attention.
+    """
+    users: int = 1000
+    posts_per_user: float = 10
+    hashtags_per_post: int = 2
+    mention_density: float = 0.5
+    hashtag_vocabulary: int = 1000
+    skew: float = 1.5
+    seed: int = 0
+    chunk_size: int = 1000
+    batch_size: int = 5000
+    prefix: str = 'user'
+    password: str = SEED_PASSWORD
+
+
+def username_for(config, n):
+    """Return the deterministic username of the n-th seeded user."""
+    return f'{config.prefix}{n}'
+
+
+def _skewed_index(rng, size, skew):
+    """Pick an index in range(size), favouring low indices as skew grows."""
+    return min(int(size * rng.random() ** (1 + skew)), size - 1)
+
+
+def _post_count(rng, config):
+    """Return the number of posts for one user, with mean posts_per_user."""
+    if not config.skew:
+        return int(config.posts_per_user)
+    alpha = 1 + 1 / config.skew
+    scale = config.posts_per_user * (alpha - 1) / alpha
+    return min(int(scale * rng.paretovariate(alpha)), int(config.posts_per_user * 100))
+
+
+def _sample(rng, size, count, skew):
+    """Return up to count distinct skewed indices in range(size)."""
+    count = min(count, size)
+    if not skew:
+        return rng.sample(range(size), count)
+    picked = []
+    while len(picked) < count:
+        index = _skewed_index(rng, size, skew)
+        if index not in picked:
+            picked.append(index)
+    return picked
+
+
+def _mention_count(rng, density):
+    whole = int(density)
+    return whole + (1 if rng.random() < density - whole else 0)
+
+
+def generate_chunk(config, chunk, first_id, password_hash):
+    """Insert the users of one chunk with their posts, hashtags and tags.
+
+    Returns the number of rows inserted per model.
+    """
+    start = chunk * config.chunk_size
+    stop = min(start + config.chunk_size, config.users)
+    rng = random.Random(f'{config.seed}:{chunk}')
+
+    users, plans = [], []
+    for n in range(start, stop):
+        username = username_for(config, n)
+        users.append(User(id=first_id + n, email=f'{username}@example.com', first_name='Seed',
+                          last_name=f'User{n}', username=username, password=password_hash))
+        posts = []
+        for p in range(_post_count(rng, config)):
+            hashtags = [f'#tag{i}' for i in _sample(rng, config.hashtag_vocabulary,
+                                                    config.hashtags_per_post, config.skew)]
+            count = _mention_count(rng, config.mention_density)
+            mentioned = [username_for(config, i) for i in _sample(rng, config.users, count + 1, config.skew)
+                         if i != n][:count]
+            body = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 40)))
+            body = ' '.join([body] + [f'@{name}' for name in mentioned])
+            posts.append((f'Post {p} by {username}', body, hashtags, mentioned))
+        plans.append(posts)
+
+    with transaction.atomic():
+        User.objects.bulk_create(users, batch_size=config.batch_size)
+
+        names = sorted({name for posts in plans for post in posts for name in post[2]})
+        CanonicalHashTag.objects.bulk_create([CanonicalHashTag(name=CanonicalHashTag.key(name)) for name in names],
+                                             batch_size=config.batch_size, ignore_conflicts=True)
+        # The m2m rows are bulk inserted below without signals, so set the counts here.
+        hashtag_counts = [Counter(name for post in posts for name in post[2]) for posts in plans]
+        tag_counts = [Counter(name for post in posts for name in post[3]) for posts in plans]
+        HashTag.objects.bulk_create([
+            HashTag(user_id=user.id, name=name, canonical_id=CanonicalHashTag.key(name), post_count=counts[name])
+            for user, counts in zip(users, hashtag_counts)
+            for name in sorted(counts)
+        ], batch_size=config.batch_size)
+        Tag.objects.bulk_create([
+            Tag(user_id=user.id, somebody=name, post_count=counts[name])
+            for user, counts in zip(users, tag_counts)
+            for name in sorted(counts)
+        ], batch_size=config.batch_size)
+        Post.objects.bulk_create([
+            Post(user_id=user.id, title=title, body=body)
+            for user, posts in zip(users, plans)
+            for title, body, _, _ in posts
+        ], batch_size=config.batch_size)
+
+        in_chunk = {'user_id__gte': users[0].id, 'user_id__lte': users[-1].id}
+        hashtag_ids = {(user_id, name): pk for pk, user_id, name in HashTag.objects.filter(
+            **in_chunk).values_list('id', 'user_id', 'name')}
+        tag_ids = {(user_id, name): pk for pk, user_id, name in Tag.objects.filter(
+            **in_chunk).values_list('id', 'user_id', 'somebody')}
+        post_ids = Post.objects.filter(**in_chunk).order_by('user_id', 'id').values_list('id', flat=True)
+
+        post_hashtags, post_tags = [], []
+        planned = ((user.id, post) for user, posts in zip(users, plans) for post in posts)
+        for post_id, (user_id, (_, _, hashtags, mentioned)) in zip(post_ids.iterator(), planned):
+            post_hashtags.extend(Post.hashtags.through(post_id=post_id, hashtag_id=hashtag_ids[user_id, name])
+                                 for name in hashtags)
+            post_tags.extend(Post.tags.through(post_id=post_id, tag_id=tag_ids[user_id, name])
+                             for name in mentioned)
+        Post.hashtags.through.objects.bulk_create(post_hashtags, batch_size=config.batch_size)
+        Post.tags.through.objects.bulk_create(post_tags, batch_size=config.batch_size)
+
+    return {
+        'users': len(users),
+        'posts': sum(len(posts) for posts in plans),
+        'hashtags': len(post_hashtags),
+        'tags': len(post_tags),
+    }
+
+
+def _run_chunk(args):
+    return generate_chunk(*args)
+
+
+def seed(config, workers=1, progress=None):
+    """Generate the dataset described by config and return row totals.
+
+    With more than one worker the chunks are inserted by forked processes,
+    each on its own database connection.
+    """
+    password_hash = make_password(config.password, salt=f'seed{config.seed}')
+    first_id = (User.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+    chunks = range((config.users + config.chunk_size - 1) // config.chunk_size)
+    jobs = [(config, chunk, first_id, password_hash) for chunk in chunks]
+
+    # SQLite allows a single writer, parallel inserts would only contend for the lock.
+    if connection.vendor == 'sqlite':
+        workers = 1
+
+    totals = {'users': 0, 'posts': 0, 'hashtags': 0, 'tags': 0}
+    if workers > 1 and len(jobs) > 1:
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            results = pool.map(_run_chunk, jobs)
+            for result in results:
+                _add(totals, result, progress)
+    else:
+        for job in jobs:
+            _add(totals, _run_chunk(job), progress)
+
+    _reset_sequences()
+    # Mentioned users may be inserted by a later chunk, so mentions come last.
+    totals['mentions'] = mentions.backfill(config.batch_size)
+    return totals
+
+
+def _add(totals, result, progress):
+    for key, value in result.items():
+        totals[key] += value
+    if progress:
+        progress(totals)
+
+
+def _reset_sequences():
+    """Move the user id sequence past the explicitly assigned ids."""
+    statements = connection.ops.sequence_reset_sql(no_style(), [User])
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
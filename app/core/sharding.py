@@ -0,0 +1,362 @@
+"""
+Horizontal sharding of user-owned rows by user id.
+
+Posts, hashtags, tags, their many-to-many rows and mentions live on the
+shard assigned to their owner in ShardAssignment; users, tokens and everything else stay on
+``default``. Users are copied to every shard as a reference table so foreign
+keys to core_user hold on each of them.
+
+Sharding is active when settings.SHARDING['ALIASES'] lists more than one
+database. Users created before that have no assignment and keep their rows
+on ``default`` until move_user_shard moves them.
+"""
+import copy
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Max
+from django.db.models.base import ModelState
+from rest_framework import exceptions, status
+
+SHARDED_MODELS = {
+    'core.post', 'core.hashtag', 'core.tag', 'core.post_hashtags', 'core.post_tags', 'core.mention',
+    # Every shard holds the canonical hashtags its hashtags point to.
+    'core.canonicalhashtag',
+}
+SHARD_BITS = 6
+MAX_SHARDS = 1 << SHARD_BITS
+
+_current_shard = ContextVar('current_shard', default=None)
+
+
+class ShardMoving(exceptions.APIException):
+    """Writes are paused while the user's rows move to another shard."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Your data is being moved, please retry shortly.'
+    default_code = 'shard_moving'
+    wait = 5
+
+
+def shard_aliases():
+    return settings.SHARDING.get('ALIASES', [DEFAULT_DB_ALIAS])
+
+
+def sharding_enabled():
+    return len(shard_aliases()) > 1
+
+
+def is_sharded(model):
+    return model._meta.label_lower in SHARDED_MODELS
+
+
+def _cache_key(user_id):
+    return f'shard:{user_id}'
+
+
+def get_assignment(user_id):
+    """Return (alias, moving) for a user, cached for DIRECTORY_CACHE_SECONDS."""
+    from core.models import ShardAssignment
+
+    key = _cache_key(user_id)
+    cached = cache.get(key)
+    if cached is None:
+        row = ShardAssignment.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user_id).first()
+        cached = (row.alias, row.moving) if row else (DEFAULT_DB_ALIAS, False)
+        cache.set(key, cached, settings.SHARDING.get('DIRECTORY_CACHE_SECONDS', 5))
+    return tuple(cached)
+
+
+def shard_for_user(user_id):
+    """Return the alias holding the rows of user_id."""
+    if not sharding_enabled():
+        return DEFAULT_DB_ALIAS
+    return get_assignment(user_id)[0]
+
+
+def set_assignment(user_id, alias=None, moving=None):
+    """Create or change a user's assignment and drop the cached copy."""
+    from core.models import ShardAssignment
+
+    defaults = {}
+    if alias is not None:
+        defaults['alias'] = alias
+    if moving is not None:
+        defaults['moving'] = moving
+    ShardAssignment.objects.using(DEFAULT_DB_ALIAS).update_or_create(user_id=user_id, defaults=defaults)
+    cache.delete(_cache_key(user_id))
+
+
+def current_shard():
+    return _current_shard.get()
+
+
+def set_current_shard(alias):
+    _current_shard.set(alias)
+
+
+@contextmanager
+def use_shard(alias):
+    """Route sharded models without an instance hint to alias in the block."""
+    token = _current_shard.set(alias)
+    try:
+        yield
+    finally:
+        _current_shard.reset(token)
+
+
+def shard_from_hints(hints):
+    """Return the shard implied by a router instance hint, if any."""
+    instance = hints.get('instance')
+    if instance is None:
+        return None
+    if instance._state.db and is_sharded(type(instance)):
+        return instance._state.db
+    if instance._meta.label_lower == settings.AUTH_USER_MODEL.lower():
+        return shard_for_user(instance.pk)
+    user_id = getattr(instance, 'user_id', None)
+    return shard_for_user(user_id) if user_id is not None else None
+
+
+class ShardedViewMixin:
+    """Route the sharded queries of a view to the authenticated user's shard."""
+
+    def dispatch(self, request, *args, **kwargs):
+        with use_shard(None):
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if not sharding_enabled() or not request.user.is_authenticated:
+            return
+        alias, moving = get_assignment(request.user.pk)
+        if moving and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            raise ShardMoving()
+        set_current_shard(alias)
+
+
+class HiLoIdGenerator:
+    """Allocate globally unique ids that encode the shard in their low bits.
+
+    Each process reserves a block of BLOCK_SIZE ids at a time from the
+    IdBlock counter on the shard, so only one query is needed per block.
+    ``id & (MAX_SHARDS - 1)`` is the index of the shard in SHARDING['ALIASES'].
+    """
+
+    def __init__(self):
+        self._blocks = {}
+        self._lock = threading.Lock()
+
+    def next_id(self, model, alias):
+        index = shard_aliases().index(alias)
+        key = (model._meta.label_lower, alias)
+        with self._lock:
+            block = self._blocks.get(key)
+            if block is None or block[0] >= block[1]:
+                block = self._reserve(model, alias)
+            value = block[0]
+            self._blocks[key] = (value + 1, block[1])
+        return value << SHARD_BITS | index
+
+    def _reserve(self, model, alias):
+        from core.models import IdBlock
+
+        size = settings.SHARDING.get('BLOCK_SIZE', 1000)
+        name = model._meta.label_lower
+        with transaction.atomic(using=alias):
+            row = IdBlock.objects.using(alias).select_for_update().filter(name=name).first()
+            if row is None:
+                # Start above the existing autoincrement ids of the table.
+                last = model.objects.using(alias).aggregate(last=Max('id'))['last'] or 0
+                row = IdBlock.objects.using(alias).create(name=name, next_hi=(last >> SHARD_BITS) // size + 1)
+            hi = row.next_hi
+            IdBlock.objects.using(alias).filter(name=name).update(next_hi=hi + 1)
+        return hi * size, (hi + 1) * size
+
+
+id_generator = HiLoIdGenerator()
+
+
+def shard_index(pk):
+    """Return the index in SHARDING['ALIASES'] of the shard that created pk."""
+    return pk & (MAX_SHARDS - 1)
+
+
+def assign_id(sender, instance, raw=False, using=None, **kwargs):
+    """pre_save receiver giving new sharded rows a hi/lo id."""
+    if raw or instance.pk is not None or not is_sharded(sender):
+        return
+    instance.pk = id_generator.next_id(sender, using)
+
+
+def assign_shard(sender, instance, created, raw=False, **kwargs):
+    """post_save receiver assigning new users to a shard."""
+    if created and not raw:
+        aliases = shard_aliases()
+        set_assignment(instance.pk, alias=aliases[instance.pk % len(aliases)])
+
+
+def copy_user(user, alias):
+    """Insert or update a user row on another database."""
+    clone = copy.copy(user)
+    clone._state = ModelState()
+    clone.save(using=alias)
+
+
+def replicate_user(sender, instance, raw=False, using=None, **kwargs):
+    """post_save receiver copying users to every shard."""
+    if raw or using != DEFAULT_DB_ALIAS:
+        return
+    for alias in shard_aliases():
+        if alias != DEFAULT_DB_ALIAS:
+            copy_user(instance, alias)
+
+
+def delete_replicas(sender, instance, using=None, **kwargs):
+    """post_delete receiver removing a user from every shard."""
+    if using != DEFAULT_DB_ALIAS:
+        return
+    for alias in shard_aliases():
+        if alias != DEFAULT_DB_ALIAS:
+            sender.objects.using(alias).filter(pk=instance.pk).delete()
+
+
+def _is_link(model):
+    """Whether model links posts to other rows, with ids local to each database."""
+    return model._meta.auto_created or model._meta.label_lower == 'core.mention'
+
+
+def _owned(model, alias, user_id):
+    """Rows of user_id on alias, for a sharded model or through model."""
+    if _is_link(model):
+        return model.objects.using(alias).filter(post__user_id=user_id)
+    return model.objects.using(alias).filter(user_id=user_id)
+
+
+def _moved_models():
+    from core.models import HashTag, Mention, Post, Tag
+
+    return [HashTag, Tag, Post, Post.hashtags.through, Post.tags.through, Mention]
+
+
+def copy_canonical_hashtags(user_id, source, target):
+    """Create on target the canonical hashtags the hashtags of user_id use on source."""
+    from core.models import CanonicalHashTag, HashTag
+
+    names = _owned(HashTag, source, user_id).values_list('canonical_id', flat=True)
+    CanonicalHashTag.objects.using(target).bulk_create(
+        [CanonicalHashTag(name=name) for name in set(names)], ignore_conflicts=True,
+    )
+
+
+def sync_rows(model, user_id, source, target, chunk_size=1000):
+    """Make the rows of user_id on target match source, chunk by chunk.
+
+    Returns the number of rows inserted, updated and deleted on target.
+    """
+    if _is_link(model):
+        return _sync_links(model, user_id, source, target, chunk_size)
+    fields = [f for f in model._meta.concrete_fields if not f.primary_key]
+    names = [f.attname for f in fields]
+    changed = 0
+    seen = set()
+    last = None
+    while True:
+        qs = _owned(model, source, user_id).order_by('pk')
+        if last is not None:
+            qs = qs.filter(pk__gt=last)
+        rows = list(qs[:chunk_size])
+        if not rows:
+            break
+        last = rows[-1].pk
+        pks = [row.pk for row in rows]
+        seen.update(pks)
+        existing = {row.pk: row for row in model.objects.using(target).filter(pk__in=pks)}
+        missing = [row for row in rows if row.pk not in existing]
+        stale = [
+            row for row in rows
+            if row.pk in existing and any(getattr(row, n) != getattr(existing[row.pk], n) for n in names)
+        ]
+        model.objects.using(target).bulk_create(missing)
+        if stale:
+            model.objects.using(target).bulk_update(stale, [f.name for f in fields])
+        changed += len(missing) + len(stale)
+
+    extra = list(_owned(model, target, user_id).exclude(pk__in=seen).values_list('pk', flat=True))
+    for start in range(0, len(extra), chunk_size):
+        model.objects.using(target).filter(pk__in=extra[start:start + chunk_size]).delete()
+    return changed + len(extra)
+
+
+def _sync_links(model, user_id, source, target, chunk_size):
+    """Sync m2m and mention rows as sets of values; their ids are local to each database."""
+    columns = [f.attname for f in model._meta.concrete_fields if not f.primary_key]
+    wanted = set(_owned(model, source, user_id).values_list(*columns))
+    present = dict(
+        (tuple(row[1:]), row[0]) for row in _owned(model, target, user_id).values_list('pk', *columns)
+    )
+    missing = [model(**dict(zip(columns, pair))) for pair in wanted - present.keys()]
+    extra = [pk for pair, pk in present.items() if pair not in wanted]
+    model.objects.using(target).bulk_create(missing, batch_size=chunk_size)
+    for start in range(0, len(extra), chunk_size):
+        model.objects.using(target).filter(pk__in=extra[start:start + chunk_size]).delete()
+    return len(missing) + len(extra)
+
+
+def delete_rows(user_id, alias, chunk_size=1000):
+    """Delete the sharded rows of user_id from alias in chunks."""
+    for model in reversed(_moved_models()):
+        while True:
+            pks = list(_owned(model, alias, user_id).values_list('pk', flat=True)[:chunk_size])
+            if not pks:
+                break
+            model.objects.using(alias).filter(pk__in=pks).delete()
+
+
+def move_user(user_id, target, chunk_size=1000, pause=None, log=None):
+    """Move the posts, hashtags and tags of user_id to the target shard.
+
+    Rows are copied while the user keeps writing, then a catch-up pass
+    copies what changed meanwhile. Writes are then refused with 503 for a
+    short freeze while a final pass reconciles both sides and the directory
+    is switched to target. Source rows are deleted last.
+    """
+    from core.models import User
+
+    log = log or (lambda message: None)
+    source = get_assignment(user_id)[0]
+    if source == target:
+        return 0
+    if pause is None:
+        pause = settings.SHARDING.get('DIRECTORY_CACHE_SECONDS', 5)
+    if target != DEFAULT_DB_ALIAS:
+        copy_user(User.objects.using(DEFAULT_DB_ALIAS).get(pk=user_id), target)
+
+    total = 0
+    for label in ('copy', 'catch-up'):
+        copy_canonical_hashtags(user_id, source, target)
+        count = sum(sync_rows(model, user_id, source, target, chunk_size) for model in _moved_models())
+        log(f'{label}: {count} rows')
+        total += count
+
+    set_assignment(user_id, moving=True)
+    try:
+        # Every process must see the freeze before the final pass starts.
+        time.sleep(pause)
+        with transaction.atomic(using=target):
+            copy_canonical_hashtags(user_id, source, target)
+            count = sum(sync_rows(model, user_id, source, target, chunk_size) for model in _moved_models())
+        log(f'reconcile: {count} rows')
+        total += count
+        set_assignment(user_id, alias=target, moving=False)
+    except BaseException:
+        set_assignment(user_id, moving=False)
+        raise
+
+    delete_rows(user_id, source, chunk_size)
+    log(f'deleted rows from {source}')
+    return total
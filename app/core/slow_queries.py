@@ -0,0 +1,163 @@
+"""
+Slow query observer.
+
+An execute wrapper installed on every database connection times each
+statement. Statements slower than the threshold are stored as SlowQuery
+rows, browsable in the admin, together with the view that ran them, the
+calling line of app code and the plan: ``EXPLAIN (ANALYZE, BUFFERS)`` on
+PostgreSQL and ``EXPLAIN QUERY PLAN`` on SQLite. Only SELECT statements are
+explained, since ANALYZE executes the statement again.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import traceback
+from collections import deque
+from contextvars import ContextVar
+from functools import partial
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+current_view = ContextVar('current_view', default='')
+_capturing = ContextVar('capturing_slow_query', default=False)
+
+
+def fingerprint(sql):
+    return hashlib.md5(sql.encode()).hexdigest()
+
+
+def explain(connection, sql, params, analyze=True):
+    """Return the plan of a SELECT statement as text."""
+    if connection.vendor == 'postgresql':
+        prefix = 'EXPLAIN (ANALYZE, BUFFERS) ' if analyze else 'EXPLAIN '
+    elif connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        prefix = 'EXPLAIN '
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        rows = cursor.fetchall()
+    if connection.vendor == 'sqlite':
+        return '\n'.join(str(row[-1]) for row in rows)
+    return '\n'.join(' '.join(str(column) for column in row) for row in rows)
+
+
+def _calling_location():
+    """Return file:line of the innermost app frame outside this module."""
+    base = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith(base) and frame.filename != __file__:
+            return f'{os.path.relpath(frame.filename, base)}:{frame.lineno}'
+    return ''
+
+
+def _save(record):
+    token = _capturing.set(True)
+    try:
+        record.save()
+    except DatabaseError:
+        pass
+    finally:
+        _capturing.reset(token)
+
+
+class SlowQueryObserver:
+    """Execute wrapper capturing statements slower than threshold_ms.
+
+    At most max_per_minute statements are captured per process, and the
+    same statement is captured at most once every fingerprint_interval
+    seconds.
+    """
+
+    def __init__(self, threshold_ms=200, max_per_minute=10, fingerprint_interval=300, analyze=True):
+        self.threshold = threshold_ms / 1000
+        self.max_per_minute = max_per_minute
+        self.fingerprint_interval = fingerprint_interval
+        self.analyze = analyze
+        self._recent = deque()
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        if _capturing.get():
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        elapsed = time.perf_counter() - start
+
+        if elapsed >= self.threshold and not many:
+            digest = fingerprint(sql)
+            if self._allow(digest):
+                self.capture(context['connection'], sql, params, elapsed, digest)
+        return result
+
+    def _allow(self, digest):
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            if len(self._recent) >= self.max_per_minute:
+                return False
+            last = self._seen.get(digest)
+            if last is not None and now - last < self.fingerprint_interval:
+                return False
+            if len(self._seen) > 10_000:
+                self._seen.clear()
+            self._recent.append(now)
+            self._seen[digest] = now
+            return True
+
+    def capture(self, connection, sql, params, elapsed, digest):
+        from core.models import SlowQuery
+
+        token = _capturing.set(True)
+        try:
+            plan = ''
+            if sql.lstrip()[:6].upper() == 'SELECT' and not connection.needs_rollback:
+                try:
+                    plan = explain(connection, sql, params, analyze=self.analyze)
+                except DatabaseError as e:
+                    plan = f'EXPLAIN failed: {e}'
+
+            record = SlowQuery(
+                fingerprint=digest,
+                sql=sql,
+                params=json.dumps(params, default=str),
+                duration_ms=elapsed * 1000,
+                view=current_view.get(),
+                location=_calling_location(),
+                database=connection.alias,
+                plan=plan,
+            )
+            transaction.on_commit(partial(_save, record), using=connection.alias)
+        finally:
+            _capturing.reset(token)
+
+
+def install(sender, connection, **kwargs):
+    """connection_created receiver adding the observer to new connections."""
+    observer = get_observer()
+    if observer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(observer)
+
+
+_observer = None
+
+
+def get_observer():
+    """Return the process wide observer configured by settings.SLOW_QUERIES."""
+    global _observer
+    if _observer is None:
+        config = settings.SLOW_QUERIES
+        _observer = SlowQueryObserver(
+            threshold_ms=config.get('THRESHOLD_MS', 200),
+            max_per_minute=config.get('MAX_PER_MINUTE', 10),
+            fingerprint_interval=config.get('FINGERPRINT_INTERVAL', 300),
+            analyze=config.get('ANALYZE', True),
+        )
+    return _observer
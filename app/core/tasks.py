@@ -0,0 +1,190 @@
+"""
+Database task queue.
+
+Work that can wait until after the response is stored as a Task row and
+run by ``manage.py run_workers``, so no broker is needed. Workers claim
+due tasks in batches with SELECT ... FOR UPDATE SKIP LOCKED, highest
+priority first, and mark them running before committing; any number of
+workers can share the table without two of them getting the same task.
+
+A task is deleted once it succeeds. A failing task is retried with
+exponential backoff until it has used max_attempts, then kept as failed
+for inspection in the admin. A worker dying mid-task leaves it running; it
+is claimed again after STALE_SECONDS, so tasks must be safe to repeat.
+Database errors while claiming or finishing a batch are logged and the
+worker reconnects with backoff instead of exiting.
+"""
+import logging
+import random
+import threading
+import time
+import traceback
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, close_old_connections, connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core.metrics import record_task  # noqa
+
+logger = logging.getLogger(__name__)
+
+
+def task(func=None, *, priority=0, max_attempts=None, batched=False):
+    """Register a function as a task and give it an ``enqueue`` method.
+
+    Batched tasks take a single argument; the worker calls them once with
+    the list of arguments of every claimed task of that function.
+    """
+    if func is None:
+        return partial(task, priority=priority, max_attempts=max_attempts, batched=batched)
+    func.task_name = f'{func.__module__}.{func.__qualname__}'
+    func.task_priority = priority
+    func.task_max_attempts = max_attempts
+    func.task_batched = batched
+    func.enqueue = lambda *args, **kwargs: enqueue(func, args, kwargs)
+    return func
+
+
+def enqueue(func, args=(), kwargs=None, *, countdown=0, priority=None, using=DEFAULT_DB_ALIAS):
+    """Queue func(*args, **kwargs) once the transaction on ``using`` commits.
+
+    Tasks live on the default database, so there the row is inserted in
+    the open transaction and commits or rolls back with the work that
+    queued it. After writes to another database, such as a shard, the row
+    is inserted from transaction.on_commit of that database instead.
+    """
+    from core.models import Task
+
+    config = settings.TASKS
+
+    def insert():
+        return Task.objects.create(
+            name=func.task_name,
+            args=list(args),
+            kwargs=kwargs or {},
+            priority=func.task_priority if priority is None else priority,
+            max_attempts=func.task_max_attempts or config['MAX_ATTEMPTS'],
+            run_at=timezone.now() + timedelta(seconds=countdown),
+        )
+
+    if using == DEFAULT_DB_ALIAS:
+        return insert()
+    transaction.on_commit(insert, using=using)
+    return None
+
+
+def retry_delay(attempts):
+    """Seconds to wait before attempt number attempts + 1, with jitter."""
+    config = settings.TASKS
+    delay = min(config['MAX_RETRY_DELAY_SECONDS'], config['RETRY_DELAY_SECONDS'] * 2 ** (attempts - 1))
+    return random.uniform(delay / 2, delay)
+
+
+class Worker:
+    """Claims due tasks in batches and runs them."""
+
+    def __init__(self, batch_size=None, poll_seconds=None):
+        config = settings.TASKS
+        self.batch_size = batch_size or config['BATCH_SIZE']
+        self.poll_seconds = config['POLL_SECONDS'] if poll_seconds is None else poll_seconds
+        self.stale = timedelta(seconds=config['STALE_SECONDS'])
+
+    def claim(self):
+        """Lock, mark running and return up to batch_size due tasks."""
+        from core.models import Task
+
+        now = timezone.now()
+        due = Q(status=Task.QUEUED, run_at__lte=now) | Q(status=Task.RUNNING, started_at__lt=now - self.stale)
+        with transaction.atomic():
+            tasks = list(
+                Task.objects.select_for_update(skip_locked=True).filter(due)
+                .order_by('-priority', 'run_at', 'id')[:self.batch_size]
+            )
+            Task.objects.filter(pk__in=[t.pk for t in tasks]).update(
+                status=Task.RUNNING, started_at=now, attempts=F('attempts') + 1,
+            )
+        for t in tasks:
+            t.attempts += 1
+            t.started_at = now
+        return tasks
+
+    def run_batch(self):
+        """Claim and run one batch; return the number of tasks claimed."""
+        tasks = self.claim()
+        groups = {}
+        for t in tasks:
+            groups.setdefault(t.name, []).append(t)
+        for name, group in groups.items():
+            try:
+                func = import_string(name)
+            except ImportError:
+                self._finish(group, None, traceback.format_exc())
+                continue
+            if getattr(func, 'task_batched', False):
+                self._run(func, group, lambda: func([t.args[0] for t in group]))
+            else:
+                for t in group:
+                    self._run(func, [t], partial(func, *t.args, **t.kwargs))
+        return len(tasks)
+
+    def _run(self, func, group, call):
+        start = time.perf_counter()
+        try:
+            call()
+        except Exception:
+            logger.exception('Task %s failed', group[0].name)
+            error = traceback.format_exc()
+        else:
+            error = None
+        self._finish(group, time.perf_counter() - start, error)
+
+    def _finish(self, group, duration, error):
+        from core.models import Task
+
+        now = timezone.now()
+        for t in group:
+            if error is None:
+                result = 'success'
+                Task.objects.filter(pk=t.pk).delete()
+            elif t.attempts < t.max_attempts:
+                result = 'retry'
+                Task.objects.filter(pk=t.pk).update(
+                    status=Task.QUEUED, run_at=now + timedelta(seconds=retry_delay(t.attempts)), last_error=error,
+                )
+            else:
+                result = 'failure'
+                Task.objects.filter(pk=t.pk).update(status=Task.FAILED, last_error=error)
+            record_task(t.name, result, duration, (t.started_at - t.run_at).total_seconds())
+
+    def run(self, stop=None, once=False):
+        """Run batches until stop is set, or until none are due when once is True."""
+        stop = stop or threading.Event()
+        failures = 0
+        while not stop.is_set():
+            close_old_connections()
+            try:
+                claimed = self.run_batch()
+            except DatabaseError:
+                if once:
+                    raise
+                # A failover or dropped connection; start over on a new one.
+                failures += 1
+                delay = self.error_delay(failures)
+                logger.exception('Task batch failed, retrying in %.1f seconds', delay)
+                connections.close_all()
+                stop.wait(delay)
+                continue
+            failures = 0
+            if not claimed:
+                if once:
+                    break
+                stop.wait(self.poll_seconds)
+
+    def error_delay(self, failures):
+        """Seconds to wait after failures database errors in a row."""
+        delay = max(self.poll_seconds, 1) * 2 ** (failures - 1)
+        return min(delay, settings.TASKS['MAX_RETRY_DELAY_SECONDS'])
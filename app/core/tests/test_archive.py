@@ -0,0 +1,77 @@
+"""
+Tests for the post archive.
+"""
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import archive  # noqa
+from core.models import HashTag, Post  # noqa
+from core.tests.test_admin import create_user  # noqa
+
+
+class ArchiveTests(TestCase):
+    """Test writing and reading segments."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings = override_settings(POST_ARCHIVE={'DIR': self.tmp.name, 'OLDER_THAN_DAYS': 365})
+        self.settings.enable()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        self.settings.disable()
+        self.tmp.cleanup()
+
+    def _record(self, post_id):
+        return {
+            'id': post_id, 'user_id': self.user.id, 'title': f'post {post_id}', 'body': 'b', 'img': None,
+            'created_at': timezone.now().isoformat(), 'updated_at': timezone.now().isoformat(),
+            'hashtags': [], 'tags': [],
+        }
+
+    def test_segments_round_trip(self):
+        """Test records are found by id across segments."""
+        first = archive.write_segment(self._record(n) for n in (9, 3, 5))
+        second = archive.write_segment([self._record(12)])
+
+        self.assertEqual((first, second), ('segment-000001', 'segment-000002'))
+        self.assertEqual(archive.lookup(5)['title'], 'post 5')
+        self.assertEqual(archive.lookup(12)['title'], 'post 12')
+        self.assertIsNone(archive.lookup(4))
+        self.assertFalse([name for name in os.listdir(self.tmp.name) if name.endswith('.tmp')])
+
+    def test_command_archives_old_posts(self):
+        """Test old posts leave the database and stay readable through the API."""
+        created_at = timezone.now() - timedelta(days=400)
+        old = Post.objects.create(user=self.user, title='old', body='b', created_at=created_at)
+        old.hashtags.add(HashTag.objects.create(user=self.user, name='#vintage'))
+        recent = Post.objects.create(user=self.user, title='new', body='b')
+
+        call_command('archive_posts', stdout=StringIO())
+
+        self.assertFalse(Post.objects.filter(id=old.id).exists())
+        self.assertTrue(Post.objects.filter(id=recent.id).exists())
+        res = self.client.get(reverse('post:post-detail', args=[old.id]))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['title'], 'old')
+        self.assertEqual([h['name'] for h in res.data['hashtags']], ['#vintage'])
+
+    def test_archived_post_of_other_user_not_found(self):
+        """Test the archive fallback keeps posts private."""
+        other = create_user(email='other@example.com', username='user2')
+        archive.write_segment([{**self._record(77), 'user_id': other.id}])
+
+        res = self.client.get(reverse('post:post-detail', args=[77]))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
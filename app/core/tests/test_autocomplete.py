@@ -0,0 +1,32 @@
+"""
+Tests for the hashtag prefix index.
+"""
+from django.test import SimpleTestCase
+
+from core import autocomplete  # noqa
+
+
+class PrefixIndexTests(SimpleTestCase):
+    """Test prefix lookups and incremental updates."""
+
+    def test_top_for_small_and_memoized_slices(self):
+        """Test small slices and slices above SCAN_LIMIT rank the same way."""
+        counts = {f'a{n:05d}': n % 97 for n in range(autocomplete.SCAN_LIMIT + 500)}
+        counts['b'] = 1000
+        index = autocomplete.PrefixIndex(counts)
+
+        expected = sorted(((k, v) for k, v in counts.items() if k.startswith('a')), key=lambda kv: -kv[1])[:3]
+        self.assertEqual([uses for _, uses in index.top('a', 3)], [uses for _, uses in expected])
+        self.assertEqual(index.top('a0009', 2), [('a00096', 96), ('a00095', 95)])
+        self.assertEqual(index.top('b', 5), [('b', 1000)])
+        self.assertEqual(index.top('c', 5), [])
+
+    def test_add_invalidates_memoized_prefixes(self):
+        """Test added usage shows up in memoized results."""
+        index = autocomplete.PrefixIndex({f'a{n:05d}': 1 for n in range(autocomplete.SCAN_LIMIT + 1)})
+        self.assertEqual(index.top('a', 1)[0][1], 1)
+
+        index.add({'a00007': 5, 'abc': 9})
+
+        self.assertEqual(index.top('a', 2), [('abc', 9), ('a00007', 6)])
+        self.assertEqual(len(index), autocomplete.SCAN_LIMIT + 2)
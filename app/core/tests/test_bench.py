@@ -0,0 +1,102 @@
+"""
+Tests for the benchmark helpers.
+"""
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, SimpleTestCase
+
+from core import autocomplete, bench  # noqa
+from core.models import Post  # noqa
+
+
+class PercentileTests(SimpleTestCase):
+    """Test percentile calculation."""
+
+    def test_percentile_nearest_rank(self):
+        """Test percentiles use the nearest rank."""
+        values = list(range(1, 101))
+
+        self.assertEqual(bench.percentile(values, 50), 50)
+        self.assertEqual(bench.percentile(values, 95), 95)
+        self.assertEqual(bench.percentile(values, 99), 99)
+
+    def test_percentile_empty(self):
+        """Test percentile of no values is zero."""
+        self.assertEqual(bench.percentile([], 95), 0.0)
+
+    def test_every_route_is_benchmarked(self):
+        """Test every route in post.urls and user.urls has an endpoint."""
+        self.assertEqual(bench.uncovered_routes(), set())
+
+    def test_check_budgets_reports_violations(self):
+        """Test exceeding a budget is reported."""
+        endpoint = bench.Endpoint('GET', 'post:post-list')
+        result = bench.Result(endpoint, timings=[1.0, 2.0], queries=[3, 9])
+
+        violations = bench.check_budgets([result], {endpoint.name: {'queries': 5, 'p95_ms': 1}})
+
+        self.assertEqual(len(violations), 2)
+        self.assertIn('9 queries', violations[0])
+
+
+class BenchTests(bench.QueryBudgetMixin, TestCase):
+    """Test seeding and running benchmarks."""
+
+    def test_seed_dataset_is_deterministic(self):
+        """Test seeding creates the requested dataset size."""
+        dataset = bench.seed_dataset(users=3, posts_per_user=4, seed=1)
+
+        self.assertEqual(len(dataset.users), 3)
+        self.assertEqual(Post.objects.count(), 12)
+        self.assertEqual(Post.hashtags.through.objects.count(), 12 * 3)
+        self.assertEqual(Post.tags.through.objects.count(), 12 * 2)
+
+    def test_run_endpoint_within_budget(self):
+        """Test the post list stays within its query budget."""
+        dataset = bench.seed_dataset(users=2, posts_per_user=5)
+        endpoint = next(e for e in bench.ENDPOINTS if e.name == 'GET post:post-list')
+
+        result = bench.run_endpoint(endpoint, dataset, iterations=3, warmup=0)
+
+        self.assertEqual(len(result.timings), 3)
+        self.assertEqual(bench.check_budgets([result]), [])
+
+    def test_every_endpoint_within_budget(self):
+        """Test every benchmarked endpoint stays within its query budget."""
+        dataset = bench.seed_dataset(users=2, posts_per_user=5)
+        # Build the hashtag index in the request; a thread would not see the test's rows.
+        with patch.object(autocomplete.hashtags, 'start', side_effect=autocomplete.hashtags.update):
+            results = [bench.run_endpoint(endpoint, dataset, iterations=2, warmup=1) for endpoint in bench.ENDPOINTS]
+        # Latency budgets depend on the machine; only query counts are checked.
+        budgets = {name: {'queries': budget['queries']} for name, budget in bench.get_budgets().items()}
+
+        self.assertEqual(bench.check_budgets(results, budgets), [])
+        self.assertEqual({result.endpoint.name for result in results} - set(budgets), set())
+
+    def test_assert_query_budget(self):
+        """Test the query budget assertion fails when exceeded."""
+        with self.assertRaises(AssertionError):
+            with self.assertQueryBudget('GET user:me'):
+                list(Post.objects.all())
+                list(Post.objects.all())
+
+
+class BenchCommandTests(SimpleTestCase):
+    """Test the bench command."""
+
+    @patch('core.management.commands.bench.teardown_test_environment')
+    @patch('core.management.commands.bench.setup_test_environment')
+    @patch('core.management.commands.bench.teardown_databases')
+    @patch('core.management.commands.bench.setup_databases')
+    @patch('core.management.commands.bench.Command._run')
+    def test_bench_fails_over_budget(self, patched_run, patched_setup, patched_teardown, *patched_env):
+        """Test the command fails when an endpoint is over budget."""
+        endpoint = bench.Endpoint('GET', 'post:post-list')
+        patched_run.return_value = [bench.Result(endpoint, timings=[1.0], queries=[300])]
+
+        with self.assertRaises(CommandError):
+            call_command('bench', stdout=StringIO())
+        patched_teardown.assert_called_once()
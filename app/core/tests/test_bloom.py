@@ -0,0 +1,99 @@
+"""
+Tests for the username membership filter.
+"""
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from core import bloom  # noqa
+from core.models import User  # noqa
+from core.tests.test_admin import create_user  # noqa
+
+USERNAME_FILTER = {'ERROR_RATE': 0.01, 'MIN_CAPACITY': 1000, 'REFRESH_SECONDS': 0, 'REBUILD_SECONDS': 3600}
+
+
+class CountingBloomFilterTests(SimpleTestCase):
+    """Test the counting Bloom filter."""
+
+    def test_membership_and_removal(self):
+        """Test added items are found until removed and others mostly are not."""
+        f = bloom.CountingBloomFilter(1000, 0.01)
+        for n in range(1000):
+            f.add(f'user{n}')
+
+        self.assertTrue(all(f'user{n}' in f for n in range(1000)))
+        false_positives = sum(f'other{n}' in f for n in range(10000))
+        self.assertLess(false_positives, 300)
+        self.assertAlmostEqual(f.false_positive_rate(), 0.01, delta=0.005)
+
+        f.remove('user7')
+        self.assertNotIn('user7', f)
+        self.assertIn('user8', f)
+        self.assertEqual(f.items, 999)
+
+
+@override_settings(USERNAME_FILTER=USERNAME_FILTER)
+class UsernameFilterTests(TestCase):
+    """Test keeping the filter in step with the users table."""
+
+    def setUp(self):
+        cache.clear()
+        bloom.usernames.reset()
+        self.user = create_user(username='alice')
+
+    def test_built_from_users_and_updated_by_signals(self):
+        """Test existing, created and deleted users are reflected."""
+        self.assertTrue(bloom.usernames.might_exist('alice'))
+        self.assertFalse(bloom.usernames.might_exist('everyone'))
+
+        bob = create_user(email='bob@example.com', username='bob')
+        self.assertTrue(bloom.usernames.might_exist('bob'))
+        bob.delete()
+        self.assertFalse(bloom.usernames.might_exist('bob'))
+
+    def test_merges_users_from_other_processes(self):
+        """Test users created or renamed without this process's signals are merged on refresh."""
+        bloom.usernames.get_filter()
+        User.objects.bulk_create([User(email='carol@example.com', username='carol', date_joined=timezone.now())])
+        User.objects.filter(pk=self.user.pk).update(username='alicia')
+        bloom.publish_rename('alicia')
+
+        self.assertTrue(bloom.usernames.might_exist('carol'))
+        self.assertTrue(bloom.usernames.might_exist('alicia'))
+
+    def test_expired_renames_trigger_rebuild(self):
+        """Test a gap in the published renames rebuilds the filter."""
+        bloom.usernames.get_filter()
+        bloom.publish_rename('first')
+        cache.delete(f'{bloom.RENAMES_KEY}:1')
+
+        with patch.object(bloom.usernames, 'start') as start:
+            bloom.usernames.get_filter()
+
+        start.assert_called_once_with()
+
+    def test_rename_published_only_when_username_changes(self):
+        """Test saves keeping the username, and copies saved to shards, publish no rename."""
+        bloom.usernames.get_filter()
+        with patch.object(bloom, 'publish_rename') as publish:
+            self.user.first_name = 'Alice'
+            self.user.save()
+            User.objects.get(pk=self.user.pk).save()
+            bloom.user_saved(User, self.user, created=True, using='shard_1')
+            publish.assert_not_called()
+
+            self.user.username = 'alicia'
+            self.user.save()
+            self.user.save()
+
+        publish.assert_called_once_with('alicia')
+        self.assertTrue(bloom.usernames.might_exist('alicia'))
+
+    def test_shard_copies_do_not_change_filter(self):
+        """Test deleting a user's copy on a shard keeps the username in the filter."""
+        bloom.usernames.get_filter()
+        bloom.user_deleted(User, self.user, using='shard_1')
+
+        self.assertTrue(bloom.usernames.might_exist('alice'))
@@ -2,9 +2,12 @@
 Test custom django management commands
 """
 
+from io import StringIO
 from unittest.mock import patch
 from psycopg2 import OperationalError as Psycopg2Error
+from django.conf import settings
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
 from django.test import SimpleTestCase
 
@@ -14,10 +17,11 @@ class CommandTests(SimpleTestCase):
     """Test commands."""
 
     def test_wait_for_db_ready(self, patched_check):
-        """Test waiting for database if database ready"""
+        """Test waiting for every configured database if they are ready"""
         patched_check.return_value = True
         call_command('wait_for_db')
-        patched_check.assert_called_once_with(databases=['default'])
+        calls = [c.kwargs['databases'] for c in patched_check.call_args_list]
+        self.assertEqual(sorted(calls), [[alias] for alias in sorted(settings.DATABASES)])
 
     @patch('time.sleep')
     def test_wait_for_db_delay(self, patched_sleep, patched_check):
@@ -25,6 +29,43 @@ class CommandTests(SimpleTestCase):
         patched_sleep.return_value = None
         patched_check.side_effect = [Psycopg2Error] * 2 + \
                                     [OperationalError] * 3 + [True]  # noqa
-        call_command('wait_for_db')
+        call_command('wait_for_db', '--database', 'default')
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+    @patch('time.sleep')
+    @patch('random.uniform', side_effect=lambda low, high: high)
+    def test_wait_for_db_backoff(self, patched_uniform, patched_sleep, patched_check):
+        """Test delays double up to the maximum."""
+        patched_check.side_effect = [OperationalError] * 5 + [True]
+        call_command('wait_for_db', '--database', 'default', '--max-delay', '5', stdout=StringIO())
+
+        delays = [c.args[0] for c in patched_sleep.call_args_list]
+        self.assertEqual(delays, [1, 2, 4, 5, 5])
+
+    @patch('time.sleep')
+    def test_wait_for_db_checks_each_alias(self, patched_sleep, patched_check):
+        """Test every alias is checked and only failing ones are retried."""
+        other = iter([False, True])
+
+        def check(databases):
+            if databases == ['other'] and next(other) is False:
+                raise OperationalError
+            return True
+        patched_check.side_effect = check
+
+        call_command('wait_for_db', '--database', 'default', '--database', 'other', stdout=StringIO())
+
+        calls = [c.kwargs['databases'] for c in patched_check.call_args_list]
+        self.assertEqual(sorted(calls), [['default'], ['other'], ['other']])
+        self.assertEqual(patched_sleep.call_count, 1)
+
+    @patch('time.sleep')
+    @patch('time.monotonic', side_effect=[0, 5, 11])
+    def test_wait_for_db_timeout(self, patched_monotonic, patched_sleep, patched_check):
+        """Test the command gives up after the timeout."""
+        patched_check.side_effect = OperationalError
+
+        with self.assertRaises(CommandError):
+            call_command('wait_for_db', '--timeout', '10', stdout=StringIO())
+        self.assertEqual(patched_sleep.call_count, 1)
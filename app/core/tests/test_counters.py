@@ -0,0 +1,74 @@
+"""
+Tests for the post counts of hashtags and tags.
+"""
+from django.test import TestCase
+
+from core.models import HashTag, Post, Tag  # noqa
+from core.tests.test_admin import create_user  # noqa
+
+
+class PostCountTests(TestCase):
+    """Test post counts follow m2m changes and post deletions."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.hashtag = HashTag.objects.create(user=self.user, name='#food')
+        self.tag = Tag.objects.create(user=self.user, somebody='@friend')
+        self.posts = [Post.objects.create(user=self.user, title=f'Post {i}', body='b') for i in range(3)]
+
+    def assertCounts(self, hashtag, tag):
+        self.hashtag.refresh_from_db()
+        self.tag.refresh_from_db()
+        self.assertEqual((self.hashtag.post_count, self.tag.post_count), (hashtag, tag))
+
+    def test_add_counts_new_links_only(self):
+        """Test adding links counts each post once, even when added again."""
+        for post in self.posts[:2]:
+            post.hashtags.add(self.hashtag)
+            post.tags.add(self.tag)
+        self.posts[0].hashtags.add(self.hashtag)
+
+        self.assertCounts(2, 2)
+
+    def test_remove_and_clear(self):
+        """Test removing and clearing links, including links that do not exist."""
+        other = HashTag.objects.create(user=self.user, name='#other')
+        for post in self.posts:
+            post.hashtags.add(self.hashtag)
+        self.posts[0].hashtags.remove(self.hashtag, other)
+        self.posts[1].hashtags.clear()
+        self.posts[1].hashtags.clear()
+
+        self.assertCounts(1, 0)
+        other.refresh_from_db()
+        self.assertEqual(other.post_count, 0)
+
+    def test_set_moves_counts(self):
+        """Test set() counts the links it adds and removes."""
+        other = HashTag.objects.create(user=self.user, name='#other')
+        self.posts[0].hashtags.add(self.hashtag)
+        self.posts[0].hashtags.set([other])
+
+        self.assertCounts(0, 0)
+        other.refresh_from_db()
+        self.assertEqual(other.post_count, 1)
+
+    def test_reverse_side(self):
+        """Test changes made from the hashtag and tag side of the relation."""
+        self.hashtag.post_set.add(*self.posts)
+        self.tag.post_set.add(*self.posts[:2])
+        self.assertCounts(3, 2)
+
+        self.hashtag.post_set.remove(self.posts[0])
+        self.tag.post_set.clear()
+        self.assertCounts(2, 0)
+
+    def test_deleting_posts(self):
+        """Test deleted posts release their hashtags and tags."""
+        for post in self.posts:
+            post.hashtags.add(self.hashtag)
+            post.tags.add(self.tag)
+        self.posts[0].delete()
+        Post.objects.filter(pk=self.posts[1].pk).delete()
+
+        self.assertCounts(1, 1)
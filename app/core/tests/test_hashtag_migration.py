@@ -0,0 +1,51 @@
+"""
+Tests for the migration merging hashtags into canonical hashtags.
+"""
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+
+class MergeHashTagsMigrationTests(TransactionTestCase):
+    """Test linking existing hashtags and merging duplicates."""
+    before = [('core', '0012_canonicalhashtag')]
+    after = [('core', '0014_hashtag_canonical_required')]
+
+    def _migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self._migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_merges_duplicates_and_keeps_post_links(self):
+        """Test each user keeps one hashtag per canonical name with all its posts."""
+        apps = self._migrate(self.before)
+        User = apps.get_model('core', 'User')
+        Post = apps.get_model('core', 'Post')
+        HashTag = apps.get_model('core', 'HashTag')
+        alice = User.objects.create(email='a@example.com', username='alice', first_name='A', last_name='A')
+        bob = User.objects.create(email='b@example.com', username='bob', first_name='B', last_name='B')
+        kept = HashTag.objects.create(user=alice, name='#Python')
+        duplicate = HashTag.objects.create(user=alice, name='#python')
+        HashTag.objects.create(user=bob, name='PYTHON')
+        HashTag.objects.create(user=bob, name='#django')
+        both = Post.objects.create(user=alice, title='both', body='b')
+        both.hashtags.add(kept, duplicate)
+        only_duplicate = Post.objects.create(user=alice, title='dup', body='b')
+        only_duplicate.hashtags.add(duplicate)
+
+        apps = self._migrate(self.after)
+        HashTag = apps.get_model('core', 'HashTag')
+        Post = apps.get_model('core', 'Post')
+        CanonicalHashTag = apps.get_model('core', 'CanonicalHashTag')
+
+        self.assertEqual(sorted(CanonicalHashTag.objects.values_list('name', flat=True)), ['django', 'python'])
+        self.assertEqual(
+            sorted(HashTag.objects.values_list('user__username', 'name', 'canonical_id')),
+            [('alice', '#Python', 'python'), ('bob', '#django', 'django'), ('bob', 'PYTHON', 'python')],
+        )
+        for title in ('both', 'dup'):
+            self.assertEqual(list(Post.objects.get(title=title).hashtags.values_list('name', flat=True)), ['#Python'])
@@ -0,0 +1,54 @@
+"""
+Tests for the health endpoints.
+"""
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import health  # noqa
+
+LIVE_URL = reverse('core:health-live')
+READY_URL = reverse('core:health-ready')
+
+
+class HealthTests(TestCase):
+    """Test liveness and readiness."""
+
+    def setUp(self):
+        self.client = APIClient()
+        health.reset()
+
+    def test_live(self):
+        """Test liveness needs no database."""
+        with self.assertNumQueries(0):
+            res = self.client.get(LIVE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), {'status': 'ok'})
+
+    def test_ready(self):
+        """Test readiness reports each check."""
+        res = self.client.get(READY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['checks'], {'database:default': 'ok', 'cache': 'ok'})
+
+    def test_ready_unavailable(self):
+        """Test readiness fails when a database is down."""
+        with patch('core.health.check_database', return_value='OperationalError: down'):
+            res = self.client.get(READY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res.json()['status'], 'unavailable')
+
+    @override_settings(HEALTH={'READY_CACHE_SECONDS': 60})
+    def test_ready_result_cached(self):
+        """Test repeated polls reuse the last probe."""
+        with patch('core.health.probe', return_value=(True, {})) as probe:
+            for _ in range(5):
+                self.client.get(READY_URL)
+
+        self.assertEqual(probe.call_count, 1)
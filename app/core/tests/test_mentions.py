@@ -0,0 +1,90 @@
+"""
+Tests for mentions and their backfill.
+"""
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core import mentions  # noqa
+from core.models import Mention, Post, Tag  # noqa
+from core.tests.test_admin import create_user  # noqa
+from user.views import MentionPagination  # noqa
+
+
+class BackfillTests(TestCase):
+    """Test creating mentions from existing tags."""
+
+    def setUp(self):
+        self.author = create_user()
+        self.ann = create_user(email='ann@example.com', username='ann')
+        self.bob = create_user(email='bob@example.com', username='bob')
+
+    def _post(self, *names):
+        post = Post.objects.create(user=self.author, title='t', body='b')
+        for name in names:
+            post.tags.add(Tag.objects.create(user=self.author, somebody=name))
+        return post
+
+    def test_backfill_known_users_only(self):
+        """Test tags of existing users other than the author become mentions."""
+        first = self._post('ann', '@bob', 'nobody', self.author.username)
+        second = self._post('ann')
+
+        out = StringIO()
+        call_command('backfill_mentions', '--chunk-size', '2', stdout=out)
+
+        self.assertEqual(
+            set(Mention.objects.values_list('post_id', 'mentioned_id')),
+            {(first.pk, self.ann.pk), (first.pk, self.bob.pk), (second.pk, self.ann.pk)},
+        )
+        self.assertEqual(Mention.objects.get(post=first, mentioned=self.ann).created_at, first.created_at)
+        self.assertIn('Found 3 mentions', out.getvalue())
+
+    def test_backfill_is_repeatable(self):
+        """Test running the backfill again adds nothing."""
+        self._post('ann', 'bob')
+        mentions.backfill()
+        mentions.backfill()
+
+        self.assertEqual(Mention.objects.count(), 2)
+
+    def test_deleting_post_or_user_deletes_mentions(self):
+        """Test mentions go with their post and with the mentioned user."""
+        post = self._post('ann', 'bob')
+        mentions.backfill()
+
+        self.bob.delete()
+        self.assertEqual(list(Mention.objects.values_list('mentioned_id', flat=True)), [self.ann.pk])
+        post.delete()
+        self.assertFalse(Mention.objects.exists())
+
+
+class InboxPaginationTests(TestCase):
+    """Test paginating the inbox over several shards."""
+
+    def test_pages_merge_querysets(self):
+        """Test querysets of different shards are paged as one list, newest first."""
+        author = create_user()
+        reader = create_user(email='reader@example.com', username='reader')
+        now = timezone.now()
+        posts = [Post.objects.create(user=author, title=f'p{i}', body='b') for i in range(5)]
+        for i, post in enumerate(posts):
+            Mention.objects.create(post=post, mentioned=reader, created_at=now - timedelta(minutes=i))
+        inbox = Mention.objects.filter(mentioned=reader)
+        shards = [inbox.filter(post__in=posts[::2]), inbox.exclude(post__in=posts[::2])]
+        factory = APIRequestFactory()
+
+        paginator = MentionPagination()
+        page = paginator.paginate_queryset(shards, Request(factory.get('/', {'page_size': 3})))
+        self.assertEqual([m.post_id for m in page], [p.pk for p in posts[:3]])
+
+        cursor = paginator.encode_cursor(page[-1])
+        paginator = MentionPagination()
+        page = paginator.paginate_queryset(shards, Request(factory.get('/', {'page_size': 3, 'cursor': cursor})))
+        self.assertEqual([m.post_id for m in page], [p.pk for p in posts[3:]])
+        self.assertFalse(paginator.has_next)
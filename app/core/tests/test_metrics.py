@@ -0,0 +1,83 @@
+"""
+Tests for the Prometheus metrics.
+"""
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+
+from core import metrics  # noqa
+from core.tests.test_admin import create_user  # noqa
+
+METRICS_URL = reverse('core:metrics')
+ME_URL = reverse('user:me')
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class MetricsTests(TestCase):
+    """Test metrics collection and exposition."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+
+    def test_request_metrics_recorded(self):
+        """Test latency, size and query metrics are recorded per view."""
+        self.client.force_authenticate(self.user)
+        before = sample('http_request_duration_seconds_count', method='GET', view='user:me', status='200')
+
+        self.client.get(ME_URL)
+
+        after = sample('http_request_duration_seconds_count', method='GET', view='user:me', status='200')
+        self.assertEqual(after, before + 1)
+        self.assertGreater(sample('http_response_size_bytes_sum', method='GET', view='user:me'), 0)
+
+    def test_auth_failures_counted(self):
+        """Test token authentication outcomes are counted."""
+        before = sample('auth_attempts_total', method='token', result='failure')
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+        self.client.get(ME_URL)
+
+        self.assertEqual(sample('auth_attempts_total', method='token', result='failure'), before + 1)
+
+    def test_record_cache(self):
+        """Test cache lookups are counted by result."""
+        before = sample('cache_requests_total', cache='test', result='hit')
+
+        metrics.record_cache('test', hit=True)
+
+        self.assertEqual(sample('cache_requests_total', cache='test', result='hit'), before + 1)
+
+    @override_settings(METRICS={'ENABLED': True, 'TOKEN': 'secret'})
+    def test_metrics_endpoint(self):
+        """Test the exposition endpoint returns the text format."""
+        self.client.force_authenticate(self.user)
+        self.client.get(ME_URL)
+
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer secret')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'http_request_duration_seconds_bucket', res.content)
+        self.assertIn(b'db_queries_total', res.content)
+
+    @override_settings(METRICS={'ENABLED': True, 'TOKEN': 'secret'})
+    def test_metrics_endpoint_token(self):
+        """Test the exposition endpoint requires the configured token."""
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, 403)
+
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(res.status_code, 200)
+
+    @override_settings(METRICS={'ENABLED': True, 'TOKEN': None})
+    def test_metrics_endpoint_needs_token_configured(self):
+        """Test metrics are not served when no token is configured."""
+        self.client.force_authenticate(self.user)
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 404)
@@ -0,0 +1,84 @@
+"""
+Tests for the request instrumentation middleware.
+"""
+import json
+
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import instrumentation  # noqa
+from core.models import Post  # noqa
+from core.tests.test_admin import create_user  # noqa
+
+POST_URL = reverse('post:post-list')
+ENABLED = {'ENABLED': True, 'SAMPLE_RATE': 1.0, 'SLOW_REQUEST_MS': 10000}
+
+
+class SpanTests(SimpleTestCase):
+    """Test timing spans."""
+
+    def test_span_without_request_is_noop(self):
+        """Test spans outside of a request record nothing."""
+        with instrumentation.span('serializer'):
+            pass
+
+        self.assertIsNone(instrumentation.current_metrics())
+
+    def test_nested_spans_count_once(self):
+        """Test nested spans with the same name are not double counted."""
+        with instrumentation.collect() as metrics:
+            with instrumentation.span('serializer'):
+                with instrumentation.span('serializer'):
+                    pass
+            outer = metrics.spans['serializer']
+            with instrumentation.span('serializer'):
+                pass
+
+        self.assertEqual(len(metrics.spans), 1)
+        self.assertGreater(metrics.spans['serializer'], outer)
+
+
+class InstrumentationMiddlewareTests(TestCase):
+    """Test the Server-Timing header and log line."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    @override_settings(INSTRUMENTATION=ENABLED)
+    def test_server_timing_header(self):
+        """Test sampled requests report db, auth, serializer and render time."""
+        Post.objects.create(user=self.user, title='Title', body='Body')
+
+        with self.assertLogs('core.instrumentation', level='INFO') as logs:
+            res = self.client.get(POST_URL)
+
+        timing = res['Server-Timing']
+        for name in ['db;', 'auth;', 'ser;', 'render;', 'total;']:
+            self.assertIn(name, timing)
+        data = json.loads(logs.records[0].getMessage())
+        self.assertEqual(data['view'], 'post:post-list')
+        self.assertGreaterEqual(data['db_queries'], 2)
+        self.assertFalse(data['slow'])
+
+    @override_settings(INSTRUMENTATION={'ENABLED': False})
+    def test_disabled(self):
+        """Test no header is added when instrumentation is disabled."""
+        res = self.client.get(POST_URL)
+
+        self.assertFalse(res.has_header('Server-Timing'))
+
+    @override_settings(INSTRUMENTATION={'ENABLED': True, 'SAMPLE_RATE': 0, 'SLOW_REQUEST_MS': 0})
+    def test_unsampled_slow_request_logged(self):
+        """Test slow requests are logged even when not sampled."""
+        with self.assertLogs('core.instrumentation', level='WARNING') as logs:
+            res = self.client.get(POST_URL)
+
+        self.assertFalse(res.has_header('Server-Timing'))
+        data = json.loads(logs.records[0].getMessage())
+        self.assertTrue(data['slow'])
+        self.assertFalse(data['sampled'])
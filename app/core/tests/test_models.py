@@ -104,6 +104,20 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(hashtag), hashtag.name)
 
+    def test_hashtags_share_a_canonical_hashtag(self):
+        """Test hashtags of every user link to one case-folded canonical hashtag."""
+        other = create_user(email='other@example.com', username='other')
+        first = models.HashTag.objects.create(user=self.user, name='#Python')
+        second = models.HashTag.objects.create(user=other, name='python')
+
+        self.assertEqual(first.canonical_id, 'python')
+        self.assertEqual(second.canonical_id, 'python')
+        self.assertEqual(models.CanonicalHashTag.objects.get().hashtags.count(), 2)
+
+        first.name = '#Django'
+        first.save()
+        self.assertEqual(first.canonical_id, 'django')
+
     def test_create_tag(self):
         """Test creating a @tag is successful."""
         tag = models.Tag.objects.create(user=self.user, somebody='@amos12')
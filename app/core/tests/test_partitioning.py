@@ -0,0 +1,111 @@
+"""
+Tests for monthly post partitions.
+"""
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from core import partitioning  # noqa
+from core.models import HashTag, Post, Tag  # noqa
+from core.tests.test_admin import create_user  # noqa
+
+
+class MonthTests(SimpleTestCase):
+    """Test month arithmetic."""
+
+    def test_month_start(self):
+        """Test values are truncated to the first of the month in UTC."""
+        value = datetime(2024, 2, 29, 23, 59, tzinfo=dt_timezone.utc)
+
+        self.assertEqual(partitioning.month_start(value), datetime(2024, 2, 1, tzinfo=dt_timezone.utc))
+
+    def test_add_months_crosses_years(self):
+        """Test adding and subtracting months across year boundaries."""
+        month = datetime(2024, 11, 1, tzinfo=dt_timezone.utc)
+
+        self.assertEqual(partitioning.add_months(month, 3), datetime(2025, 2, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(partitioning.add_months(month, -11), datetime(2023, 12, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(partitioning.partition_name(month), 'core_post_p2024_11')
+
+
+class CreatedBetweenTests(TestCase):
+    """Test time bounded post queries."""
+
+    def test_created_between(self):
+        """Test the range is closed at the start and open at the end."""
+        user = create_user()
+        now = timezone.now()
+        old = Post.objects.create(user=user, title='old', body='b', created_at=now - timedelta(days=40))
+        new = Post.objects.create(user=user, title='new', body='b', created_at=now)
+
+        self.assertEqual(list(Post.objects.created_between(now - timedelta(days=1))), [new])
+        self.assertEqual(list(Post.objects.created_between(end=now)), [old])
+        self.assertEqual(Post.objects.created_between().count(), 2)
+
+    @unittest.skipIf(connection.vendor == 'postgresql', 'core_post is partitioned on PostgreSQL')
+    def test_command_requires_partitioned_table(self):
+        """Test the command refuses to run without partitions."""
+        with self.assertRaises(CommandError):
+            call_command('post_partitions')
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'partitioning needs PostgreSQL')
+class PostgresPartitionTests(TestCase):
+    """Test partitions on PostgreSQL."""
+
+    def test_future_partitions_exist(self):
+        """Test migrate leaves partitions for the coming months."""
+        current = partitioning.month_start(timezone.now())
+        names = [name for name, _ in partitioning.list_partitions()]
+
+        self.assertTrue(partitioning.is_partitioned())
+        self.assertIn(partitioning.partition_name(current), names)
+        self.assertIn(partitioning.partition_name(partitioning.add_months(current, 3)), names)
+
+    def test_time_bounded_query_is_pruned(self):
+        """Test a query bounded to one month only scans its partition."""
+        current = partitioning.month_start(timezone.now())
+        queryset = Post.objects.created_between(current, partitioning.add_months(current, 1))
+        plan = queryset.explain()
+
+        self.assertIn(partitioning.partition_name(current), plan)
+        self.assertNotIn(partitioning.DEFAULT_PARTITION, plan)
+
+    def test_new_partition_takes_rows_from_default(self):
+        """Test rows in the default partition move to a partition created later."""
+        month = partitioning.add_months(partitioning.month_start(timezone.now()), 36)
+        post = Post.objects.create(user=create_user(), title='t', body='b', created_at=month + timedelta(days=2))
+
+        with connection.cursor() as cursor:
+            name = partitioning.create_partition(cursor, month)
+            cursor.execute(f'SELECT id FROM {name}')
+            self.assertEqual(cursor.fetchall(), [(post.pk,)])
+            cursor.execute(f'SELECT count(*) FROM {partitioning.DEFAULT_PARTITION}')
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_archive_recounts_hashtags_and_tags(self):
+        """Test archiving a partition takes its posts out of the post counts."""
+        user = create_user()
+        month = partitioning.add_months(partitioning.month_start(timezone.now()), 48)
+        hashtag = HashTag.objects.create(user=user, name='#old')
+        tag = Tag.objects.create(user=user, somebody='ann')
+        old = Post.objects.create(user=user, title='t', body='b', created_at=month + timedelta(days=2))
+        kept = Post.objects.create(user=user, title='t', body='b')
+        for post in (old, kept):
+            post.hashtags.add(hashtag)
+            post.tags.add(tag)
+        with connection.cursor() as cursor:
+            name = partitioning.create_partition(cursor, month)
+
+        with tempfile.TemporaryDirectory() as archive_dir:
+            partitioning.archive_partition(name, archive_dir=archive_dir, drop=True)
+
+        hashtag.refresh_from_db()
+        tag.refresh_from_db()
+        self.assertEqual((hashtag.post_count, tag.post_count), (1, 1))
@@ -0,0 +1,99 @@
+"""
+Tests for on-demand request profiling.
+"""
+import os
+import pstats
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.tests.test_admin import create_user  # noqa
+
+POST_URL = reverse('post:post-list')
+PROFILES_URL = reverse('core:profile-list')
+PROFILE_DIR = tempfile.mkdtemp()
+
+
+def profiling(**overrides):
+    config = {'ENABLED': True, 'DIR': PROFILE_DIR, 'SAMPLE_EVERY': 0, 'TRACEMALLOC': False, 'MAX_FILES': 200}
+    config.update(overrides)
+    return override_settings(PROFILING=config)
+
+
+class ProfilingTests(TestCase):
+    """Test profiling requests and downloading profiles."""
+
+    def setUp(self):
+        self.staff = get_user_model().objects.create_superuser(
+            'admin@example.com', 'Admin', 'User', 'admin', 'testpass123')
+        self.user = create_user()
+        self.client = APIClient()
+
+    def tearDown(self):
+        shutil.rmtree(PROFILE_DIR, ignore_errors=True)
+
+    def _token_client(self, user):
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    @profiling()
+    def test_staff_can_profile_request(self):
+        """Test a staff user gets a profile with the X-Profile header."""
+        self._token_client(self.staff)
+
+        res = self.client.get(POST_URL, HTTP_X_PROFILE='1')
+
+        self.assertEqual(res.status_code, 200)
+        path = os.path.join(PROFILE_DIR, f'{res["X-Profile-Id"]}.pstats')
+        stats = pstats.Stats(path)
+        self.assertTrue(any('serializers' in func[0] for func in stats.stats))
+
+    @profiling()
+    def test_memory_profile(self):
+        """Test profile=memory also writes tracemalloc statistics."""
+        self._token_client(self.staff)
+
+        res = self.client.get(POST_URL, {'profile': 'memory'})
+
+        self.assertTrue(os.path.exists(os.path.join(PROFILE_DIR, f'{res["X-Profile-Id"]}.txt')))
+
+    @profiling()
+    def test_non_staff_not_profiled(self):
+        """Test regular users cannot trigger profiling."""
+        self._token_client(self.user)
+
+        res = self.client.get(POST_URL, HTTP_X_PROFILE='1')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertFalse(res.has_header('X-Profile-Id'))
+
+    @profiling(SAMPLE_EVERY=2)
+    def test_sampling(self):
+        """Test one in N requests is profiled automatically."""
+        self.client.force_authenticate(self.user)
+
+        responses = [self.client.get(POST_URL) for _ in range(4)]
+
+        self.assertEqual([res.has_header('X-Profile-Id') for res in responses], [False, True, False, True])
+
+    @profiling()
+    def test_download_profile(self):
+        """Test staff can list and download profiles, others cannot."""
+        self._token_client(self.staff)
+        name = self.client.get(POST_URL, HTTP_X_PROFILE='1')['X-Profile-Id']
+
+        res = self.client.get(PROFILES_URL)
+        self.assertEqual(res.data[0]['name'], f'{name}.pstats')
+
+        res = self.client.get(reverse('core:profile-detail', args=[f'{name}.pstats']))
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('attachment', res['Content-Disposition'])
+
+        self.client.force_authenticate(self.user)
+        res = self.client.get(PROFILES_URL)
+        self.assertEqual(res.status_code, 403)
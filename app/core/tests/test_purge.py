@@ -0,0 +1,96 @@
+"""
+Tests for purging soft-deleted users.
+"""
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import purge, tasks  # noqa
+from core.models import HashTag, Post, Tag, Task, User  # noqa
+from core.tests.test_admin import create_user  # noqa
+
+
+@override_settings(USER_PURGE={'GRACE_HOURS': 24, 'CHUNK_SIZE': 2, 'PAUSE_SECONDS': 0})
+class PurgeTests(TestCase):
+    """Test soft deletion and chunked purging of users."""
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.settings = override_settings(MEDIA_ROOT=self.media.name)
+        self.settings.enable()
+        self.user = create_user()
+        self.other = create_user(email='other@example.com', username='other')
+
+    def tearDown(self):
+        self.settings.disable()
+        self.media.cleanup()
+
+    def _fill(self, user, posts=5):
+        hashtag = HashTag.objects.create(user=user, name='#gone')
+        tag = Tag.objects.create(user=user, somebody='@gone')
+        for i in range(posts):
+            post = Post.objects.create(user=user, title=f'post {i}', body='b')
+            post.hashtags.add(hashtag)
+            post.tags.add(tag)
+        return post
+
+    def test_purge_deletes_rows_in_chunks(self):
+        """Test a purge removes only the user's rows, in chunk sized deletes, and their files."""
+        last = self._fill(self.user)
+        last.img.save('photo.jpg', ContentFile(b'jpeg'))
+        path = last.img.path
+        self._fill(self.other, posts=1)
+        purge.soft_delete_user(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True), patch('core.purge.time.sleep') as sleep:
+            count = purge.purge_user(self.user.id)
+
+        self.assertEqual(count, 7)
+        # One pause after each chunk: three of posts, one of hashtags, one of tags.
+        self.assertEqual(sleep.call_count, 5)
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(Post.hashtags.through.objects.count(), 1)
+        self.assertEqual(HashTag.objects.count(), 1)
+        self.assertEqual(Tag.objects.count(), 1)
+        self.assertFalse(os.path.exists(path))
+
+    def test_purge_refuses_active_users(self):
+        """Test purge_user only deletes soft-deleted accounts."""
+        with self.assertRaises(ValueError):
+            purge.purge_user(self.user.id)
+        self.assertTrue(User.objects.filter(pk=self.user.pk).exists())
+
+    def test_soft_delete_queues_purge(self):
+        """Test soft deletion queues a purge that runs once the grace period is over."""
+        self._fill(self.user, posts=1)
+        purge.soft_delete_user(self.user)
+
+        self.assertEqual(tasks.Worker().run_batch(), 0)
+        Task.objects.update(run_at=timezone.now())
+        with patch('core.purge.time.sleep'):
+            self.assertEqual(tasks.Worker().run_batch(), 1)
+
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Post.objects.exists())
+
+    def test_command_waits_for_grace_period(self):
+        """Test the command purges users deleted before the grace period only."""
+        self._fill(self.user, posts=1)
+        self._fill(self.other, posts=1)
+        purge.soft_delete_user(self.user)
+        purge.soft_delete_user(self.other)
+        User.objects.filter(pk=self.user.pk).update(deleted_at=timezone.now() - timedelta(hours=25))
+
+        call_command('purge_deleted_users', stdout=StringIO())
+
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertTrue(User.objects.filter(pk=self.other.pk).exists())
+        self.assertEqual(Post.objects.get().user, self.other)
@@ -0,0 +1,122 @@
+"""
+Tests for read replica routing.
+"""
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import SimpleTestCase, RequestFactory, override_settings
+
+from core import routers  # noqa
+from core.middleware import ReplicaRoutingMiddleware  # noqa
+
+REPLICAS = {'ALIASES': ['replica_1'], 'PIN_SECONDS': 5, 'MAX_LAG_SECONDS': None}
+
+
+class FakeViewSet:
+    replica_actions = ('list',)
+
+
+def fake_view(action):
+    """Return a view recording the alias reads are routed to."""
+    def view(request):
+        view.read_alias = routers.read_alias()
+        return HttpResponse(status=201 if request.method == 'POST' else 200)
+    view.cls = FakeViewSet
+    view.actions = {'get': action, 'post': 'create'}
+    return view
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    """Test the router."""
+
+    def test_reads_go_to_primary_by_default(self):
+        """Test reads use the primary outside of a routed request."""
+        router = routers.ReplicaRouter()
+
+        self.assertIsNone(router.db_for_read(None))
+        with routers.use_replica('replica_1'):
+            self.assertEqual(router.db_for_read(None), 'replica_1')
+            self.assertEqual(router.db_for_write(None), 'default')
+        self.assertIsNone(router.db_for_read(None))
+
+    @override_settings(READ_REPLICAS=REPLICAS)
+    def test_no_migrations_on_replicas(self):
+        """Test replicas are never migrated."""
+        router = routers.ReplicaRouter()
+
+        self.assertFalse(router.allow_migrate('replica_1', 'core'))
+        self.assertTrue(router.allow_migrate('default', 'core'))
+
+    @override_settings(READ_REPLICAS={**REPLICAS, 'MAX_LAG_SECONDS': 10})
+    def test_lagging_replica_skipped(self):
+        """Test a replica lagging beyond the limit is not used."""
+        with patch('core.routers.replica_lag', return_value=30):
+            self.assertIsNone(routers.choose_replica())
+        with patch('core.routers.replica_lag', return_value=1):
+            self.assertEqual(routers.choose_replica(), 'replica_1')
+        with patch('core.routers.replica_lag', return_value=None):
+            self.assertIsNone(routers.choose_replica())
+
+
+@override_settings(READ_REPLICAS=REPLICAS)
+class ReplicaRoutingMiddlewareTests(SimpleTestCase):
+    """Test choosing replicas per request."""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def _call(self, method, view, **extra):
+        request = getattr(self.factory, method)('/', **extra)
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        return middleware(request)
+
+    def test_safe_read_uses_replica(self):
+        """Test listed actions read from a replica."""
+        view = fake_view('list')
+
+        self._call('get', view)
+
+        self.assertEqual(view.read_alias, 'replica_1')
+        self.assertIsNone(routers.read_alias())
+
+    def test_unlisted_action_uses_primary(self):
+        """Test actions not listed in replica_actions read from the primary."""
+        view = fake_view('retrieve')
+
+        self._call('get', view)
+
+        self.assertIsNone(view.read_alias)
+
+    def test_read_your_writes(self):
+        """Test a client that just wrote is pinned to the primary."""
+        view = fake_view('list')
+
+        self._call('post', view, HTTP_AUTHORIZATION='Token a', REMOTE_ADDR='10.0.0.1')
+        self._call('get', view, HTTP_AUTHORIZATION='Token a', REMOTE_ADDR='10.0.0.1')
+        self.assertIsNone(view.read_alias)
+
+        self._call('get', view, HTTP_AUTHORIZATION='Token b', REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(view.read_alias, 'replica_1')
+
+    def test_clients_behind_one_address_pinned_separately(self):
+        """Test a write pins only its own client, not others sharing the proxy address."""
+        view = fake_view('list')
+
+        self._call('post', view, HTTP_AUTHORIZATION='Token a', REMOTE_ADDR='10.0.0.1')
+        self._call('get', view, HTTP_AUTHORIZATION='Token b', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(view.read_alias, 'replica_1')
+        self._call('get', view, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(view.read_alias, 'replica_1')
+
+        self.factory.cookies[settings.SESSION_COOKIE_NAME] = 'session-a'
+        self._call('post', view, REMOTE_ADDR='10.0.0.1')
+        self._call('get', view, REMOTE_ADDR='10.0.0.1')
+        self.assertIsNone(view.read_alias)
@@ -0,0 +1,71 @@
+"""
+Tests for the precomputed OpenAPI schema.
+"""
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from core import schema  # noqa
+
+SCHEMA_URL = reverse('api-schema')
+DOCS_URL = reverse('api-docs')
+
+
+class SchemaTests(TestCase):
+    """Test building and serving the schema."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings = override_settings(OPENAPI_SCHEMA={'DIR': self.tmp.name})
+        self.settings.enable()
+        schema.reset()
+
+    def tearDown(self):
+        schema.reset()
+        self.settings.disable()
+        self.tmp.cleanup()
+
+    def test_build_and_serve_from_file(self):
+        """Test the built files are served without introspecting the API."""
+        call_command('build_schema', stdout=StringIO())
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, 'openapi.yaml')))
+
+        with patch('core.schema.generate') as generate:
+            res = self.client.get(SCHEMA_URL, {'format': 'json'})
+
+        generate.assert_not_called()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/vnd.oai.openapi+json')
+        self.assertIn('/api/post/posts/', json.loads(res.content)['paths'])
+
+    def test_etag_not_modified(self):
+        """Test a matching If-None-Match gets 304 without a body."""
+        etag = self.client.get(SCHEMA_URL)['ETag']
+
+        res = self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+
+    def test_generated_once_without_files(self):
+        """Test the schema is generated on first use and then reused."""
+        with patch('core.schema.generate', return_value=b'openapi: 3.0.3\n') as generate:
+            for _ in range(3):
+                res = self.client.get(SCHEMA_URL)
+
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual(res.content, b'openapi: 3.0.3\n')
+
+    def test_docs(self):
+        """Test the Swagger UI points at the schema."""
+        res = self.client.get(DOCS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn(SCHEMA_URL, res.content.decode())
@@ -0,0 +1,68 @@
+"""
+Tests for the synthetic data generator.
+"""
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core.models import User, Post, HashTag, Tag  # noqa
+from core.seeding import SeedConfig, seed  # noqa
+
+
+class SeedingTests(TestCase):
+    """Test generating datasets."""
+
+    def test_seed_totals_match_database(self):
+        """Test the reported totals match the inserted rows."""
+        totals = seed(SeedConfig(users=25, posts_per_user=4, chunk_size=10, seed=3))
+
+        self.assertEqual(User.objects.count(), 25)
+        self.assertEqual(Post.objects.count(), totals['posts'])
+        self.assertEqual(Post.hashtags.through.objects.count(), totals['hashtags'])
+        self.assertEqual(Post.tags.through.objects.count(), totals['tags'])
+        self.assertEqual(sum(HashTag.objects.values_list('post_count', flat=True)), totals['hashtags'])
+        self.assertEqual(sum(Tag.objects.values_list('post_count', flat=True)), totals['tags'])
+
+    def test_seed_is_deterministic(self):
+        """Test the same seed produces the same dataset."""
+        seed(SeedConfig(users=20, chunk_size=7, seed=5, prefix='a'))
+        seed(SeedConfig(users=20, chunk_size=7, seed=5, prefix='b'))
+
+        def posts_per_user(prefix):
+            return [User.objects.get(username=f'{prefix}{n}').post_set.count() for n in range(20)]
+
+        self.assertEqual(posts_per_user('a'), posts_per_user('b'))
+
+    def test_seed_uniform_without_skew(self):
+        """Test skew=0 gives every user the same number of posts and hashtags."""
+        seed(SeedConfig(users=5, posts_per_user=3, hashtags_per_post=2, mention_density=1, skew=0))
+
+        self.assertEqual(Post.objects.count(), 15)
+        self.assertEqual(Post.hashtags.through.objects.count(), 30)
+        self.assertEqual(Post.tags.through.objects.count(), 15)
+
+    def test_seed_skewed_posts(self):
+        """Test skew concentrates posts on a few users."""
+        seed(SeedConfig(users=200, posts_per_user=5, skew=2, chunk_size=50))
+
+        counts = sorted((user.post_set.count() for user in User.objects.all()), reverse=True)
+        self.assertGreater(sum(counts[:20]), sum(counts[100:]))
+
+    def test_seed_mentions_real_users(self):
+        """Test mention tags refer to seeded usernames and passwords work."""
+        seed(SeedConfig(users=10, mention_density=2, skew=0))
+
+        usernames = set(User.objects.values_list('username', flat=True))
+        self.assertTrue(set(Tag.objects.values_list('somebody', flat=True)) <= usernames)
+        self.assertTrue(User.objects.get(username='user0').check_password('seedpass123'))
+
+    def test_seed_command(self):
+        """Test the seed command refuses to reuse a prefix."""
+        out = StringIO()
+        call_command('seed', users=3, posts_per_user=2, stdout=out)
+
+        self.assertEqual(User.objects.count(), 3)
+        with self.assertRaises(CommandError):
+            call_command('seed', users=3, stdout=out)
@@ -0,0 +1,143 @@
+"""
+Tests for sharding user-owned rows.
+"""
+import unittest
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import routers, sharding  # noqa
+from core.models import CanonicalHashTag, HashTag, IdBlock, Mention, Post, ShardAssignment, Tag, User  # noqa
+from core.tests.test_admin import create_user  # noqa
+
+SHARDS = {'ALIASES': ['default', 'shard_1'], 'BLOCK_SIZE': 10, 'DIRECTORY_CACHE_SECONDS': 5}
+
+
+@override_settings(SHARDING=SHARDS)
+class ShardingTests(TestCase):
+    """Test shard routing and id allocation."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+
+    def test_unassigned_user_stays_on_default(self):
+        """Test users without an assignment keep their rows on default."""
+        self.assertEqual(sharding.shard_for_user(self.user.pk), 'default')
+
+    def test_router_uses_owner_shard(self):
+        """Test sharded models are routed by their owner's assignment."""
+        sharding.set_assignment(self.user.pk, alias='shard_1')
+        router = routers.ShardRouter()
+        post = Post(user=self.user, title='t', body='t')
+
+        self.assertEqual(router.db_for_write(Post, instance=post), 'shard_1')
+        self.assertIsNone(router.db_for_write(User, instance=self.user))
+        with sharding.use_shard('shard_1'):
+            self.assertEqual(router.db_for_read(Post), 'shard_1')
+        self.assertIsNone(router.db_for_read(Post))
+
+    @override_settings(SHARDING={'ALIASES': ['default']})
+    def test_router_inactive_without_shards(self):
+        """Test nothing is routed when there is a single database."""
+        with sharding.use_shard('shard_1'):
+            self.assertIsNone(routers.ShardRouter().db_for_read(Post))
+
+    def test_new_users_assigned_round_robin(self):
+        """Test new users get a shard from their id."""
+        sharding.assign_shard(User, self.user, created=True)
+
+        assignment = ShardAssignment.objects.get(user=self.user)
+        self.assertEqual(assignment.alias, SHARDS['ALIASES'][self.user.pk % 2])
+
+    def test_hi_lo_ids_encode_shard(self):
+        """Test allocated ids are unique, increasing and carry the shard index."""
+        generator = sharding.HiLoIdGenerator()
+        ids = [generator.next_id(Post, 'default') for _ in range(25)]
+
+        self.assertEqual(len(set(ids)), 25)
+        self.assertEqual(ids, sorted(ids))
+        self.assertTrue(all(sharding.shard_index(pk) == 0 for pk in ids))
+        self.assertEqual(IdBlock.objects.get(name='core.post').next_hi, 4)
+
+    def test_hi_lo_ids_start_above_existing_rows(self):
+        """Test the first block is allocated past ids already in the table."""
+        post = Post.objects.create(user=self.user, title='t', body='t')
+        pk = sharding.HiLoIdGenerator().next_id(Post, 'default')
+
+        self.assertGreater(pk, post.pk)
+
+    def test_writes_refused_while_moving(self):
+        """Test writes get 503 with Retry-After while the user is moving."""
+        sharding.set_assignment(self.user.pk, alias='default', moving=True)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.post(reverse('post:post-list'), {'title': 't', 'body': 't'})
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res['Retry-After'], '5')
+
+        res = client.get(reverse('post:post-list'))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_move_to_same_shard_is_noop(self):
+        """Test moving a user to its current shard does nothing."""
+        Post.objects.create(user=self.user, title='t', body='t')
+
+        self.assertEqual(sharding.move_user(self.user.pk, 'default', pause=0), 0)
+        self.assertEqual(Post.objects.filter(user=self.user).count(), 1)
+
+
+@unittest.skipUnless('shard_1' in settings.DATABASES, 'needs a second database')
+@override_settings(SHARDING=SHARDS)
+class MoveUserTests(TestCase):
+    """Test moving a user's rows between two databases."""
+    databases = {'default', 'shard_1'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.other = create_user(email='other@example.com', username='other')
+        sharding.set_assignment(self.user.pk, alias='default')
+        # Users are replicated by signals only connected when shards are set up at startup.
+        sharding.copy_user(self.other, 'shard_1')
+
+    def _rows(self, alias):
+        user_id = self.user.pk
+        links = {'post__user_id': user_id}
+        return {
+            'posts': set(Post.objects.using(alias).filter(user_id=user_id).values_list('pk', 'title')),
+            'hashtags': set(
+                HashTag.objects.using(alias).filter(user_id=user_id).values_list('pk', 'name', 'post_count')
+            ),
+            'tags': set(Tag.objects.using(alias).filter(user_id=user_id).values_list('pk', 'somebody', 'post_count')),
+            'post_hashtags': set(
+                Post.hashtags.through.objects.using(alias).filter(**links).values_list('post_id', 'hashtag_id')
+            ),
+            'post_tags': set(Post.tags.through.objects.using(alias).filter(**links).values_list('post_id', 'tag_id')),
+            'mentions': set(Mention.objects.using(alias).filter(**links).values_list('post_id', 'mentioned_id')),
+        }
+
+    def test_move_user_copies_rows_and_deletes_source(self):
+        """Test posts, hashtags, tags, their links and mentions end up on the target only."""
+        hashtag = HashTag.objects.create(user=self.user, name='#Food')
+        tag = Tag.objects.create(user=self.user, somebody='other')
+        for i in range(3):
+            post = Post.objects.create(user=self.user, title=f'p{i}', body='b')
+            post.hashtags.add(hashtag)
+            post.tags.add(tag)
+            Mention.objects.create(post=post, mentioned=self.other, created_at=post.created_at)
+        before = self._rows('default')
+
+        sharding.move_user(self.user.pk, 'shard_1', chunk_size=2, pause=0)
+
+        self.assertEqual(sharding.shard_for_user(self.user.pk), 'shard_1')
+        self.assertEqual(self._rows('shard_1'), before)
+        self.assertEqual(len(before['posts']), 3)
+        self.assertIn((hashtag.pk, '#Food', 3), before['hashtags'])
+        self.assertTrue(CanonicalHashTag.objects.using('shard_1').filter(name='food').exists())
+        self.assertFalse(any(self._rows('default').values()))
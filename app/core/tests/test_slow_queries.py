@@ -0,0 +1,84 @@
+"""
+Tests for slow query capture.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Post, SlowQuery  # noqa
+from core.slow_queries import SlowQueryObserver  # noqa
+from core.tests.test_admin import create_user  # noqa
+
+
+class SlowQueryObserverTests(TestCase):
+    """Test capturing slow queries."""
+
+    def setUp(self):
+        self.user = create_user()
+
+    def _run(self, observer, *querysets):
+        with self.captureOnCommitCallbacks(execute=True):
+            with connection.execute_wrapper(observer):
+                for queryset in querysets:
+                    list(queryset)
+
+    def test_capture_with_plan(self):
+        """Test a slow SELECT is stored with its plan and calling location."""
+        self._run(SlowQueryObserver(threshold_ms=0), Post.objects.filter(user=self.user))
+
+        query = SlowQuery.objects.get()
+        self.assertIn('core_post', query.sql)
+        self.assertIn(str(self.user.id), query.params)
+        self.assertTrue(query.plan)
+        self.assertIn('test_slow_queries.py', query.location)
+
+    def test_fast_queries_ignored(self):
+        """Test statements below the threshold are not captured."""
+        self._run(SlowQueryObserver(threshold_ms=10_000), Post.objects.all())
+
+        self.assertFalse(SlowQuery.objects.exists())
+
+    def test_rate_limited(self):
+        """Test captures are limited per minute and per statement."""
+        self._run(SlowQueryObserver(threshold_ms=0, max_per_minute=2),
+                  Post.objects.all(), Post.objects.all(), Post.objects.filter(title='a'),
+                  Post.objects.filter(body='b'))
+
+        self.assertEqual(SlowQuery.objects.count(), 2)
+
+    def test_writes_not_explained(self):
+        """Test non SELECT statements are captured without a plan."""
+        with self.captureOnCommitCallbacks(execute=True):
+            with connection.execute_wrapper(SlowQueryObserver(threshold_ms=0)):
+                Post.objects.create(user=self.user, title='Title', body='Body')
+
+        query = SlowQuery.objects.get()
+        self.assertTrue(query.sql.startswith('INSERT'))
+        self.assertEqual(query.plan, '')
+
+    @override_settings(SLOW_QUERIES={'ENABLED': True})
+    def test_view_recorded(self):
+        """Test the view running the statement is recorded."""
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with connection.execute_wrapper(SlowQueryObserver(threshold_ms=0)):
+                client.get(reverse('post:post-list'))
+
+        self.assertEqual(SlowQuery.objects.get().view, 'post:post-list')
+
+    def test_admin_lists_slow_queries(self):
+        """Test slow queries are browsable in the admin."""
+        self._run(SlowQueryObserver(threshold_ms=0), Post.objects.all())
+        admin = get_user_model().objects.create_superuser(
+            'admin@example.com', 'Admin', 'User', 'admin', 'testpass123')
+        self.client.force_login(admin)
+
+        res = self.client.get(reverse('admin:core_slowquery_changelist'))
+        self.assertEqual(res.status_code, 200)
+
+        res = self.client.get(reverse('admin:core_slowquery_change', args=[SlowQuery.objects.get().id]))
+        self.assertContains(res, 'core_post')
@@ -0,0 +1,144 @@
+"""
+Tests for the database task queue.
+"""
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db import OperationalError, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import tasks  # noqa
+from core.models import Task  # noqa
+
+CALLS = []
+
+TASKS = {'BATCH_SIZE': 10, 'POLL_SECONDS': 0, 'STALE_SECONDS': 60, 'MAX_ATTEMPTS': 2,
+         'RETRY_DELAY_SECONDS': 10, 'MAX_RETRY_DELAY_SECONDS': 60}
+
+
+@tasks.task
+def remember(value, suffix=''):
+    CALLS.append(f'{value}{suffix}')
+
+
+@tasks.task(priority=5)
+def urgent(value):
+    CALLS.append(f'urgent {value}')
+
+
+@tasks.task(batched=True)
+def remember_all(values):
+    CALLS.append(sorted(values))
+
+
+@tasks.task
+def explode():
+    raise RuntimeError('boom')
+
+
+@override_settings(TASKS=TASKS)
+class TaskQueueTests(TestCase):
+    """Test queueing, claiming and running tasks."""
+
+    def setUp(self):
+        CALLS.clear()
+
+    def test_enqueue_follows_transaction(self):
+        """Test a task queued in a rolled back transaction is never stored."""
+        remember.enqueue(1)
+        try:
+            with transaction.atomic():
+                remember.enqueue(2)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+
+        task = Task.objects.get()
+        self.assertEqual((task.name, task.args, task.status), ('core.tests.test_tasks.remember', [1], Task.QUEUED))
+
+    def test_worker_runs_by_priority_and_deletes(self):
+        """Test due tasks run highest priority first and leave the table."""
+        remember.enqueue(1, suffix='!')
+        urgent.enqueue(2)
+        tasks.enqueue(remember, [3], countdown=60)
+
+        self.assertEqual(tasks.Worker().run_batch(), 2)
+
+        self.assertEqual(CALLS, ['urgent 2', '1!'])
+        self.assertEqual(list(Task.objects.values_list('args', flat=True)), [[3]])
+
+    def test_batched_task_gets_every_argument(self):
+        """Test a batched task runs once for all claimed tasks."""
+        for value in (3, 1, 2):
+            remember_all.enqueue(value)
+
+        tasks.Worker().run_batch()
+
+        self.assertEqual(CALLS, [[1, 2, 3]])
+        self.assertFalse(Task.objects.exists())
+
+    def test_failures_retry_then_fail(self):
+        """Test a failing task is retried later and kept as failed after max_attempts."""
+        explode.enqueue()
+
+        with patch('core.tasks.random.uniform', side_effect=lambda low, high: high), self.assertLogs('core.tasks'):
+            tasks.Worker().run_batch()
+        task = Task.objects.get()
+        self.assertEqual((task.status, task.attempts), (Task.QUEUED, 1))
+        self.assertIn('boom', task.last_error)
+        self.assertAlmostEqual((task.run_at - timezone.now()).total_seconds(), 10, delta=2)
+
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('core.tasks'):
+            tasks.Worker().run_batch()
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.FAILED, 2))
+        self.assertEqual(tasks.Worker().run_batch(), 0)
+
+    def test_stale_running_task_is_claimed_again(self):
+        """Test a task left running by a dead worker is retried after STALE_SECONDS."""
+        remember.enqueue(1)
+        Task.objects.update(status=Task.RUNNING, attempts=1, started_at=timezone.now() - timedelta(seconds=30))
+        self.assertEqual(tasks.Worker().run_batch(), 0)
+
+        Task.objects.update(started_at=timezone.now() - timedelta(seconds=90))
+        self.assertEqual(tasks.Worker().run_batch(), 1)
+        self.assertEqual(CALLS, ['1'])
+
+    def test_run_workers_once(self):
+        """Test run_workers --once drains the queue in batches and exits."""
+        for value in range(5):
+            remember.enqueue(value)
+
+        # Closing connections would close the one holding the test transaction.
+        with patch('core.tasks.close_old_connections'):
+            call_command('run_workers', '--once', '--batch-size', '2', stdout=StringIO())
+
+        self.assertEqual(sorted(CALLS), ['0', '1', '2', '3', '4'])
+        self.assertFalse(Task.objects.exists())
+
+    @patch('core.tasks.connections')
+    @patch('core.tasks.close_old_connections')
+    def test_worker_survives_database_errors(self, patched_close, patched_connections):
+        """Test a failed batch is logged, the connections closed and the next one run after a backoff."""
+        stop = threading.Event()
+        batches = iter([OperationalError('gone'), OperationalError('gone'), 1])
+
+        def run_batch():
+            result = next(batches)
+            if isinstance(result, Exception):
+                raise result
+            stop.set()
+            return result
+
+        worker = tasks.Worker(poll_seconds=1)
+        with patch.object(worker, 'run_batch', side_effect=run_batch), patch.object(stop, 'wait') as wait:
+            with self.assertLogs('core.tasks', 'ERROR'):
+                worker.run(stop)
+
+        self.assertEqual([c.args[0] for c in wait.call_args_list], [1, 2])
+        self.assertEqual(patched_connections.close_all.call_count, 2)
@@ -0,0 +1,110 @@
+"""
+Tests for token bucket throttling.
+"""
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.client import RequestFactory
+from django.urls import resolve, reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import throttling  # noqa
+from core.tests.test_admin import create_user  # noqa
+
+THROTTLING = {
+    'ENABLED': True,
+    'STORE': 'core.throttling.LocalStore',
+    'RATES': {'user': '60/min', 'ip': '60/min'},
+    'BURST': {'user': 3, 'ip': 5},
+    'COSTS': {'POST user:token': 5},
+}
+
+
+class TokenBucketTests(SimpleTestCase):
+    """Test the bucket arithmetic."""
+
+    def _bucket(self, store):
+        return throttling.TokenBucket(store, rate=1, burst=3)
+
+    def _check_bucket(self, store):
+        bucket = self._bucket(store)
+
+        self.assertEqual([bucket.consume('k', now=0)[0] for _ in range(3)], [True] * 3)
+        self.assertEqual(bucket.consume('k', now=0), (False, 1.0))
+        self.assertEqual(bucket.consume('k', now=1000), (True, 0))
+        self.assertFalse(bucket.consume('k', now=1000)[0])
+        # Idle time refills the bucket, but never beyond its burst.
+        self.assertEqual([bucket.consume('k', now=60_000)[0] for _ in range(4)], [True] * 3 + [False])
+
+    def test_local_store(self):
+        """Test bursts, refill and Retry-After with the in-memory store."""
+        self._check_bucket(throttling.LocalStore())
+
+    def test_cache_store(self):
+        """Test the shared cache store behaves the same."""
+        cache.clear()
+        self._check_bucket(throttling.CacheStore())
+
+    def test_cost(self):
+        """Test a costly request takes several tokens."""
+        bucket = self._bucket(throttling.LocalStore())
+
+        self.assertTrue(bucket.consume('k', cost=3, now=0)[0])
+        self.assertEqual(bucket.consume('k', cost=2, now=0), (False, 2.0))
+        self.assertTrue(bucket.consume('k', cost=1, now=1000)[0])
+
+    def test_parse_rate(self):
+        """Test rates are converted to tokens per second."""
+        self.assertEqual(throttling.parse_rate('120/min'), 2)
+        self.assertEqual(throttling.parse_rate('5/s'), 5)
+
+
+class RequestCostTests(SimpleTestCase):
+    """Test the configured request costs."""
+
+    def _cost(self, view_name):
+        request = RequestFactory().post(reverse(view_name))
+        request.resolver_match = resolve(request.path)
+        return throttling.request_cost(request)
+
+    def test_login_routes_cost_the_same(self):
+        """Test both token routes draw the same cost, so neither is a cheaper way to guess passwords."""
+        self.assertGreater(self._cost('user:token'), 1)
+        self.assertEqual(self._cost('user:token-async'), self._cost('user:token'))
+
+
+@override_settings(THROTTLING=THROTTLING)
+class ThrottleApiTests(TestCase):
+    """Test throttles on the API."""
+
+    def setUp(self):
+        throttling._stores.clear()
+        self.client = APIClient()
+
+    def tearDown(self):
+        throttling._stores.clear()
+
+    def test_token_endpoint_costs_more(self):
+        """Test the token endpoint exhausts the address bucket quickly."""
+        url = reverse('user:token')
+
+        res = self.client.post(url, {'username': 'nobody', 'password': 'wrong'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(url, {'username': 'nobody', 'password': 'wrong'})
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '5')
+
+    def test_user_bucket(self):
+        """Test authenticated users get their own bucket."""
+        self.client.force_authenticate(create_user())
+        codes = [self.client.get(reverse('user:me')).status_code for _ in range(4)]
+
+        self.assertEqual(codes, [200, 200, 200, 429])
+
+    @override_settings(THROTTLING={**THROTTLING, 'ENABLED': False})
+    def test_disabled(self):
+        """Test nothing is throttled when disabled."""
+        codes = {self.client.get(reverse('user:me')).status_code for _ in range(10)}
+
+        self.assertEqual(codes, {status.HTTP_401_UNAUTHORIZED})
@@ -0,0 +1,51 @@
+"""
+Tests for the mention and hashtag tokenizer.
+"""
+from django.test import SimpleTestCase
+
+from core.tokenizer import extract  # noqa
+
+
+class ExtractTests(SimpleTestCase):
+    """Test pulling mentions and hashtags out of text."""
+
+    def test_tokens_after_any_whitespace_or_punctuation(self):
+        """Test tokens are found after newlines, tabs, double spaces and brackets."""
+        text = 'Hi  @ann,\n@bob\t(#Food) and "#fun"!'
+
+        self.assertEqual(extract(text), (['ann', 'bob'], ['#Food', '#fun']))
+
+    def test_empty_and_blank_text(self):
+        """Test text without tokens, including lone markers."""
+        self.assertEqual(extract(''), ([], []))
+        self.assertEqual(extract('  @ # @@ ##  '), ([], []))
+
+    def test_word_boundaries(self):
+        """Test e-mail addresses and markers inside words are not tokens."""
+        text = 'mail me@example.com or @nobody@example.com, use C# and #a#b or x#y'
+
+        self.assertEqual(extract(text), ([], []))
+
+    def test_mention_punctuation(self):
+        """Test inner dots and dashes belong to mentions, trailing ones do not."""
+        self.assertEqual(extract('thanks @ann.lee-s. and @bob-'), (['ann.lee-s', 'bob'], []))
+
+    def test_unicode_words(self):
+        """Test non-ASCII letters are part of tokens."""
+        self.assertEqual(extract('@josé likes #Café and #東京'), (['josé'], ['#Café', '#東京']))
+
+    def test_duplicates(self):
+        """Test repeated tokens are kept once, hashtags under their first spelling."""
+        self.assertEqual(extract('@ann #Fun @ann #FUN #fun'), (['ann'], ['#Fun']))
+
+    def test_too_long_tokens_skipped(self):
+        """Test tokens longer than the stored columns are skipped."""
+        self.assertEqual(extract(f'@{"a" * 51} #{"b" * 50} #{"c" * 49}'), ([], [f'#{"c" * 49}']))
+
+    def test_mention_length_follows_usernames(self):
+        """Test mentions are kept up to the longest username and skipped beyond."""
+        self.assertEqual(extract(f'@{"a" * 31} @{"b" * 50} @{"c" * 51}'), (['a' * 31, 'b' * 50], []))
+
+    def test_mentions_lowercased_like_usernames(self):
+        """Test mentions are matched case insensitively, as usernames are stored lowercase."""
+        self.assertEqual(extract('@Alice and @ALICE met @bob'), (['alice', 'bob'], []))
@@ -0,0 +1,159 @@
+"""
+Token bucket throttles.
+
+Each client has a bucket of BURST tokens refilled at RATE; a request takes
+as many tokens as its cost in THROTTLING['COSTS'] and is refused with 429
+and Retry-After when the bucket cannot cover it.
+
+Buckets follow the generic cell rate algorithm: the store keeps one
+integer per client, the time in milliseconds at which its bucket will be
+full again, and moves it with atomic increments only, so any cache with an
+atomic incr (memcached, redis) can be shared by every worker. Races only
+ever make a bucket stricter. LocalStore keeps buckets in process memory
+for tests and single-process setups.
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+
+UNITS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+# Keys outlive any bucket, which is full again at most BURST / RATE after
+# its last request; a key expiring early would only hand out one more burst.
+KEY_TIMEOUT = 3600
+
+
+def parse_rate(rate):
+    """Return tokens per second for a rate like '300/min'."""
+    count, unit = rate.split('/')
+    return int(count) / UNITS[unit]
+
+
+class CacheStore:
+    """Buckets in a Django cache, shared by every process using it."""
+
+    def __init__(self, alias='default'):
+        self.cache = caches[alias]
+
+    def add(self, key, value, timeout):
+        return self.cache.add(key, value, timeout)
+
+    def incr(self, key, delta):
+        return self.cache.incr(key, delta)
+
+
+class LocalStore:
+    """Buckets in process memory."""
+
+    def __init__(self, alias=None):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def add(self, key, value, timeout):
+        with self._lock:
+            current = self._values.get(key)
+            if current is not None and current[1] > time.monotonic():
+                return False
+            self._values[key] = (value, time.monotonic() + timeout)
+            return True
+
+    def incr(self, key, delta):
+        with self._lock:
+            value, expires = self._values.get(key, (None, 0))
+            if expires <= time.monotonic():
+                raise ValueError(f'Key "{key}" not found')
+            self._values[key] = (value + delta, expires)
+            return value + delta
+
+
+class TokenBucket:
+    """Token bucket holding burst tokens, refilled at rate tokens per second."""
+
+    def __init__(self, store, rate, burst):
+        self.store = store
+        self.interval = 1000 / rate
+        self.tolerance = int(burst * self.interval)
+
+    def consume(self, key, cost=1, now=None):
+        """Take cost tokens; return (allowed, seconds until they would be)."""
+        now = int(time.time() * 1000) if now is None else now
+        increment = math.ceil(cost * self.interval)
+        try:
+            self.store.add(key, now, KEY_TIMEOUT)
+            full_at = self.store.incr(key, increment)
+        except ValueError:
+            # The key expired between add and incr; start a full bucket.
+            self.store.add(key, now + increment, KEY_TIMEOUT)
+            full_at = now + increment
+        if full_at - increment < now:
+            # The bucket was already full; tokens do not accumulate past it.
+            full_at = self.store.incr(key, now - (full_at - increment))
+
+        excess = full_at - now - self.tolerance
+        if excess > 0:
+            self.store.incr(key, -increment)
+            return False, excess / 1000
+        return True, 0
+
+
+_stores = {}
+
+
+def get_store():
+    """Return the configured store, one instance per process."""
+    config = settings.THROTTLING
+    path, alias = config.get('STORE', 'core.throttling.CacheStore'), config.get('CACHE', 'default')
+    if (path, alias) not in _stores:
+        _stores[(path, alias)] = import_string(path)(alias)
+    return _stores[(path, alias)]
+
+
+def request_cost(request):
+    """Return the cost of a request from THROTTLING['COSTS'], 1 by default."""
+    match = request.resolver_match
+    name = f'{request.method} {match.view_name}' if match else request.method
+    return settings.THROTTLING.get('COSTS', {}).get(name, 1)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Base for throttles keeping one bucket per client of a scope."""
+    scope = None
+
+    def get_key(self, request):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        config = settings.THROTTLING
+        if not config.get('ENABLED'):
+            return True
+        ident = self.get_key(request)
+        if ident is None:
+            return True
+
+        bucket = TokenBucket(get_store(), parse_rate(config['RATES'][self.scope]), config['BURST'][self.scope])
+        allowed, self.retry_after = bucket.consume(f'throttle:{self.scope}:{ident}', request_cost(request))
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """One bucket per authenticated user."""
+    scope = 'user'
+
+    def get_key(self, request):
+        return request.user.pk if request.user and request.user.is_authenticated else None
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """One bucket per client address, for every request."""
+    scope = 'ip'
+
+    def get_key(self, request):
+        return self.get_ident(request)
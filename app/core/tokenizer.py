@@ -0,0 +1,47 @@
+"""
+Mentions and hashtags in post bodies.
+
+A single compiled pattern finds both in one scan. A token starts at '@'
+or '#' that does not follow a word character, '@' or '#', and must not run
+into one of those either, so e-mail addresses, 'C#' or '#a#b' are not
+tokens. Words are Unicode: '#café' and '@josé' are whole tokens. Mentions
+may contain inner dots and dashes, but trailing punctuation is not part of
+them, as in 'thanks @ann.'.
+"""
+import re
+
+from core.models import CanonicalHashTag, HashTag, User  # noqa
+
+MENTION_MAX_LENGTH = User._meta.get_field('username').max_length
+HASHTAG_MAX_LENGTH = HashTag._meta.get_field('name').max_length
+
+# The marker comes first so that the scan only stops at '@' and '#'; the
+# lookbehind then checks the character before it.
+TOKEN_RE = re.compile(
+    r'[@#](?<![\w@#][@#])'
+    r'(?:(?<=@)(?P<mention>\w(?:[\w.-]*\w)?)|(?<=#)(?P<hashtag>\w+))'
+    r'(?![\w@#])'
+)
+
+
+def normalize_mention(name):
+    """Return the username a mention refers to; usernames are stored lowercase."""
+    return name.lower()
+
+
+def extract(text):
+    """Return (mentioned usernames, hashtag names) of text in order of appearance.
+
+    Mentions are lowercased like usernames and repeated ones dropped, and
+    so are hashtags repeated under any spelling, keeping the first. Tokens
+    too long to be stored are skipped.
+    """
+    mentions = {}
+    hashtags = {}
+    for mention, hashtag in TOKEN_RE.findall(text):
+        if mention:
+            if len(mention) <= MENTION_MAX_LENGTH:
+                mentions.setdefault(normalize_mention(mention), None)
+        elif len(hashtag) < HASHTAG_MAX_LENGTH:
+            hashtags.setdefault(CanonicalHashTag.key(hashtag), f'#{hashtag}')
+    return list(mentions), list(hashtags.values())
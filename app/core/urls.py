@@ -0,0 +1,16 @@
+"""
+URL mappings for the core app.
+"""
+from django.urls import path
+
+from core import views  # noqa
+
+app_name = 'core'
+
+urlpatterns = [
+    path('health/live/', views.health_live, name='health-live'),
+    path('health/ready/', views.health_ready, name='health-ready'),
+    path('metrics/', views.metrics_view, name='metrics'),
+    path('profiles/', views.ProfileListView.as_view(), name='profile-list'),
+    path('profiles/<str:name>/', views.ProfileDownloadView.as_view(), name='profile-detail'),
+]
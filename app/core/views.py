@@ -0,0 +1,93 @@
+"""
+Views for operational endpoints.
+"""
+from django.conf import settings
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseForbidden, HttpResponseNotModified, JsonResponse,
+)
+from django.utils.cache import patch_cache_control
+from django.utils.crypto import constant_time_compare
+from rest_framework import authentication, permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core import health, metrics, profiling, schema  # noqa
+from core.authentication import TokenAuthentication  # noqa
+
+
+def metrics_view(request):
+    """Expose Prometheus metrics, aggregated across worker processes."""
+    token = settings.METRICS.get('TOKEN')
+    # Metrics name every route and its traffic; they are not served without a token.
+    if not token:
+        raise Http404
+    if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+
+    data, content_type = metrics.exposition()
+    return HttpResponse(data, content_type=content_type)
+
+
+def health_live(request):
+    """Report the process is up, without touching any backend."""
+    return JsonResponse({'status': 'ok'})
+
+
+def health_ready(request):
+    """Report whether the databases and cache are reachable."""
+    ready, checks = health.readiness()
+    return JsonResponse(
+        {'status': 'ok' if ready else 'unavailable', 'checks': checks},
+        status=200 if ready else 503,
+    )
+
+
+def schema_view(request):
+    """Serve the precomputed OpenAPI schema, YAML or JSON with ?format=json."""
+    fmt = 'json' if request.GET.get('format') == 'json' else 'yaml'
+    content, etag = schema.load(fmt)
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type=schema.FORMATS[fmt][1])
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+_docs_view = None
+
+
+def docs_view(request):
+    """Swagger UI, importing drf_spectacular on first use."""
+    global _docs_view
+    if _docs_view is None:
+        from drf_spectacular.views import SpectacularSwaggerView
+        _docs_view = SpectacularSwaggerView.as_view(url_name='api-schema')
+    return _docs_view(request)
+
+
+class ProfileListView(APIView):
+    """List saved request profiles."""
+    schema = None
+    authentication_classes = [TokenAuthentication, authentication.SessionAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response([
+            {'name': name, 'url': request.build_absolute_uri(f'{name}/')}
+            for name in profiling.list_profiles()
+        ])
+
+
+class ProfileDownloadView(APIView):
+    """Download a saved request profile."""
+    schema = None
+    authentication_classes = [TokenAuthentication, authentication.SessionAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, name):
+        path = profiling.profile_path(name)
+        if path is None:
+            raise Http404
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
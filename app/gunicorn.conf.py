@@ -0,0 +1,25 @@
+"""
+Gunicorn configuration.
+
+Set PROMETHEUS_MULTIPROC_DIR so every worker writes its metrics to a shared
+directory that /api/metrics/ aggregates.
+"""
+import glob
+import os
+
+from prometheus_client import multiprocess
+
+
+def on_starting(server):
+    """Remove metrics left behind by a previous master."""
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        os.makedirs(path, exist_ok=True)
+        for filename in glob.glob(os.path.join(path, '*.db')):
+            os.remove(filename)
+
+
+def child_exit(server, worker):
+    """Drop the live gauges of a worker that exited."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)
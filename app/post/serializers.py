@@ -2,18 +2,21 @@
 Serializers for post APIs
 """
 from rest_framework import serializers
-from core.models import User, Post, HashTag, Tag  # noqa
+from core import bloom, mentions, tokenizer
+from core.instrumentation import InstrumentedSerializerMixin  # noqa
+from core.metrics import record_username_check  # noqa
+from core.models import User, Post, CanonicalHashTag, HashTag, Tag  # noqa
 from django.contrib.auth import get_user_model
 from django.utils.translation import gettext as _
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     """Serializer for tags."""
 
     class Meta:
         model = Tag
-        fields = ['id', 'somebody']
-        read_only_fields = ['id']
+        fields = ['id', 'somebody', 'post_count']
+        read_only_fields = ['id', 'post_count']
 
     def validate(self, attrs):
         """Validate tags."""
@@ -26,16 +29,30 @@ class TagSerializer(serializers.ModelSerializer):
         return attrs
 
 
-class HashTagSerializer(serializers.ModelSerializer):
+class HashTagSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     """Serializer for Hashtags."""
 
     class Meta:
         model = HashTag
-        fields = ['id', 'name']
-        read_only_fields = ['id']
+        fields = ['id', 'name', 'post_count']
+        read_only_fields = ['id', 'post_count']
+
+    def validate_name(self, value):
+        """Refuse renaming a hashtag to one the user already has under another spelling."""
+        key = CanonicalHashTag.key(value)
+        if self.instance is not None and self.instance.canonical_id != key:
+            if HashTag.objects.filter(user=self.instance.user_id, canonical_id=key).exists():
+                raise serializers.ValidationError(_('You already have this hashtag.'), code='unique')
+        return value
+
+
+class HashTagSuggestionSerializer(serializers.Serializer):
+    """Serializer for hashtag autocomplete suggestions."""
+    name = serializers.CharField()
+    uses = serializers.IntegerField()
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     """Serializer for Post."""
     hashtags = HashTagSerializer(many=True, required=False)
     tags = TagSerializer(many=True, required=False)
@@ -50,40 +67,62 @@ class PostSerializer(serializers.ModelSerializer):
     @staticmethod
     def _get_tags_from_post_and_validate(body: str, tags: list) -> list:
         """Return a list of tags from the post."""
-        words: list = body.split(" ")
+        body_mentions, _hashtags = tokenizer.extract(body)
 
         # Add the tags created in for and post body.
-        all_tags = [word[1:] for word in words if word[0] == "@"] + \
-                   [tag['somebody'][1:] for tag in tags]
-
-        validated_tags = []
+        tag_mentions = [tokenizer.normalize_mention(tag['somebody'][1:]) for tag in tags]
+        all_tags = list(dict.fromkeys(body_mentions + tag_mentions))
 
+        candidates = []
         for username in all_tags:
-            if get_user_model().objects.filter(username=username).exists():
-                validated_tags.append({"somebody": username})
+            if bloom.usernames.might_exist(username):
+                candidates.append(username)
+            else:
+                record_username_check('rejected')
+        if not candidates:
+            return []
+
+        found = dict(get_user_model().objects.filter(username__in=candidates).values_list('username', 'id'))
+        for username in candidates:
+            record_username_check('found' if username in found else 'false_positive')
 
-        return validated_tags
+        return [{"somebody": username, "user_id": found[username]} for username in candidates if username in found]
 
     def _get_or_create_tags(self, tags, post):
-        """Handle getting or creating tags as needed."""
+        """Handle getting or creating tags as needed; return the ids of the users they mention."""
         tags = self._get_tags_from_post_and_validate(post.body, tags)
         auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag,
-            )
-            post.tags.add(tag_obj)
+        names = [tag['somebody'] for tag in tags]
+        existing = {tag.somebody: tag for tag in Tag.objects.filter(user=auth_user, somebody__in=names)}
+        tag_objs = [
+            existing.get(name) or Tag.objects.get_or_create(user=auth_user, somebody=name)[0]
+            for name in names
+        ]
+        if tag_objs:
+            post.tags.add(*tag_objs)
+        return [tag['user_id'] for tag in tags]
 
     def _get_or_create_hashtags(self, hashtags, post):
-        """Handle getting or creating hashtags as needed."""
+        """Handle getting or creating hashtags as needed, including those of the post body."""
         auth_user = self.context['request'].user
-        for hashtag in hashtags:
-            hashtag_obj, created = HashTag.objects.get_or_create(
+        _mentions, names = tokenizer.extract(post.body)
+        wanted = {}
+        for name in [hashtag['name'] for hashtag in hashtags] + names:
+            wanted.setdefault(CanonicalHashTag.key(name), name)
+        existing = {
+            hashtag.canonical_id: hashtag
+            for hashtag in HashTag.objects.filter(user=auth_user, canonical_id__in=wanted)
+        }
+        hashtag_objs = [
+            existing.get(key) or HashTag.objects.get_or_create(
                 user=auth_user,
-                **hashtag,
-            )
-            post.hashtags.add(hashtag_obj)
+                canonical_id=key,
+                defaults={'name': name},
+            )[0]
+            for key, name in wanted.items()
+        ]
+        if hashtag_objs:
+            post.hashtags.add(*hashtag_objs)
 
     def create(self, validated_data):
         """Create a post."""
@@ -91,7 +130,7 @@ class PostSerializer(serializers.ModelSerializer):
         tags = validated_data.pop('tags', [])
         post = Post.objects.create(**validated_data)
         self._get_or_create_hashtags(hashtags, post)
-        self._get_or_create_tags(tags, post)
+        mentions.add_mentions(post, self._get_or_create_tags(tags, post))
 
         return post
 
@@ -99,22 +138,26 @@ class PostSerializer(serializers.ModelSerializer):
         """Update post."""
         hashtags = validated_data.pop('hashtags', None)
         tags = validated_data.pop('tags', None)
+        body_changed = 'body' in validated_data
+
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save()
 
-        if tags is not None:
+        # Mentions and hashtags are read from the body as updated, so a new
+        # body replaces them even when the payload lists none.
+        if tags is not None or body_changed:
             instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
+            mentions.set_mentions(instance, self._get_or_create_tags(tags or [], instance))
 
-        if hashtags is not None:
+        if hashtags is not None or body_changed:
             instance.hashtags.clear()
-            self._get_or_create_hashtags(hashtags, instance)
+            self._get_or_create_hashtags(hashtags or [], instance)
 
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
         return instance
 
 
-class PostImageSerializer(serializers.ModelSerializer):
+class PostImageSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     """Serializer for uploading images to posts."""
 
     class Meta:
@@ -1,17 +1,24 @@
 """
 Tests for the hashtags API.
 """
+from datetime import timedelta
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlsplit
+
 from django.urls import reverse
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.utils import timezone
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from core import autocomplete  # noqa
 from core.models import HashTag, Post  # noqa
 from post.serializers import HashTagSerializer  # noqa
 from core.tests.test_admin import create_user  # noqa
 
 HASHTAGS_URL = reverse('post:hashtag-list')
+AUTOCOMPLETE_URL = reverse('post:hashtag-autocomplete')
 
 
 def detail_url(hashtag_id):
@@ -78,6 +85,17 @@ class PrivateHashTagsApiTests(TestCase):
         hashtag.refresh_from_db()
         self.assertEqual(hashtag.name, payload['name'])
 
+    def test_update_hashtag_to_existing_spelling(self):
+        """Test renaming a hashtag to another spelling of one the user has fails."""
+        HashTag.objects.create(user=self.user, name='#Coriander')
+        hashtag = HashTag.objects.create(user=self.user, name='#Cilantro')
+
+        res = self.client.patch(detail_url(hashtag.id), {'name': 'coriander'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.patch(detail_url(hashtag.id), {'name': '#CILANTRO'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
     def test_delete_HashTag(self):
         """Test deleting an HashTag."""
         hashtag = HashTag.objects.create(user=self.user, name='#Lettuce')
@@ -99,6 +117,7 @@ class PrivateHashTagsApiTests(TestCase):
             user=self.user,
         )
         post.hashtags.add(htag1)
+        htag1.refresh_from_db()
 
         res = self.client.get(HASHTAGS_URL, {'assigned_only': 1})
 
@@ -127,3 +146,134 @@ class PrivateHashTagsApiTests(TestCase):
         res = self.client.get(HASHTAGS_URL, {'assigned_only': 1})
 
         self.assertEqual(len(res.data), 1)
+        self.assertEqual(res.data[0]['post_count'], 2)
+
+    def test_order_hashtags_by_popularity(self):
+        """Test listing hashtags with the most used first."""
+        names = {'#Rare': 1, '#Common': 3, '#Unused': 0}
+        for name, posts in names.items():
+            hashtag = HashTag.objects.create(user=self.user, name=name)
+            for i in range(posts):
+                Post.objects.create(user=self.user, title=f'{name} {i}', body='b').hashtags.add(hashtag)
+
+        res = self.client.get(HASHTAGS_URL, {'ordering': 'popular'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([(h['name'], h['post_count']) for h in res.data],
+                         [('#Common', 3), ('#Rare', 1), ('#Unused', 0)])
+
+    def test_paginate_popular_hashtags(self):
+        """Test paging through hashtags by popularity with the cursor."""
+        uses = {'#a': 2, '#b': 0, '#c': 2, '#d': 1}
+        for name, posts in uses.items():
+            hashtag = HashTag.objects.create(user=self.user, name=name)
+            for i in range(posts):
+                Post.objects.create(user=self.user, title=f'{name} {i}', body='b').hashtags.add(hashtag)
+
+        first = self.client.get(HASHTAGS_URL, {'ordering': 'popular', 'page_size': 3})
+        cursor = parse_qs(urlsplit(first.data['next']).query)['cursor'][0]
+        second = self.client.get(HASHTAGS_URL, {'ordering': 'popular', 'page_size': 3, 'cursor': cursor})
+
+        self.assertEqual([h['name'] for h in first.data['results']], ['#c', '#a', '#d'])
+        self.assertEqual([h['name'] for h in second.data['results']], ['#b'])
+        self.assertIsNone(second.data['next'])
+
+    def test_invalid_cursor(self):
+        """Test a cursor for another ordering is rejected."""
+        res = self.client.get(HASHTAGS_URL, {'page_size': 1, 'cursor': 'WyIjYSIsICIxIl0='})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.get(HASHTAGS_URL, {'ordering': 'popular', 'cursor': 'WyIjYSIsICIxIl0='})
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_filter_hashtags_by_prefix(self):
+        """Test listing only the hashtags starting with q."""
+        for name in ['#python', '#pythonic', '#rust']:
+            HashTag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(HASHTAGS_URL, {'q': '#py'})
+
+        self.assertEqual([h['name'] for h in res.data], ['#pythonic', '#python'])
+
+
+@override_settings(HASHTAG_AUTOCOMPLETE={'LIMIT': 10, 'MAX_LIMIT': 50, 'REFRESH_SECONDS': 0,
+                                         'REBUILD_SECONDS': 3600})
+class HashTagAutocompleteApiTests(TestCase):
+    """Test hashtag suggestions."""
+
+    def setUp(self):
+        autocomplete.hashtags.reset()
+        # A background thread would not see the rows of the test transaction.
+        patcher = patch.object(autocomplete.hashtags, 'start', side_effect=autocomplete.hashtags.update)
+        self.start = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _use(self, user, name, posts):
+        hashtag = HashTag.objects.create(user=user, name=name)
+        for i in range(posts):
+            Post.objects.create(user=user, title=f'{name} {i}', body='b').hashtags.add(hashtag)
+
+    def test_suggestions_ranked_by_usage_across_users(self):
+        """Test suggestions match the prefix and are ordered by posts using them."""
+        other = create_user(email='other@example.com', username='other')
+        self._use(self.user, '#Cake', 1)
+        self._use(other, '#cake', 2)
+        self._use(self.user, '#Carrot', 2)
+        self._use(self.user, '#Kale', 5)
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'CA'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [{'name': '#cake', 'uses': 3}, {'name': '#carrot', 'uses': 2}])
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': '#ca', 'limit': 1})
+        self.assertEqual([s['name'] for s in res.data], ['#cake'])
+
+    def test_new_hashtags_are_merged_in(self):
+        """Test hashtags created after the index was built are suggested."""
+        self._use(self.user, '#cake', 1)
+        self.client.get(AUTOCOMPLETE_URL, {'q': 'ca'})
+
+        self._use(self.user, '#candy', 2)
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'ca'})
+
+        self.assertEqual(res.data, [{'name': '#candy', 'uses': 2}, {'name': '#cake', 'uses': 1}])
+
+    def test_late_commits_are_merged_once(self):
+        """Test a hashtag stamped before one already merged is still merged, and nothing twice."""
+        self._use(self.user, '#cake', 1)
+        self.client.get(AUTOCOMPLETE_URL, {'q': 'ca'})
+        self._use(self.user, '#candy', 2)
+        self.client.get(AUTOCOMPLETE_URL, {'q': 'ca'})
+
+        # Committed now, but stamped before #candy was read.
+        HashTag.objects.filter(name='#candy').update(created_at=timezone.now())
+        self._use(self.user, '#carrot', 1)
+        HashTag.objects.filter(name='#carrot').update(created_at=timezone.now() - timedelta(seconds=30))
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'ca'})
+
+        self.assertEqual(res.data, [
+            {'name': '#candy', 'uses': 2}, {'name': '#cake', 'uses': 1}, {'name': '#carrot', 'uses': 1},
+        ])
+
+    def test_requests_do_not_wait_for_the_index(self):
+        """Test requests get no suggestions without querying until the index is built."""
+        self._use(self.user, '#cake', 1)
+        self.start.side_effect = None
+
+        with self.assertNumQueries(0):
+            res = self.client.get(AUTOCOMPLETE_URL, {'q': 'ca'})
+
+        self.assertEqual(res.data, [])
+        self.start.assert_called_once_with()
+        autocomplete.hashtags.update()
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'ca'})
+        self.assertEqual(res.data, [{'name': '#cake', 'uses': 1}])
+
+    def test_invalid_limit(self):
+        """Test a non numeric limit is rejected."""
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'ca', 'limit': 'many'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
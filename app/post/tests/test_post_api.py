@@ -3,18 +3,24 @@ Tests for post APIs.
 """
 import tempfile
 import os
+from datetime import timedelta
 
 from PIL import Image  # noqa
 
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import User, Post, HashTag  # noqa
+from core import bloom  # noqa
+from core.models import User, Post, HashTag, Tag  # noqa
 from post.serializers import PostSerializer  # noqa
 from core.tests.test_admin import create_user  # noqa
+from core.bench import QueryBudgetMixin  # noqa
 
 POST_URL = reverse('post:post-list')
 
@@ -67,7 +73,7 @@ class PublicPostAPITests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivatePostApiTests(TestCase):
+class PrivatePostApiTests(QueryBudgetMixin, TestCase):
     """Test authenticated API requests."""
 
     def setUp(self):
@@ -87,6 +93,18 @@ class PrivatePostApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
 
+    def test_retrieve_posts_query_budget(self):
+        """Test listing posts does not run queries per post."""
+        for n in range(5):
+            post = create_post(user=self.user)
+            post.hashtags.add(HashTag.objects.create(user=self.user, name=f'#tag{n}'))
+
+        with self.assertQueryBudget('GET post:post-list'):
+            res = self.client.get(POST_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 5)
+
     def test_post_list_limited_to_user(self):
         """Test list of posts is limited to authenticated user."""
         other_user = create_user(email='other@example.com', username="user2")
@@ -219,6 +237,17 @@ class PrivatePostApiTests(TestCase):
             ).exists()
             self.assertTrue(exists)
 
+    def test_create_post_reuses_hashtag_spelled_differently(self):
+        """Test a hashtag differing only in case or # reuses the user's hashtag."""
+        hashtag = HashTag.objects.create(user=self.user, name='#Indian')
+        payload = {'title': 'Curry', 'body': 'b', 'hashtags': [{'name': 'INDIAN'}]}
+
+        res = self.client.post(POST_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(list(Post.objects.get(id=res.data['id']).hashtags.all()), [hashtag])
+        self.assertEqual(HashTag.objects.filter(user=self.user).count(), 1)
+
     def test_create_hashtag_on_update(self):
         """Test create hashtag when updating a post."""
         post = create_post(user=self.user)
@@ -310,6 +339,77 @@ class PrivatePostApiTests(TestCase):
         post = posts[0]
         self.assertEqual(post.tags.count(), 3)
 
+    def test_unknown_mentions_skip_the_database(self):
+        """Test mentions of names no user has are rejected without a lookup."""
+        bloom.usernames.reset()
+        create_user(email='user2@example.com', username="user2")
+        payload = {'title': 'Mentions', 'body': '@user2 @everyone @nobody@example.com', 'tags': []}
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(POST_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([tag.somebody for tag in Post.objects.get(id=res.data['id']).tags.all()], ['user2'])
+        lookups = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT') and 'core_user' in q['sql']]
+        self.assertFalse([sql for sql in lookups if 'everyone' in sql or 'nobody' in sql])
+
+    def test_body_mentions_and_hashtags(self):
+        """Test mentions after newlines and hashtags are read from the body, once each."""
+        create_user(email='user2@example.com', username="user2")
+        create_user(email='user3@example.com', username="user3")
+        HashTag.objects.create(user=self.user, name='#Food')
+        payload = {
+            'title': 'Body tokens',
+            'body': 'Lunch  with @user2\n@user3, @user2 again.\n#food #Travel #travel',
+            'hashtags': [{'name': '#Food'}],
+            'tags': [{'somebody': '@user3'}],
+        }
+
+        res = self.client.post(POST_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        post = Post.objects.get(id=res.data['id'])
+        self.assertEqual(sorted(tag.somebody for tag in post.tags.all()), ['user2', 'user3'])
+        self.assertEqual(sorted(hashtag.name for hashtag in post.hashtags.all()), ['#Food', '#Travel'])
+        self.assertEqual(HashTag.objects.filter(user=self.user).count(), 2)
+
+    def test_update_reads_the_new_body(self):
+        """Test replacing tags on update reads mentions from the updated body."""
+        create_user(email='user2@example.com', username="user2")
+        post = Post.objects.create(user=self.user, title='Hello', body='Hello @username')
+
+        res = self.client.patch(detail_url(post.id), {'body': 'Hello @user2', 'tags': []}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([tag.somebody for tag in post.tags.all()], ['user2'])
+
+    def test_mentions_match_usernames_case_insensitively(self):
+        """Test mentions and tags in any case resolve to the lowercase username."""
+        create_user(email='user2@example.com', username="User2")
+        long_name = 'u' * 50
+        create_user(email='long@example.com', username=long_name)
+        payload = {'title': 'Hi', 'body': f'Hi @USER2 and @{long_name}', 'tags': [{'somebody': '@User2'}]}
+
+        res = self.client.post(POST_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        post = Post.objects.get(id=res.data['id'])
+        self.assertEqual(sorted(tag.somebody for tag in post.tags.all()), ['user2', long_name])
+
+    def test_update_body_alone_replaces_tags_and_hashtags(self):
+        """Test a new body with no tags or hashtags in the payload is tokenized again."""
+        create_user(email='user2@example.com', username="user2")
+        create_user(email='user3@example.com', username="user3")
+        res = self.client.post(POST_URL, {'title': 'Hi', 'body': 'Hi @user2 #old'}, format='json')
+        post = Post.objects.get(id=res.data['id'])
+
+        res = self.client.patch(detail_url(post.id), {'body': 'Hi @user3 #new'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([tag.somebody for tag in post.tags.all()], ['user3'])
+        self.assertEqual([hashtag.name for hashtag in post.hashtags.all()], ['#new'])
+        self.assertEqual(HashTag.objects.get(user=self.user, name='#old').post_count, 0)
+
 
 class ImageUploadTests(TestCase):
     """Tests for the image upload API."""
@@ -346,3 +446,83 @@ class ImageUploadTests(TestCase):
         res = self.client.post(url, payload, format='multipart')
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PostFilterApiTests(TestCase):
+    """Test time range filters and keyset pagination of the post list."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+        self.now = timezone.now()
+
+    def _post(self, days_ago, **fields):
+        moment = self.now - timedelta(days=days_ago)
+        return Post.objects.create(user=self.user, title='t', body='b', created_at=moment, updated_at=moment, **fields)
+
+    def test_filter_since_until(self):
+        """Test since is inclusive and until exclusive."""
+        old = self._post(30)
+        middle = self._post(10)
+        self._post(1)
+
+        res = self.client.get(POST_URL, {
+            'since': old.created_at.isoformat(),
+            'until': (self.now - timedelta(days=5)).date().isoformat(),
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['id'] for p in res.data], [middle.id, old.id])
+
+    def test_filter_updated_since(self):
+        """Test filtering on the update time."""
+        post = self._post(30)
+        self._post(20)
+        post.updated_at = self.now
+        post.save()
+
+        res = self.client.get(POST_URL, {'updated_since': (self.now - timedelta(days=1)).isoformat()})
+
+        self.assertEqual([p['id'] for p in res.data], [post.id])
+
+    def test_invalid_date_returns_error(self):
+        """Test a malformed date is a bad request."""
+        res = self.client.get(POST_URL, {'since': 'yesterday'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('since', res.data)
+
+    def test_time_filter_combines_with_tags(self):
+        """Test time filters apply together with the tag filter."""
+        tag = Tag.objects.create(user=self.user, somebody='@user2')
+        recent = self._post(1)
+        recent.tags.add(tag)
+        self._post(1)
+        self._post(40).tags.add(tag)
+
+        res = self.client.get(POST_URL, {'tags': str(tag.id), 'since': (self.now - timedelta(days=7)).isoformat()})
+
+        self.assertEqual([p['id'] for p in res.data], [recent.id])
+
+    def test_keyset_pagination(self):
+        """Test pages follow (created_at, id) order, including ties."""
+        posts = [self._post(days) for days in (3, 3, 3, 2, 1)]
+        expected = [p.id for p in sorted(posts, key=lambda p: (p.created_at, p.id), reverse=True)]
+
+        seen = []
+        res = self.client.get(POST_URL, {'page_size': 2})
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            seen += [p['id'] for p in res.data['results']]
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor(self):
+        """Test a malformed cursor is rejected."""
+        res = self.client.get(POST_URL, {'cursor': 'garbage'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -1,6 +1,8 @@
 """
 Tests for the tags API.
 """
+from urllib.parse import parse_qs, urlsplit
+
 from django.urls import reverse
 from django.test import TestCase
 from rest_framework import status
@@ -61,7 +63,7 @@ class PrivateTagsApiTests(TestCase):
 
         res = self.client.get(TAGS_URL)
 
-        tags = Tag.objects.all().order_by('-somebody')
+        tags = Tag.objects.all().order_by('-somebody', '-id')
         serializer = TagSerializer(tags, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
@@ -108,6 +110,7 @@ class PrivateTagsApiTests(TestCase):
 
         post = create_post(user=self.user)
         post.tags.add(tag1)
+        tag1.refresh_from_db()
 
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
@@ -129,3 +132,30 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
         self.assertEqual(len(res.data), 1)
+
+    def test_paginate_tags(self):
+        """Test paging through tags with the cursor, including equal names."""
+        for name in ['@ann', '@bob', '@bob', '@cid', '@dee']:
+            Tag.objects.create(user=self.user, somebody=name)
+
+        seen = []
+        params = {'page_size': 2}
+        while True:
+            res = self.client.get(TAGS_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            seen.extend(tag['somebody'] for tag in res.data['results'])
+            if res.data['next'] is None:
+                break
+            params = parse_qs(urlsplit(res.data['next']).query)
+
+        self.assertEqual(seen, ['@dee', '@cid', '@bob', '@bob', '@ann'])
+
+    def test_filter_tags_by_prefix(self):
+        """Test listing only the tags starting with q."""
+        Tag.objects.create(user=self.user, somebody='@anna')
+        Tag.objects.create(user=self.user, somebody='@annie')
+        Tag.objects.create(user=self.user, somebody='@bob')
+
+        res = self.client.get(TAGS_URL, {'q': '@ann'})
+
+        self.assertEqual([tag['somebody'] for tag in res.data], ['@annie', '@anna'])
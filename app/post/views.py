@@ -1,6 +1,8 @@
 """
 Views for the recipe APIs
 """
+from datetime import datetime, time
+
 from drf_spectacular.utils import (
     extend_schema_view,
     extend_schema,
@@ -8,13 +10,21 @@ from drf_spectacular.utils import (
     OpenApiTypes,
 )
 
+from django.conf import settings
+from django.http import Http404
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.timezone import is_naive, make_aware
 from rest_framework import (viewsets, status, mixins)
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
+from core import archive, autocomplete  # noqa
+from core.authentication import TokenAuthentication  # noqa
 from core.models import Post, HashTag, Tag  # noqa
+from core.pagination import KeysetPagination  # noqa
+from core.sharding import ShardedViewMixin  # noqa
 from post import serializers  # noqa
 
 
@@ -31,28 +41,78 @@ from post import serializers  # noqa
                 OpenApiTypes.STR,
                 description='Comma separated list of tags IDs to filter',
             ),
+            OpenApiParameter(
+                'since',
+                OpenApiTypes.DATETIME,
+                description='Only posts created at or after this date or time.',
+            ),
+            OpenApiParameter(
+                'until',
+                OpenApiTypes.DATETIME,
+                description='Only posts created before this date or time.',
+            ),
+            OpenApiParameter(
+                'updated_since',
+                OpenApiTypes.DATETIME,
+                description='Only posts updated at or after this date or time.',
+            ),
+            OpenApiParameter(
+                'updated_until',
+                OpenApiTypes.DATETIME,
+                description='Only posts updated before this date or time.',
+            ),
         ]
     )
 )
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(ShardedViewMixin, viewsets.ModelViewSet):
     """View for managing post APIs."""
     serializer_class = serializers.PostSerializer
     queryset = Post.objects.all()
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    replica_actions = ('list', 'retrieve')
+    pagination_class = KeysetPagination
 
     def _params_to_ints(self, qs):
         """Convert a list of strings to integers."""
         return [int(str_id) for str_id in qs.split(',')]
 
+    def _param_to_datetime(self, name):
+        """Parse a date or datetime query parameter, None when absent."""
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            moment = parse_datetime(value)
+            if moment is None and parse_date(value) is not None:
+                moment = datetime.combine(parse_date(value), time.min)
+        except ValueError:
+            moment = None
+        if moment is None:
+            raise ValidationError({name: 'Enter a valid date or date and time.'})
+        return make_aware(moment) if is_naive(moment) else moment
+
     def get_queryset(self):
         """Retrieve posts for authenticated user."""
         hashtags = self.request.query_params.get('hashtags')
+        tags = self.request.query_params.get('tags')
         queryset = self.queryset
 
         if hashtags:
             hashtags_ids = self._params_to_ints(hashtags)
             queryset = queryset.filter(hashtags__id__in=hashtags_ids)
+        if tags:
+            queryset = queryset.filter(tags__id__in=self._params_to_ints(tags))
+
+        if self.action == 'list':
+            queryset = queryset.created_between(self._param_to_datetime('since'), self._param_to_datetime('until'))
+            updated_since = self._param_to_datetime('updated_since')
+            updated_until = self._param_to_datetime('updated_until')
+            if updated_since:
+                queryset = queryset.filter(updated_at__gte=updated_since)
+            if updated_until:
+                queryset = queryset.filter(updated_at__lt=updated_until)
+            queryset = queryset.prefetch_related('hashtags', 'tags')
 
         return queryset.filter(
             user=self.request.user
@@ -67,6 +127,17 @@ class PostViewSet(viewsets.ModelViewSet):
 
         return self.serializer_class
 
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve a post, from the archive when it is no longer in the database."""
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            record = archive.lookup(int(kwargs['pk'])) if kwargs['pk'].isdigit() else None
+            if record is None or record['user_id'] != request.user.id:
+                raise
+        serializer = self.get_serializer(archive.record_to_post(record))
+        return Response(serializer.data)
+
     def perform_create(self, serializer):
         """Create a new post."""
         serializer.save(user=self.request.user)
@@ -92,62 +163,57 @@ class PostViewSet(viewsets.ModelViewSet):
                 OpenApiTypes.INT, enum=[0, 1],
                 description='Filter by items assigned posts.',
             ),
+            OpenApiParameter(
+                'ordering',
+                OpenApiTypes.STR, enum=['popular'],
+                description='Order by number of posts, most used first.',
+            ),
+            OpenApiParameter(
+                'q',
+                OpenApiTypes.STR,
+                description='Only items starting with this text.',
+            ),
         ]
     )
 )
-class BasePostAttrViewSet(mixins.DestroyModelMixin,
+class BasePostAttrViewSet(ShardedViewMixin,
+                          mixins.DestroyModelMixin,
                           mixins.UpdateModelMixin,
                           mixins.ListModelMixin,
                           viewsets.GenericViewSet):
     """Base viewset for post attributes."""
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    replica_actions = ('list',)
+    pagination_class = KeysetPagination
+    name_field = 'name'
+
+    @property
+    def keyset_ordering(self):
+        """Sort key of the list, descending, each served by an index of the model."""
+        if self.request.query_params.get('ordering') == 'popular':
+            return ('post_count', self.name_field, 'id')
+        return (self.name_field, 'id')
 
     def get_queryset(self):
         """Filter queryset to authenticated user."""
         assigned_only = bool(
             int(self.request.query_params.get('assigned_only', 0))
         )
+        prefix = self.request.query_params.get('q')
         queryset = self.queryset
 
         if assigned_only:
-            queryset = queryset.filter(post__isnull=False)
-
-        return queryset.filter(
-            user=self.request.user).order_by('-name').distinct()
-
-
-@extend_schema_view(
-    list=extend_schema(
-        parameters=[
-            OpenApiParameter(
-                'assigned_only',
-                OpenApiTypes.INT, enum=[0, 1],
-                description='Filter by items assigned posts.',
-            ),
-        ]
-    )
-)
-class TagBasePostAttrViewSet(mixins.DestroyModelMixin,
-                             mixins.UpdateModelMixin,
-                             mixins.ListModelMixin,
-                             viewsets.GenericViewSet):
-    """Base viewset for post attributes."""
-    authentication_classes = [TokenAuthentication]
-    permission_classes = [IsAuthenticated]
+            queryset = queryset.filter(post_count__gt=0)
+        if prefix:
+            queryset = queryset.filter(**{f'{self.name_field}__startswith': prefix})
 
-    def get_queryset(self):
-        """Filter queryset to authenticated user."""
-        assigned_only = bool(
-            int(self.request.query_params.get('assigned_only', 0))
-        )
-        queryset = self.queryset
+        return queryset.filter(user=self.request.user).order_by(*[f'-{name}' for name in self.keyset_ordering])
 
-        if assigned_only:
-            queryset = queryset.filter(post__isnull=False)
 
-        return queryset.filter(
-            user=self.request.user).order_by('-somebody').distinct()
+class TagBasePostAttrViewSet(BasePostAttrViewSet):
+    """Base viewset for post attributes named by a username."""
+    name_field = 'somebody'
 
 
 class TagViewSet(TagBasePostAttrViewSet):
@@ -160,3 +226,23 @@ class HashTagViewSet(BasePostAttrViewSet):
     """Manage hashtags in the database."""
     serializer_class = serializers.HashTagSerializer
     queryset = HashTag.objects.all()
+    replica_actions = ('list', 'autocomplete')
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('q', OpenApiTypes.STR, description='Prefix to complete, with or without the #.'),
+            OpenApiParameter('limit', OpenApiTypes.INT, description='Number of suggestions, at most 50.'),
+        ],
+        responses=serializers.HashTagSuggestionSerializer(many=True),
+    )
+    @action(methods=['GET'], detail=False)
+    def autocomplete(self, request):
+        """Suggest the most used hashtags of every user starting with a prefix."""
+        config = settings.HASHTAG_AUTOCOMPLETE
+        try:
+            limit = int(request.query_params.get('limit', config['LIMIT']))
+        except ValueError:
+            raise ValidationError({'limit': 'Enter a whole number.'})
+        limit = min(max(limit, 1), config['MAX_LIMIT'])
+        suggestions = autocomplete.hashtags.suggest(request.query_params.get('q', ''), limit)
+        return Response(serializers.HashTagSuggestionSerializer(suggestions, many=True).data)
@@ -0,0 +1,81 @@
+"""
+Password login for the token endpoints.
+
+Credentials are checked like ModelBackend does, but the password hash runs
+on the bounded hashing pool, awaited by the async token view and waited on
+by the sync one. Clients already holding a valid token for the account get
+it back without hashing, and hashes made with outdated hasher parameters
+are replaced on a successful login.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, make_password
+from rest_framework.authentication import get_authorization_header
+from rest_framework.authtoken.models import Token
+
+from core.hashing import get_pool  # noqa
+from core.metrics import record_auth  # noqa
+
+
+def verify(encoded, password):
+    """Return (valid, new hash or None) for a stored hash and a password.
+
+    Runs on the hashing pool. The new hash is set when the password is
+    valid and the stored hash does not match the current hasher settings.
+    """
+    if encoded is None:
+        # Hash anyway so unknown usernames take as long as wrong passwords.
+        make_password(password)
+        return False, None
+    new_hashes = []
+    valid = check_password(password, encoded, setter=lambda raw: new_hashes.append(make_password(raw)))
+    return valid, new_hashes[0] if new_hashes else None
+
+
+def find_user(username):
+    User = get_user_model()
+    try:
+        user = User._default_manager.get_by_natural_key(username)
+    except User.DoesNotExist:
+        return None
+    return user if user.is_active else None
+
+
+def existing_token(request, username):
+    """Return the token the request carries if it belongs to username."""
+    auth = get_authorization_header(request).split()
+    if len(auth) != 2 or auth[0].lower() != b'token':
+        return None
+    try:
+        token = Token.objects.select_related('user').get(key=auth[1].decode())
+    except (Token.DoesNotExist, UnicodeError):
+        return None
+    user = token.user
+    return token if user.is_active and user.get_username() == username else None
+
+
+def _finish(user, valid, new_hash):
+    if not valid:
+        record_auth('password', 'failure')
+        return None
+    if new_hash:
+        user.password = new_hash
+        user.save(update_fields=['password'])
+    record_auth('password', 'success')
+    return user
+
+
+def authenticate_user(username, password):
+    """Return the active user with these credentials, or None."""
+    user = find_user(username)
+    valid, new_hash = get_pool().submit(verify, user and user.password, password).result()
+    return _finish(user, valid, new_hash)
+
+
+async def aauthenticate_user(username, password):
+    """authenticate_user for async views, waiting on the pool without blocking."""
+    user = await sync_to_async(find_user)(username)
+    valid, new_hash = await asyncio.wrap_future(get_pool().submit(verify, user and user.password, password))
+    return await sync_to_async(_finish)(user, valid, new_hash)
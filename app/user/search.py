@@ -0,0 +1,99 @@
+"""
+User search for @mention autocomplete.
+
+Accounts whose username, first name or last name starts with the typed
+prefix are looked up once per prefix and kept in the shared cache for
+CACHE_SECONDS, so every client typing the same letters costs one cache
+read. Each request then ranks that list for its caller, together with the
+accounts whose usernames start with the prefix among those the caller
+mentioned, read from the caller's own tags: accounts they mentioned before
+come first, most mentioned first, then username matches, then name
+matches and, for prefixes of MIN_INFIX characters or more, accounts
+containing the text anywhere.
+
+On PostgreSQL the prefix lookups use btree indexes on UPPER(column) with
+the pattern opclass and the infix ones pg_trgm GIN indexes.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from core.metrics import record_cache  # noqa
+from core.models import Tag, User  # noqa
+
+USERNAME_PREFIX, NAME_PREFIX, INFIX = 0, 1, 2
+FIELDS = ('username', 'first_name', 'last_name')
+
+
+def normalize(query):
+    """Return the search key of a query: trimmed, lowercase, without '@'."""
+    return query.strip().lstrip('@').lower()
+
+
+def _users(prefix):
+    """Return active users matching prefix, annotated with their match kind."""
+    name_prefix = Q(first_name__istartswith=prefix) | Q(last_name__istartswith=prefix)
+    condition = Q(username__istartswith=prefix) | name_prefix
+    if len(prefix) >= settings.USER_SEARCH['MIN_INFIX']:
+        for field in FIELDS:
+            condition |= Q(**{f'{field}__icontains': prefix})
+    match = Case(
+        When(username__istartswith=prefix, then=Value(USERNAME_PREFIX)),
+        When(name_prefix, then=Value(NAME_PREFIX)),
+        default=Value(INFIX),
+        output_field=IntegerField(),
+    )
+    return User.objects.filter(condition, is_active=True).annotate(match=match)
+
+
+def _matches(prefix):
+    """Return [(username, first_name, last_name, match)] for a prefix, best matches first."""
+    queryset = _users(prefix).order_by('match', 'username')
+    return list(queryset.values_list(*FIELDS, 'match')[:settings.USER_SEARCH['MAX_CANDIDATES']])
+
+
+def candidates(prefix):
+    """Return the accounts matching prefix, from the cache when possible."""
+    key = f'user-search:{hashlib.md5(prefix.encode()).hexdigest()}'
+    rows = cache.get(key)
+    record_cache('user-search', hit=rows is not None)
+    if rows is None:
+        rows = _matches(prefix)
+        cache.set(key, rows, settings.USER_SEARCH['CACHE_SECONDS'])
+    return rows
+
+
+def mentioned(user, prefix, usernames):
+    """Return {username: posts of user mentioning them} for usernames and the names starting with prefix.
+
+    Read from the caller's own tags and their post counts; the candidates
+    are cut to MAX_CANDIDATES, so mentioned names past the cut are found
+    by prefix here.
+    """
+    names = list(usernames) + [f'@{name}' for name in usernames]
+    tags = Tag.objects.filter(
+        Q(somebody__in=names) | Q(somebody__istartswith=prefix) | Q(somebody__istartswith=f'@{prefix}'),
+        user=user, post_count__gt=0,
+    )
+    counts = {}
+    for somebody, posts in tags.values_list('somebody', 'post_count'):
+        name = somebody.lstrip('@').lower()
+        counts[name] = counts.get(name, 0) + posts
+    return counts
+
+
+def search(user, query):
+    """Return the other accounts matching query as dicts, ranked for user."""
+    prefix = normalize(query)
+    if not prefix:
+        return []
+    rows = candidates(prefix)
+    mentions = mentioned(user, prefix, [row[0] for row in rows])
+    missing = mentions.keys() - {row[0] for row in rows}
+    if missing:
+        extra = User.objects.filter(username__in=missing, is_active=True).values_list(*FIELDS)
+        rows = rows + [(*row, USERNAME_PREFIX) for row in extra]
+    ranked = sorted(rows, key=lambda row: (-mentions.get(row[0], 0), row[3], row[0]))
+    return [dict(zip(FIELDS, row)) for row in ranked if row[0] != user.username]
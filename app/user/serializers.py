@@ -1,15 +1,15 @@
 """
 Serializers for the user API View.
 """
-from django.contrib.auth import (
-    get_user_model,
-    authenticate,
-)
+from django.contrib.auth import get_user_model
 from django.utils.translation import gettext as _
 from rest_framework import serializers
 
+from core.instrumentation import InstrumentedSerializerMixin  # noqa
+from user import login  # noqa
 
-class UserSerializer(serializers.ModelSerializer):
+
+class UserSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     """Serializer for the user object."""
 
     class Meta:
@@ -34,8 +34,24 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
 
-class AuthTokenSerializer(serializers.Serializer):
-    """Serializer for the user auth token."""
+class UserSearchSerializer(serializers.Serializer):
+    """Serializer for user search results."""
+    username = serializers.CharField()
+    first_name = serializers.CharField()
+    last_name = serializers.CharField()
+
+
+class MentionSerializer(serializers.Serializer):
+    """Serializer for posts mentioning the user."""
+    post = serializers.IntegerField(source='post_id')
+    title = serializers.CharField(source='post.title')
+    body = serializers.CharField(source='post.body')
+    author = serializers.CharField(source='post.user.username')
+    created_at = serializers.DateTimeField()
+
+
+class CredentialsSerializer(InstrumentedSerializerMixin, serializers.Serializer):
+    """Serializer for login credentials, without checking them."""
     first_name = serializers.CharField()
     last_name = serializers.CharField()
     username = serializers.CharField()
@@ -45,21 +61,13 @@ class AuthTokenSerializer(serializers.Serializer):
         trim_whitespace=False,
     )
 
+
+class AuthTokenSerializer(CredentialsSerializer):
+    """Serializer for the user auth token."""
+
     def validate(self, attrs):
         """Validate and authenticate the user."""
-        email = attrs.get('email')
-        username = attrs.get('username')
-        password = attrs.get('password')
-        first_name = attrs.get('first_name')
-        last_name = attrs.get('last_name')
-        user = authenticate(
-            request=self.context.get('request'),
-            first_name=first_name,
-            last_name=last_name,
-            email=email,
-            password=password,
-            username=username
-        )
+        user = login.authenticate_user(attrs.get('username'), attrs.get('password'))
 
         if not user:
             msg = _('Unable to authenticate with provided credentials.')
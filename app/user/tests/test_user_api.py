@@ -1,17 +1,29 @@
 """
 Tests for the user API.
 """
+import threading
+from unittest.mock import patch
 
-from django.test import TestCase
+from django.conf import settings
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
 from django.urls import reverse
 
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.hashing import HashingPool  # noqa
+from core.models import Mention, Post, Tag  # noqa
+
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
+TOKEN_ASYNC_URL = reverse('user:token-async')
 ME_URL = reverse('user:me')
+SEARCH_URL = reverse('user:search')
+MENTIONS_URL = reverse('user:mentions')
 
 PAYLOAD = {'first_name': "Test",
            'last_name': "Name",
@@ -140,3 +152,241 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.username, PAYLOAD['username'])
         self.assertTrue(self.user.check_password(PAYLOAD['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_delete_user_soft_deletes(self):
+        """Test deleting the account hides it at once and leaves the rows for the purge."""
+        token = Token.objects.create(user=self.user)
+
+        res = self.client.delete(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertIsNotNone(self.user.deleted_at)
+        self.assertFalse(Token.objects.filter(pk=token.pk).exists())
+        res = APIClient().post(TOKEN_URL, {**PAYLOAD})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class LoginTests(TestCase):
+    """Test the hashing pool, token short-circuit and async login."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(**PAYLOAD)
+
+    def test_existing_token_skips_hashing(self):
+        """Test a client with a valid token gets it back without a hash."""
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        with patch('user.login.verify') as verify:
+            res = self.client.post(TOKEN_URL, {**PAYLOAD, 'password': 'not checked'})
+
+        verify.assert_not_called()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['token'], token.key)
+
+    def test_token_of_other_user_not_reused(self):
+        """Test the short-circuit only applies to the token's own user."""
+        other = create_user(email='other@example.com', username='other', password='pass12345',
+                            first_name='Other', last_name='User')
+        token = Token.objects.create(user=other)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        res = self.client.post(TOKEN_URL, {**PAYLOAD, 'password': 'wrong'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rehash_on_hasher_change(self):
+        """Test a password stored with old hasher parameters is rehashed."""
+        self.user.password = make_password(PAYLOAD['password'], hasher='pbkdf2_sha1')
+        self.user.save()
+
+        res = self.client.post(TOKEN_URL, PAYLOAD)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+        self.assertTrue(self.user.check_password(PAYLOAD['password']))
+
+    def test_pool_full(self):
+        """Test logins are refused with 503 when the pool is saturated."""
+        pool = HashingPool(workers=1, max_pending=1)
+        release = threading.Event()
+        pool.submit(release.wait)
+        try:
+            with patch('user.login.get_pool', return_value=pool):
+                res = self.client.post(TOKEN_URL, PAYLOAD)
+        finally:
+            release.set()
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res['Retry-After'], '1')
+
+    def test_async_login(self):
+        """Test the async endpoint issues the same token."""
+        res = self.client.post(TOKEN_ASYNC_URL, PAYLOAD, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['token'], Token.objects.get(user=self.user).key)
+
+        res = self.client.post(TOKEN_ASYNC_URL, {**PAYLOAD, 'password': 'wrong'}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('non_field_errors', res.json())
+
+
+class UserSearchTests(TestCase):
+    """Test searching accounts to mention."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(**{**PAYLOAD, 'username': 'searcher', 'email': 'searcher@example.com'})
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        for username, first_name, last_name in [('annie', 'Ann', 'Lee'), ('anna', 'Anna', 'Kim'),
+                                                ('bob', 'Annabel', 'Smith'), ('carl', 'Carl', 'Hanna')]:
+            create_user(email=f'{username}@example.com', first_name=first_name, last_name=last_name,
+                        username=username, password='pass12345')
+
+    def _usernames(self, res):
+        return [row['username'] for row in res.data['results']]
+
+    def test_search_ranks_username_then_name_matches(self):
+        """Test username prefixes come before name prefixes and inactive users are hidden."""
+        get_user_model().objects.filter(username='annie').update(is_active=False)
+
+        res = self.client.get(SEARCH_URL, {'q': '@AN'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._usernames(res), ['anna', 'bob'])
+        self.assertIn('private', res['Cache-Control'])
+        self.assertIn('Authorization', res['Vary'])
+
+    def test_infix_matches_for_longer_queries(self):
+        """Test queries of three characters also match inside names."""
+        res = self.client.get(SEARCH_URL, {'q': 'ann'})
+
+        self.assertEqual(self._usernames(res), ['anna', 'annie', 'bob', 'carl'])
+
+    def test_mentioned_accounts_first(self):
+        """Test accounts the caller mentioned rank first, most mentioned first."""
+        for username, posts in (('bob', 1), ('annie', 2)):
+            tag = Tag.objects.create(user=self.user, somebody=username)
+            for i in range(posts):
+                Post.objects.create(user=self.user, title=f'hi {username}', body='b').tags.add(tag)
+
+        res = self.client.get(SEARCH_URL, {'q': 'an'})
+
+        self.assertEqual(self._usernames(res), ['annie', 'bob', 'anna'])
+
+    @override_settings(USER_SEARCH={**settings.USER_SEARCH, 'MAX_CANDIDATES': 1})
+    def test_mentioned_accounts_beyond_candidates(self):
+        """Test mentioned accounts are found when more accounts match than are cached."""
+        tag = Tag.objects.create(user=self.user, somebody='@annie')
+        Post.objects.create(user=self.user, title='hi annie', body='b').tags.add(tag)
+
+        res = self.client.get(SEARCH_URL, {'q': 'ann'})
+
+        self.assertEqual(self._usernames(res), ['annie', 'anna'])
+
+    def test_results_are_paginated(self):
+        """Test limit and offset page through the results."""
+        res = self.client.get(SEARCH_URL, {'q': 'ann', 'limit': 3})
+
+        self.assertEqual(len(res.data['results']), 3)
+        res = self.client.get(res.data['next'])
+        self.assertEqual(self._usernames(res), ['carl'])
+        self.assertIsNone(res.data['next'])
+
+    def test_matches_are_cached_per_prefix(self):
+        """Test a repeated prefix is served from the cache."""
+        self.client.get(SEARCH_URL, {'q': 'car'})
+
+        with self.assertNumQueries(1):
+            res = self.client.get(SEARCH_URL, {'q': 'CAR'})
+
+        self.assertEqual(self._usernames(res), ['carl'])
+
+
+class MentionInboxTests(TestCase):
+    """Test the inbox of posts mentioning the user."""
+
+    def setUp(self):
+        self.user = create_user(**PAYLOAD)
+        self.author = create_user(email='author@example.com', username='author', first_name='A', last_name='B',
+                                  password='pass12345')
+        self.author_client = APIClient()
+        self.author_client.force_authenticate(user=self.author)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _post(self, body, **extra):
+        res = self.author_client.post(reverse('post:post-list'), {'title': 'Hi', 'body': body, **extra}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data['id']
+
+    def test_auth_required(self):
+        """Test the inbox requires authentication."""
+        res = APIClient().get(MENTIONS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_posts_mentioning_user_newest_first(self):
+        """Test mentions in bodies and tags are listed newest first, with their author."""
+        first = self._post('Hello @username')
+        self._post('Nothing here')
+        second = self._post('Again', tags=[{'somebody': '@username'}])
+
+        res = self.client.get(MENTIONS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['post'] for row in res.data['results']], [second, first])
+        self.assertEqual(res.data['results'][0]['author'], 'author')
+        self.assertEqual(res.data['results'][1]['body'], 'Hello @username')
+        self.assertIsNone(res.data['next'])
+
+    def test_inbox_is_paginated(self):
+        """Test the inbox is always paginated and the cursor reaches every mention."""
+        posts = [self._post(f'Post {i} for @username') for i in range(3)]
+
+        res = self.client.get(MENTIONS_URL, {'page_size': 2})
+        rows = res.data['results']
+        res = self.client.get(res.data['next'])
+
+        self.assertEqual([row['post'] for row in rows + res.data['results']], posts[::-1])
+        self.assertIsNone(res.data['next'])
+
+    def test_updating_tags_updates_mentions(self):
+        """Test replacing the tags of a post replaces its mentions."""
+        post_id = self._post('Hello @username')
+
+        url = reverse('post:post-detail', args=[post_id])
+        res = self.author_client.patch(url, {'body': 'Hello', 'tags': []}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(Mention.objects.filter(mentioned=self.user).exists())
+
+    def test_editing_body_updates_inbox(self):
+        """Test a PATCH of the body alone moves the post between inboxes, keeping unchanged mentions."""
+        other = create_user(email='other@example.com', username='other', first_name='O', last_name='B',
+                            password='pass12345')
+        third = create_user(email='third@example.com', username='third', first_name='T', last_name='B',
+                            password='pass12345')
+        post_id = self._post('Hello @username and @third')
+        kept = Mention.objects.get(mentioned=third)
+
+        url = reverse('post:post-detail', args=[post_id])
+        res = self.author_client.patch(url, {'body': 'Hello @other and @third'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(MENTIONS_URL).data['results'], [])
+        other_client = APIClient()
+        other_client.force_authenticate(user=other)
+        self.assertEqual([row['post'] for row in other_client.get(MENTIONS_URL).data['results']], [post_id])
+        self.assertEqual(Mention.objects.get(mentioned=third).pk, kept.pk)
+
+    def test_own_posts_are_not_mentions(self):
+        """Test mentioning yourself does not fill your inbox."""
+        self._post('Note to @author')
+
+        self.assertFalse(Mention.objects.exists())
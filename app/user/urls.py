@@ -9,5 +9,8 @@ app_name = 'user'
 urlpatterns = [
     path('create/', views.CreateUserView.as_view(), name='create'),
     path('token/', views.CreateTokenView.as_view(), name='token'),
+    path('token/async/', views.create_token_async, name='token-async'),
     path('me/', views.ManageUserView.as_view(), name='me'),
+    path('search/', views.UserSearchView.as_view(), name='search'),
+    path('mentions/', views.MentionInboxView.as_view(), name='mentions'),
 ]
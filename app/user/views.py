@@ -1,11 +1,28 @@
 """
 Views for the API
 """
+import json
 
-from rest_framework import generics, authentication, permissions
+from asgiref.sync import sync_to_async
+from drf_spectacular.utils import OpenApiParameter, OpenApiTypes, extend_schema
+from django.conf import settings
+from django.http import HttpResponseNotAllowed, JsonResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.translation import gettext as _
+from rest_framework import exceptions, generics, permissions
+from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.request import Request
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
-from user.serializers import UserSerializer, AuthTokenSerializer  # noqa
+from core import mentions, purge  # noqa
+from core.authentication import TokenAuthentication  # noqa
+from core.pagination import KeysetPagination, OffsetPagination  # noqa
+from core.sharding import ShardedViewMixin  # noqa
+from user import login, search  # noqa
+from user.serializers import (  # noqa
+    UserSerializer, AuthTokenSerializer, CredentialsSerializer, MentionSerializer, UserSearchSerializer,
+)
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -17,14 +34,114 @@ class CreateTokenView(ObtainAuthToken):
     """Create a new auth token for user."""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
 
+    def post(self, request, *args, **kwargs):
+        """Return the token, skipping the password hash for a valid one."""
+        token = login.existing_token(request, request.data.get('username'))
+        if token is not None:
+            return Response({'token': token.key})
+        return super().post(request, *args, **kwargs)
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+
+def _throttle(request):
+    """Apply the default throttles to a plain Django view, or raise Throttled."""
+    drf_request = Request(request, authenticators=[])
+    for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES:
+        throttle = throttle_class()
+        if not throttle.allow_request(drf_request, None):
+            raise exceptions.Throttled(throttle.wait())
+
+
+def _error_response(exc):
+    detail = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+    response = JsonResponse(detail, status=exc.status_code, safe=False)
+    if getattr(exc, 'wait', None):
+        response['Retry-After'] = '%d' % exc.wait
+    return response
+
+
+async def create_token_async(request):
+    """CreateTokenView for ASGI workers, awaiting the password hash off the event loop."""
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    try:
+        data = json.loads(request.body or b'{}') if request.content_type == 'application/json' else request.POST
+    except ValueError:
+        return JsonResponse({'detail': 'Malformed JSON.'}, status=400)
+
+    try:
+        await sync_to_async(_throttle)(request)
+        token = await sync_to_async(login.existing_token)(request, data.get('username'))
+        if token is None:
+            serializer = CredentialsSerializer(data=data)
+            await sync_to_async(serializer.is_valid)(raise_exception=True)
+            user = await login.aauthenticate_user(serializer.validated_data['username'],
+                                                  serializer.validated_data['password'])
+            if user is None:
+                msg = _('Unable to authenticate with provided credentials.')
+                raise exceptions.ValidationError({'non_field_errors': [msg]}, code='authorization')
+            token, created = await sync_to_async(Token.objects.get_or_create)(user=user)
+    except exceptions.APIException as exc:
+        return _error_response(exc)
+    return JsonResponse({'token': token.key})
+
+
+# Django's view decorators wrap views in sync functions, so mark it by hand.
+create_token_async.csrf_exempt = True
+
+
+@extend_schema(parameters=[
+    OpenApiParameter('q', OpenApiTypes.STR, description='Start of a username, first or last name, with or without @.'),
+])
+class UserSearchView(ShardedViewMixin, generics.ListAPIView):
+    """Find accounts to mention, those mentioned before first."""
+    serializer_class = UserSearchSerializer
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OffsetPagination
+    replica_actions = ('retrieve',)
+
+    def get_queryset(self):
+        return search.search(self.request.user, self.request.query_params.get('q', ''))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if response.status_code == 200:
+            # Rankings depend on the caller, so only their own client may reuse them.
+            patch_cache_control(response, private=True, max_age=settings.USER_SEARCH['CACHE_SECONDS'])
+            patch_vary_headers(response, ['Authorization'])
+        return response
+
+
+class MentionPagination(KeysetPagination):
+    """Pages of mentions, newest first; an inbox is always paginated."""
+    ordering = ('created_at', 'post_id')
+    optional = False
+
+
+class MentionInboxView(generics.ListAPIView):
+    """List the posts mentioning the authenticated user, newest first."""
+    serializer_class = MentionSerializer
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = MentionPagination
+
+    def get_queryset(self):
+        return mentions.inbox(self.request.user)
+
+
+class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
     """Mange the authenticated user."""
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [TokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    replica_actions = ('retrieve',)
 
     def get_object(self):
         """Retrieve and return the authenticated user."""
         return self.request.user
+
+    def perform_destroy(self, instance):
+        """Soft-delete the account; purge_deleted_users removes its rows later."""
+        purge.soft_delete_user(instance)